@@ -0,0 +1,221 @@
+"""
+Batch Synthesis
+Render and synthesize many summaries from a JSONL file in one process.
+
+Input:  one JSON object per line with the `render__prompt` arguments
+        (subquery, table_text, visualization, user_pref, table_columns,
+        table_rows, columns_metadata) and an optional "id".
+Output: one JSON object per finished item, appended as soon as it completes:
+        {"id", "response", "latency_s"} or {"id", "error", "latency_s"}.
+        A line that is not a JSON object gets an error record (its line
+        number as the id) and the batch goes on.
+
+The output file doubles as the checkpoint: ids already written without an
+error are skipped on the next run, so an interrupted run resumes where it
+stopped.
+
+With RETRIEVAL_INDEX_DIR set, document excerpts and relevant column metadata
+are retrieved for RETRIEVAL_BATCH items at a time (retrieval.py).
+
+Usage:
+    ENV=DEV python batch_synthesis.py requests.jsonl summaries.jsonl [--max-workers 8]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from itertools import islice
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prompt_constellatiion import render__prompt
+from retrieval import get_prompt_retrieval
+from bedrock_connector.gemini_connector import (
+    GEMINI_MODEL_ID, GEMINI_MAX_WORKERS, astream_gemini_synthesis, current_max_workers
+)
+
+RENDER_KEYS = (
+    "subquery", "table_text", "visualization", "user_pref",
+    "table_columns", "table_rows", "columns_metadata",
+)
+# Items per retrieve_many call
+RETRIEVAL_BATCH = 64
+
+
+def load_completed_ids(output_path):
+    """Ids that already have a successful result in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if "error" not in rec:
+                done.add(str(rec.get("id")))
+    return done
+
+
+def iter_requests(input_path, skip_ids):
+    """
+    Yield (id, render kwargs, None) for every input line not already
+    completed, or (line number, None, error message) for a malformed line.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield str(lineno), None, f"JSONDecodeError: {e}"
+                continue
+            if not isinstance(item, dict):
+                yield str(lineno), None, f"TypeError: expected a JSON object, got {type(item).__name__}"
+                continue
+            item_id = str(item.get("id", lineno))
+            if item_id in skip_ids:
+                continue
+            yield item_id, {k: item[k] for k in RENDER_KEYS if k in item}, None
+
+
+def with_retrieval(requests, retrieval, batch_size=RETRIEVAL_BATCH):
+    """Add retrieved render kwargs to (id, kwargs, error) items, one retrieval batch at a time."""
+    if retrieval is None:
+        yield from requests
+        return
+    while True:
+        batch = list(islice(requests, batch_size))
+        if not batch:
+            return
+        valid = [kwargs for _, kwargs, error in batch if error is None]
+        extra = iter(retrieval.render_args_many(
+            [kwargs.get("subquery") or "" for kwargs in valid],
+            [kwargs.get("columns_metadata") for kwargs in valid],
+        ) if valid else ())
+        for item_id, kwargs, error in batch:
+            yield (item_id, kwargs, error) if error is not None else (item_id, {**kwargs, **next(extra)}, None)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    idx = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[idx]
+
+
+async def synthesize_one(model_id, kwargs):
+    # Rendering is CPU work: keep it off the loop that drives the other streams
+    prompt_str, _ = await asyncio.to_thread(render__prompt, **kwargs)
+    pieces = []
+    async for piece in astream_gemini_synthesis(model_id, prompt_str):
+        pieces.append(piece)
+    return "".join(pieces)
+
+
+async def run_batch(input_path, output_path, max_workers, model_id):
+    """`max_workers=None` follows llms.gemini.max_workers, including hot reloads."""
+    skip_ids = load_completed_ids(output_path)
+    if skip_ids:
+        print(f"↻ Resuming: {len(skip_ids)} items already completed")
+
+    def limit():
+        return max(1, max_workers or current_max_workers())
+
+    latencies = []
+    errors = 0
+    malformed = 0
+    pending = set()
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(rec):
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def worker(item_id, kwargs):
+            nonlocal errors
+            t0 = time.perf_counter()
+            try:
+                rec = {"id": item_id, "response": await synthesize_one(model_id, kwargs)}
+            except Exception as e:
+                errors += 1
+                rec = {"id": item_id, "error": f"{type(e).__name__}: {e}"}
+            rec["latency_s"] = round(time.perf_counter() - t0, 4)
+            latencies.append(rec["latency_s"])
+            write(rec)
+
+        try:
+            requests = with_retrieval(iter_requests(input_path, skip_ids), get_prompt_retrieval())
+            while True:
+                # Reading the input and batch retrieval (embed + rerank) run on a
+                # worker thread, so in-flight streams keep flowing meanwhile
+                item = await asyncio.to_thread(next, requests, None)
+                if item is None:
+                    break
+                item_id, kwargs, error = item
+                if error is not None:
+                    malformed += 1
+                    write({"id": item_id, "error": error, "latency_s": 0.0})
+                    continue
+                while len(pending) >= limit():     # at most max_workers in flight
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(worker(item_id, kwargs))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            report(latencies, errors, time.perf_counter() - start, malformed)
+
+
+def report(latencies, errors, elapsed, malformed=0):
+    done = len(latencies)
+    lat = sorted(latencies)
+    print("\n" + "=" * 80)
+    print(f"Completed: {done} ({errors} errors) in {elapsed:.1f}s")
+    if malformed:
+        print(f"Malformed input lines: {malformed} (error records written)")
+    if done:
+        print(f"Throughput: {done / elapsed:.2f} items/s")
+        print(
+            "Latency (s): "
+            f"p50={percentile(lat, 50):.3f} "
+            f"p90={percentile(lat, 90):.3f} "
+            f"p99={percentile(lat, 99):.3f} "
+            f"max={lat[-1]:.3f}"
+        )
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch Gemini synthesis over a JSONL file")
+    parser.add_argument("input", help="JSONL file of render__prompt inputs")
+    parser.add_argument("output", help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument(
+        "--max-workers", type=int, default=None,
+        help=f"concurrent syntheses (default: llms.gemini.max_workers, currently {GEMINI_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--model-id", default=None,
+        help=f"model override (default: llms.gemini.model_id, currently {GEMINI_MODEL_ID})",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_batch(args.input, args.output, args.max_workers, args.model_id))
+    except KeyboardInterrupt:
+        print("\n⏸  Interrupted — rerun the same command to resume.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# bedrock_connector/context_cache.py
+"""
+Provider-side context caching of static prompt prefixes.
+
+A prompt rendered from a version with a static system message arrives as a
+`SplitPrompt` (prefix + suffix, with a fingerprint of the prefix). The first
+request for a (provider, model, fingerprint) registers the prefix with the
+provider's context cache; later requests send only the suffix and refer to
+the prefix by handle, so it is neither re-sent nor re-processed.
+
+Providers opt in with two optional methods:
+
+    create_context_cache(model_id, prefix, ttl_s) -> handle | None
+    open_cached_stream(model_id, handle, suffix) -> iterator of text pieces
+
+and may add
+
+    release_context_cache(handle)    # drop per-handle client state
+
+which is called when a handle is re-registered or invalidated.
+Providers without them (local/fake backends) get the full prompt, as before.
+A failed or declined registration is remembered for `retry_after_s`, so an
+unsupported model does not pay a failed call per request.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DECLINED = object()
+
+
+class ContextCache:
+    def __init__(
+        self,
+        ttl_s: float = 3600,
+        refresh_margin_s: float = 60,
+        retry_after_s: float = 300,
+        min_prefix_chars: int = 0,
+    ):
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_after_s = retry_after_s
+        self.min_prefix_chars = min_prefix_chars
+        # key -> (handle or _DECLINED, valid until [monotonic])
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.registrations = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+    def supported(self, provider) -> bool:
+        return callable(getattr(provider, "create_context_cache", None)) and callable(
+            getattr(provider, "open_cached_stream", None)
+        )
+
+    def handle(self, provider, model_id: str, prefix: str, fingerprint: str) -> Optional[Any]:
+        """
+        Handle of the cached `prefix`, registering it on first use; None when
+        the full prompt must be sent. Blocking: call from a worker thread.
+        """
+        if not self.supported(provider) or len(prefix) < self.min_prefix_chars:
+            self._count("fallbacks")
+            return None
+        key = (provider.name, model_id, fingerprint)
+        handle = self._valid(key)
+        if handle is None:
+            # One registration per key at a time; other callers wait for it
+            with self._key_lock(key):
+                handle = self._valid(key)
+                if handle is None:
+                    handle = self._register(provider, key, model_id, prefix)
+                elif handle is not _DECLINED:
+                    self._count("hits")  # registered while this caller waited
+        elif handle is not _DECLINED:
+            self._count("hits")
+        if handle is _DECLINED:
+            self._count("fallbacks")
+            return None
+        return handle
+
+    def invalidate(self, provider, model_id: str, fingerprint: str) -> None:
+        """Forget a handle the provider no longer knows (e.g. expired server-side)."""
+        with self._lock:
+            entry = self._entries.pop((provider.name, model_id, fingerprint), None)
+        if entry is not None:
+            self._release(provider, entry[0])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": sum(1 for h, _ in self._entries.values() if h is not _DECLINED),
+                "hits": self.hits,
+                "registrations": self.registrations,
+                "fallbacks": self.fallbacks,
+                "errors": self.errors,
+            }
+
+    # ---------- Internals ----------
+    def _valid(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        return None
+
+    def _register(self, provider, key, model_id: str, prefix: str) -> Any:
+        try:
+            handle = provider.create_context_cache(model_id, prefix, self.ttl_s)
+        except Exception as e:
+            logger.warning("context cache registration failed for %s: %s", key, e)
+            self._count("errors")
+            handle = None
+        now = time.monotonic()
+        if handle is None:
+            entry = (_DECLINED, now + self.retry_after_s)
+        else:
+            # Re-register a little before the provider drops it
+            entry = (handle, now + max(0.0, self.ttl_s - self.refresh_margin_s))
+            self._count("registrations")
+        with self._lock:
+            old = self._entries.get(key)
+            self._entries[key] = entry
+        if old is not None and old[0] is not entry[0]:
+            self._release(provider, old[0])
+        return entry[0]
+
+    def _release(self, provider, handle) -> None:
+        release = getattr(provider, "release_context_cache", None)
+        if handle is _DECLINED or not callable(release):
+            return
+        try:
+            release(handle)
+        except Exception as e:
+            logger.warning("context cache release failed for %r: %s", handle, e)
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
@@ -0,0 +1,164 @@
+# bedrock_connector/credentials.py
+"""
+Pluggable credential sources with a TTL cache and background refresh.
+
+Sources:
+  * secretsmanager  AWS Secrets Manager JSON secret (boto3 imported on first fetch)
+  * env             environment variable
+  * file            local file holding the raw key or a JSON object with it
+
+Nothing here touches the network until `CachedCredential.get()` is first
+called, so importing the connector stays cheap and works offline.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialError(RuntimeError):
+    pass
+
+
+class SecretsManagerSource:
+    name = "secretsmanager"
+
+    def __init__(self, secret_name: Optional[str], secret_key: Optional[str], region: str = "us-east-1"):
+        self.secret_name = secret_name
+        self.secret_key = secret_key
+        self.region = region
+
+    def available(self) -> bool:
+        return bool(self.secret_name and self.secret_key)
+
+    def fetch(self) -> str:
+        if not self.available():
+            raise CredentialError(
+                "Gemini secret_name/secret_key not found. "
+                "Check DEV.llms.gemini.secret_name and secret_key in app_config.yaml."
+            )
+        import boto3  # deferred: only needed when this source is used
+
+        client = boto3.client(service_name="secretsmanager", region_name=self.region)
+        secret_val = client.get_secret_value(SecretId=self.secret_name)
+        creds = json.loads(secret_val["SecretString"])
+        return creds[self.secret_key]
+
+
+class EnvSource:
+    name = "env"
+
+    def __init__(self, var: str = "GEMINI_API_KEY"):
+        self.var = var
+
+    def available(self) -> bool:
+        return bool(os.getenv(self.var))
+
+    def fetch(self) -> str:
+        value = os.getenv(self.var)
+        if not value:
+            raise CredentialError(f"Environment variable {self.var} is not set")
+        return value
+
+
+class FileSource:
+    """Stand-in for a secret store: the file holds the key, or JSON with `key_field`."""
+
+    name = "file"
+
+    def __init__(self, path: str, key_field: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.key_field = key_field
+
+    def available(self) -> bool:
+        return bool(self.path and self.path.is_file())
+
+    def fetch(self) -> str:
+        if not self.available():
+            raise CredentialError(f"Credential file not found: {self.path}")
+        text = self.path.read_text(encoding="utf-8").strip()
+        if self.key_field:
+            return json.loads(text)[self.key_field]
+        return text
+
+
+def build_source(kind: str, **settings):
+    """Create a credential source by name: 'secretsmanager', 'env' or 'file'."""
+    kind = (kind or "secretsmanager").lower()
+    if kind == "secretsmanager":
+        return SecretsManagerSource(
+            settings.get("secret_name"), settings.get("secret_key"), settings.get("region") or "us-east-1"
+        )
+    if kind == "env":
+        return EnvSource(settings.get("env_var") or "GEMINI_API_KEY")
+    if kind == "file":
+        return FileSource(settings.get("path") or "", settings.get("secret_key"))
+    raise ValueError(f"Unknown credential source: {kind}")
+
+
+class CachedCredential:
+    """
+    Cache a source's value for `ttl_s` seconds. A daemon timer refreshes it
+    `refresh_margin_s` before expiry so callers never wait on the store after
+    the first fetch. A failed refresh keeps serving the old value until it
+    expires and retries sooner.
+    """
+
+    def __init__(self, source, ttl_s: float = 3600, refresh_margin_s: float = 300):
+        self.source = source
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = min(refresh_margin_s, ttl_s / 2)
+        self._value: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.fetches = 0
+
+    def get(self) -> str:
+        value = self._value
+        if value is not None and time.monotonic() < self._expires_at:
+            return value
+        with self._lock:
+            if self._value is None or time.monotonic() >= self._expires_at:
+                self._refresh_locked()
+            return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+            self._expires_at = 0.0
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _refresh_locked(self) -> None:
+        value = self.source.fetch()
+        self.fetches += 1
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl_s
+        self._schedule(self.ttl_s - self.refresh_margin_s)
+
+    def _schedule(self, delay: float) -> None:
+        self.close()
+        self._timer = threading.Timer(max(1.0, delay), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._lock:
+                self._refresh_locked()
+        except Exception as e:
+            logger.warning("Credential refresh from %s failed: %s", self.source.name, e)
+            remaining = self._expires_at - time.monotonic()
+            if remaining > 0:
+                self._schedule(remaining / 2)
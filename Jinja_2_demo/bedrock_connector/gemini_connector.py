@@ -1,38 +1,239 @@
 import os
-import json
 import asyncio
-from pathlib import Path
+import logging
+import threading
+import time
 from typing import Any
 
-import boto3
-import google.generativeai as genai
-from config.loader import load_config, select_env, get_setting
+from config.loader import load_config, select_env, get_setting, compile_setting, config_service
+from bedrock_connector.streaming import aiter_in_thread, close_upstream
+from bedrock_connector.response_cache import ResponseCache, cache_key, default_db_path
+from bedrock_connector.credentials import CachedCredential, build_source
+from bedrock_connector.providers import FakeStreamingProvider, StreamingProvider
+from bedrock_connector.resilience import ResilienceConfig, ResilientStreamer
+from bedrock_connector.context_cache import ContextCache
+from bedrock_connector.singleflight import SingleFlight
+import instrumentation
+from table_encoder import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
 
 
 # -----------------------------
-# Load config & select ENV
+# Config, settings and shared objects: built on first use, not at import
 # -----------------------------
-print()
 ENV = os.getenv("ENV")
-_cfg_all = load_config(ENV)                 # resolves .../config/app_config.yaml via loader.py
-_ENV_NAME, _ENV_CFG = select_env(ENV,_cfg_all)  # e.g., 'DEV', cfg dict under DEV
+GEMINI_GENERATION_CONFIG = {"temperature": 0}
+
+# Set by _ensure_initialized(); reading one of these from outside the module
+# (e.g. `from gemini_connector import GEMINI_MODEL_ID`) initializes first.
+_LAZY_NAMES = frozenset({
+    "AWS_REGION", "GEMINI_MODEL_ID", "GEMINI_MAX_WORKERS", "GEMINI_SECRET_NAME", "GEMINI_SECRET_KEY",
+    "GEMINI_ENV_TAG", "GEMINI_CREDENTIAL_SOURCE", "RESPONSE_CACHE_ENABLED", "REPLAY_CHUNK_CHARS",
+    "SINGLE_FLIGHT_ENABLED", "RESILIENCE_ENABLED", "CONTEXT_CACHE_ENABLED", "LLM_PROVIDER",
+    "_cfg_all", "_ENV_NAME", "_ENV_CFG", "_GEMINI_CFG", "_CREDENTIAL", "_RESPONSE_CACHE",
+    "_RESILIENCE", "_CONTEXT_CACHE", "_CONFIG",
+})
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _enabled(env_var: str, value) -> bool:
+    return str(os.getenv(env_var, value)).lower() not in ("0", "false", "no", "off")
+
+
+def _ensure_initialized() -> None:
+    """
+    Load the config and build the credential, response cache, resilience
+    layer and context cache, once. Called by every entry point, so importing
+    the module reads no files and opens no database.
+    """
+    global _initialized, _cfg_all, _ENV_NAME, _ENV_CFG, _GEMINI_CFG, _CREDENTIAL, _CONFIG
+    global AWS_REGION, GEMINI_MODEL_ID, GEMINI_MAX_WORKERS, GEMINI_SECRET_NAME, GEMINI_SECRET_KEY, GEMINI_ENV_TAG
+    global GEMINI_CREDENTIAL_SOURCE, RESPONSE_CACHE_ENABLED, REPLAY_CHUNK_CHARS, _RESPONSE_CACHE
+    global SINGLE_FLIGHT_ENABLED, RESILIENCE_ENABLED, _RESILIENCE, CONTEXT_CACHE_ENABLED, _CONTEXT_CACHE, LLM_PROVIDER
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        _cfg_all = load_config(ENV)                      # resolves .../config/app_config.yaml via loader.py
+        _ENV_NAME, _ENV_CFG = select_env(ENV, _cfg_all)  # e.g., 'DEV', cfg dict under DEV
+
+        # Settings (with env-var overrides)
+        AWS_REGION = os.getenv("AWS_REGION") or get_setting(_ENV_CFG, "aws.region", "us-east-1")
+        _GEMINI_CFG = get_setting(_ENV_CFG, "llms.gemini", {}) or {}
+        GEMINI_MODEL_ID = _GEMINI_CFG.get("model_id", "gemini-2.5-pro")
+        GEMINI_MAX_WORKERS = int(_GEMINI_CFG.get("max_workers", 8) or 8)
+        GEMINI_SECRET_NAME = os.getenv("GEMINI_SECRET_NAME", _GEMINI_CFG.get("secret_name"))
+        GEMINI_SECRET_KEY = os.getenv("GEMINI_SECRET_KEY", _GEMINI_CFG.get("secret_key"))
+        GEMINI_ENV_TAG = (_cfg_all.get("env", "DEV") or "DEV").lower()
+        LLM_PROVIDER = os.getenv("LLM_PROVIDER") or get_setting(_ENV_CFG, "llms.provider", "gemini")
+
+        # Credentials (resolved on the first synthesis call)
+        GEMINI_CREDENTIAL_SOURCE = (
+            os.getenv("GEMINI_CREDENTIAL_SOURCE")
+            or _GEMINI_CFG.get("credential_source")
+            or "secretsmanager"
+        )
+        _CREDENTIAL = CachedCredential(
+            build_source(
+                GEMINI_CREDENTIAL_SOURCE,
+                secret_name=GEMINI_SECRET_NAME,
+                secret_key=GEMINI_SECRET_KEY,
+                region=AWS_REGION,
+                env_var=_GEMINI_CFG.get("api_key_env"),
+                path=os.getenv("GEMINI_API_KEY_FILE") or _GEMINI_CFG.get("api_key_file"),
+            ),
+            ttl_s=float(_GEMINI_CFG.get("credential_ttl_s", 3600)),
+        )
+
+        # Response cache (temperature-0 calls are deterministic)
+        cache_cfg = _GEMINI_CFG.get("response_cache", {}) or {}
+        RESPONSE_CACHE_ENABLED = _enabled("RESPONSE_CACHE_ENABLED", cache_cfg.get("enabled", True))
+        REPLAY_CHUNK_CHARS = int(cache_cfg.get("replay_chunk_chars", 64))
+        _RESPONSE_CACHE = (
+            ResponseCache(
+                max_bytes=int(float(cache_cfg.get("max_mb", 32)) * 1024 * 1024),
+                ttl_s=float(cache_cfg.get("ttl_s", 24 * 3600)),
+                db_path=cache_cfg.get("path") or default_db_path(),
+                max_disk_bytes=int(float(cache_cfg.get("disk_max_mb", 256)) * 1024 * 1024),
+            )
+            if RESPONSE_CACHE_ENABLED else None
+        )
+
+        # Single-flight: concurrent identical requests share one upstream stream
+        SINGLE_FLIGHT_ENABLED = _enabled("SINGLE_FLIGHT_ENABLED", _GEMINI_CFG.get("single_flight", True))
+
+        # Resilience: hedged first chunk, retry budget, circuit breaker (resilience.py)
+        resilience_cfg = _GEMINI_CFG.get("resilience", {}) or {}
+        RESILIENCE_ENABLED = _enabled("RESILIENCE_ENABLED", resilience_cfg.get("enabled", True))
+        _RESILIENCE = ResilientStreamer(ResilienceConfig.from_settings(resilience_cfg))
+
+        # Context cache: static prompt prefixes (SplitPrompt) registered with the provider
+        context_cfg = _GEMINI_CFG.get("context_cache", {}) or {}
+        CONTEXT_CACHE_ENABLED = _enabled("CONTEXT_CACHE_ENABLED", context_cfg.get("enabled", True))
+        _CONTEXT_CACHE = ContextCache(
+            ttl_s=float(context_cfg.get("ttl_s", 3600)),
+            retry_after_s=float(context_cfg.get("retry_after_s", 300)),
+            min_prefix_chars=int(context_cfg.get("min_prefix_tokens", 0)) * CHARS_PER_TOKEN,
+        )
+
+        # Hot reload: workers pick up model_id / max_workers changes without a restart
+        _CONFIG = config_service()
+        _CONFIG.subscribe(_on_config_reload)
+        _initialized = True
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        _ensure_initialized()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_connector() -> None:
+    """Load the config and build the caches now (e.g. before replacing one in a benchmark)."""
+    _ensure_initialized()
+
+
+_GEMINI_MODELS: dict[Any, Any] = {}  # model_id, or ("cached", cache name)
+_models_lock = threading.Lock()
+
+
+def _model_client(key, build):
+    """The cached model client for `key`, built on first use (safe against concurrent clears)."""
+    model = _GEMINI_MODELS.get(key)
+    if model is None:
+        model = build()
+        with _models_lock:
+            model = _GEMINI_MODELS.setdefault(key, model)
+    return model
+
+
+def _clear_model_clients() -> None:
+    with _models_lock:
+        _GEMINI_MODELS.clear()
+
+
+_provider_lock = threading.Lock()
+_genai = None
+_configured_key: str | None = None
+
+
+def _ensure_provider():
+    """Import and configure google.generativeai with a current API key."""
+    global _genai, _configured_key
+    _ensure_initialized()
+    api_key = _CREDENTIAL.get()
+    if _genai is not None and api_key == _configured_key:
+        return _genai
+    with _provider_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            _genai = genai
+        if api_key != _configured_key:
+            _genai.configure(api_key=api_key)
+            # Model clients built before a key rotation keep the old key
+            _clear_model_clients()
+            _configured_key = api_key
+    return _genai
+
+
+def gemini_available() -> bool:
+    """Cheap offline check: credentials are configured and the SDK is installed."""
+    import importlib.util
+    _ensure_initialized()
+    try:
+        sdk = importlib.util.find_spec("google.generativeai") is not None
+    except ModuleNotFoundError:
+        sdk = False
+    return sdk and _CREDENTIAL.source.available()
+
+
+def response_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the response cache."""
+    _ensure_initialized()
+    return _RESPONSE_CACHE.stats() if _RESPONSE_CACHE else {}
+
+
+_SINGLE_FLIGHT = SingleFlight()
+
+def single_flight_stats() -> dict:
+    """Leader/joiner counters of the single-flight layer."""
+    return _SINGLE_FLIGHT.stats()
+
+
+def resilience_stats() -> dict:
+    """Hedge/retry/breaker counters of the upstream resilience layer."""
+    _ensure_initialized()
+    return _RESILIENCE.stats() if RESILIENCE_ENABLED else {}
+
+
+def context_cache_stats() -> dict:
+    """Registration/hit/fallback counters of the provider context cache."""
+    _ensure_initialized()
+    return _CONTEXT_CACHE.stats() if CONTEXT_CACHE_ENABLED else {}
 
 # -----------------------------
-# Settings (with env-var overrides)
+# Hot reload: workers pick up model_id / max_workers changes without a restart
 # -----------------------------
-AWS_REGION = (
-    os.getenv("AWS_REGION")
-    or get_setting(_ENV_CFG, "aws.region", "us-east-1")
-)
+_gemini_setting = compile_setting("llms.gemini")
 
-# Gemini settings
-_GEMINI_CFG = get_setting(_ENV_CFG, "llms.gemini", {}) or {}
-GEMINI_MODEL_ID = _GEMINI_CFG.get("model_id", "gemini-2.5-pro")
-GEMINI_SECRET_NAME = _GEMINI_CFG.get("secret_name")              
-GEMINI_SECRET_KEY  = _GEMINI_CFG.get("secret_key")              
-GEMINI_ENV_TAG     = (_cfg_all.get("env", "DEV") or "DEV").lower()
+def _on_config_reload(new_cfg, old_cfg):
+    global _GEMINI_CFG, GEMINI_MODEL_ID, GEMINI_MAX_WORKERS, REPLAY_CHUNK_CHARS
+    _GEMINI_CFG = _gemini_setting(select_env(ENV, new_cfg)[1], {}) or {}
+    GEMINI_MODEL_ID = _GEMINI_CFG.get("model_id", "gemini-2.5-pro")
+    GEMINI_MAX_WORKERS = int(_GEMINI_CFG.get("max_workers", 8) or 8)
+    REPLAY_CHUNK_CHARS = int((_GEMINI_CFG.get("response_cache") or {}).get("replay_chunk_chars", 64))
+    # Model registry: rebuilt lazily with the new settings
+    _clear_model_clients()
 
-_GEMINI_MODELS: dict[str, Any] = {}
+def current_max_workers() -> int:
+    """llms.gemini.max_workers as of the latest config reload."""
+    _ensure_initialized()
+    _CONFIG.get()
+    return GEMINI_MAX_WORKERS
 
 def _safe_stream_text_piece(ev):
     """Safely extract text from streaming event"""
@@ -42,44 +243,200 @@ def _safe_stream_text_piece(ev):
         return None
 
 def _get_gemini_model(model_id: str | None = None):
+    genai = _ensure_provider()
     model_id = model_id or GEMINI_MODEL_ID
-    if model_id not in _GEMINI_MODELS:
-        _GEMINI_MODELS[model_id] = genai.GenerativeModel(model_id, generation_config={"temperature": 0})
-    return _GEMINI_MODELS[model_id]
-
-
-async def astream_gemini_synthesis(model_id:str,prompt:str,on_event=None):
-    loop=asyncio.get_running_loop()
-    model=_get_gemini_model(model_id)
-    def _sync_iter(): return model.generate_content(prompt,stream=True)
-    stream=await loop.run_in_executor(None,_sync_iter)
-    for ev in stream:
-        piece=_safe_stream_text_piece(ev)
-        if piece:
-            if on_event:
-                try:on_event(piece)
-                except:pass
-            yield piece
-
-# Allow explicit overrides if needed
-GEMINI_SECRET_NAME = os.getenv("GEMINI_SECRET_NAME", GEMINI_SECRET_NAME)
-GEMINI_SECRET_KEY  = os.getenv("GEMINI_SECRET_KEY", GEMINI_SECRET_KEY)
-
-if not GEMINI_SECRET_NAME or not GEMINI_SECRET_KEY:
-    raise RuntimeError(
-        "Gemini secret_name/secret_key not found. "
-        "Check DEV.llms.gemini.secret_name and secret_key in app_config.yaml."
+    return _model_client(
+        model_id, lambda: genai.GenerativeModel(model_id, generation_config=GEMINI_GENERATION_CONFIG)
     )
 
 
-client = boto3.client(service_name="secretsmanager", region_name="us-east-1")
-# # print(":::::: Config Env - ",env,"::::::")
+class _GeminiTextStream:
+    """Text pieces of a generate_content(stream=True) response."""
+
+    def __init__(self, response):
+        self._response = response
+        self._events = iter(response)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while True:
+            piece = _safe_stream_text_piece(next(self._events))
+            if piece:
+                return piece
+
+    def cancel(self) -> None:
+        close_upstream(self._response)
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def available(self) -> bool:
+        return gemini_available()
+
+    def open_stream(self, model_id: str, prompt: str) -> _GeminiTextStream:
+        # Runs on the stream worker thread; the first call also resolves credentials
+        return _GeminiTextStream(_get_gemini_model(model_id).generate_content(prompt, stream=True))
+
+    def create_context_cache(self, model_id: str, prefix: str, ttl_s: float):
+        """Explicit Gemini context cache holding `prefix` as the system instruction."""
+        import datetime
+        _ensure_provider()
+        from google.generativeai import caching
+        name = model_id if model_id.startswith("models/") else f"models/{model_id}"
+        return caching.CachedContent.create(
+            model=name, system_instruction=prefix, ttl=datetime.timedelta(seconds=ttl_s)
+        )
+
+    def open_cached_stream(self, model_id: str, handle, suffix: str) -> _GeminiTextStream:
+        genai = _ensure_provider()
+        model = _model_client(("cached", handle.name), lambda: genai.GenerativeModel.from_cached_content(
+            cached_content=handle, generation_config=GEMINI_GENERATION_CONFIG
+        ))
+        return _GeminiTextStream(model.generate_content(suffix, stream=True))
+
+    def release_context_cache(self, handle) -> None:
+        # The replaced handle's model client is never used again
+        with _models_lock:
+            _GEMINI_MODELS.pop(("cached", handle.name), None)
+
+
+# -----------------------------
+# Provider selection: env LLM_PROVIDER, else llms.provider ("gemini" | "fake")
+# -----------------------------
+_PROVIDER: StreamingProvider | None = None
+
+def build_provider(name: str) -> StreamingProvider:
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "fake":
+        _ensure_initialized()
+        fake_cfg = get_setting(_ENV_CFG, "llms.fake", {}) or {}
+        return FakeStreamingProvider(
+            **{k: fake_cfg[k] for k in ("ttft_s", "tokens_per_s", "chunk_tokens") if k in fake_cfg}
+        )
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+def get_provider() -> StreamingProvider:
+    global _PROVIDER
+    if _PROVIDER is None:
+        _ensure_initialized()
+        _PROVIDER = build_provider(LLM_PROVIDER)
+    return _PROVIDER
+
+def set_provider(provider: StreamingProvider) -> None:
+    """Swap the backend behind astream_gemini_synthesis (e.g. a fake for benchmarks)."""
+    global _PROVIDER
+    _PROVIDER = provider
+
+def synthesis_available() -> bool:
+    return get_provider().available()
+
+
+class _StreamTimer:
+    """TTFT, inter-chunk gaps, duration and tokens/s of one stream."""
+
+    def __init__(self, provider: str, source: str, start: float):
+        self.labels = {"provider": provider, "source": source}
+        self.start = self.last = start
+        self.first = None
+        self.chars = 0
+
+    def chunk(self, piece: str) -> None:
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+            instrumentation.observe("llm_time_to_first_chunk_seconds", now - self.start, **self.labels)
+        else:
+            instrumentation.observe("llm_inter_chunk_seconds", now - self.last, **self.labels)
+        self.last = now
+        self.chars += len(piece)
+
+    def finish(self) -> None:
+        instrumentation.observe("llm_stream_seconds", self.last - self.start, **self.labels)
+        generating = self.last - (self.first or self.last)
+        if generating > 0:
+            tokens = self.chars / CHARS_PER_TOKEN
+            instrumentation.observe("llm_tokens_per_second", tokens / generating, **self.labels)
+
+
+def _open_upstream(provider:StreamingProvider,model_id:str,prompt:str):
+    """Open the provider stream; a SplitPrompt's static prefix goes by context-cache handle when possible."""
+    fingerprint=getattr(prompt,"fingerprint",None)
+    if CONTEXT_CACHE_ENABLED and fingerprint:
+        handle=_CONTEXT_CACHE.handle(provider,model_id,prompt.prefix,fingerprint)
+        if handle is not None:
+            try:
+                return provider.open_cached_stream(model_id,handle,prompt.suffix)
+            except Exception as e:
+                # e.g. expired server-side: re-register next time, send everything now
+                logger.warning("cached-prefix request failed (%s); sending the full prompt",e)
+                _CONTEXT_CACHE.invalidate(provider,model_id,fingerprint)
+    return provider.open_stream(model_id,str(prompt))
+
+async def _aupstream_text(provider:StreamingProvider,model_id:str,prompt:str):
+    # Both the request (incl. context-cache registration) and every chunk wait run on a worker thread
+    async for piece in aiter_in_thread(lambda: _open_upstream(provider,model_id,prompt)):
+        yield piece
+
+def _aupstream(provider:StreamingProvider,model_id:str,prompt:str):
+    """Upstream stream, hedged/retried/circuit-broken unless RESILIENCE_ENABLED is off."""
+    if RESILIENCE_ENABLED:
+        return _RESILIENCE.stream(lambda:_aupstream_text(provider,model_id,prompt))
+    return _aupstream_text(provider,model_id,prompt)
+
+async def _areplay_text(text:str,chunk_chars:int):
+    """Replay a cached response as a chunked stream."""
+    for i in range(0,len(text),chunk_chars):
+        yield text[i:i+chunk_chars]
+        await asyncio.sleep(0)
 
-gemini_secret_val = client.get_secret_value(SecretId=GEMINI_SECRET_NAME)
-# # gemini_secret_val
-gemini_creds = json.loads(gemini_secret_val['SecretString'])
-gcp_apikey = gemini_creds[GEMINI_SECRET_KEY]
-genai.configure(api_key=gcp_apikey)
+async def astream_gemini_synthesis(model_id:str|None,prompt:str,on_event=None):
+    """Stream synthesis text; `model_id=None` uses the configured (hot-reloadable) model."""
+    started=time.perf_counter()
+    with instrumentation.span("config"):
+        _ensure_initialized()
+        _CONFIG.get()  # cheap: stats the config file at most once per check interval
+    model_id=model_id or GEMINI_MODEL_ID
+    provider=get_provider()
+    request_key=cache_key(f"{provider.name}:{model_id}",GEMINI_GENERATION_CONFIG,prompt)
+    key=None
+    if _RESPONSE_CACHE is not None and GEMINI_GENERATION_CONFIG.get("temperature")==0:
+        key=request_key
+    cached=_RESPONSE_CACHE.get(key,disk=False) if key else None
+    if cached is None and key and _RESPONSE_CACHE.has_disk:
+        cached=await asyncio.to_thread(_RESPONSE_CACHE.get,key)  # SQLite stays off the event loop
 
+    if cached is not None:
+        source=_areplay_text(cached,max(1,REPLAY_CHUNK_CHARS))
+    elif SINGLE_FLIGHT_ENABLED:
+        # The flight fills the cache once, however many callers share it
+        source=_SINGLE_FLIGHT.stream(
+            request_key,
+            lambda:_aupstream(provider,model_id,prompt),
+            on_complete=(lambda text,k=key:asyncio.to_thread(_RESPONSE_CACHE.put,k,text)) if key else None,
+        )
+        key=None
+    else:
+        source=_aupstream(provider,model_id,prompt)
 
+    timer=_StreamTimer(provider.name,"cache" if cached is not None else "upstream",started) if instrumentation.ENABLED else None
+    pieces=[]
+    async for piece in source:
+        if timer:
+            timer.chunk(piece)
+        if on_event:
+            try:on_event(piece)
+            except Exception:
+                logger.exception("on_event handler failed; continuing the stream")
+        if key and cached is None:
+            pieces.append(piece)
+        yield piece
 
+    # Only complete streams reach this point (early exit closes the generator)
+    if timer:
+        timer.finish()
+    if key and cached is None and pieces:
+        await asyncio.to_thread(_RESPONSE_CACHE.put,key,"".join(pieces))
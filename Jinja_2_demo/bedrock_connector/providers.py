@@ -0,0 +1,220 @@
+# bedrock_connector/providers.py
+"""
+Streaming provider interface used by `astream_gemini_synthesis`, plus a
+deterministic local fake for offline runs and benchmarks.
+
+A provider returns a *blocking* iterator of text pieces; the connector
+drains it on a worker thread (see streaming.py). An iterator may expose
+cancel()/close(), which is called when the consumer goes away.
+
+Providers may also implement create_context_cache / open_cached_stream to
+serve a static prompt prefix from a provider-side cache (context_cache.py).
+
+The fake can also inject faults (slow first chunk, errors before the first
+chunk or mid-stream), at random rates or from a fixed per-call script, to
+exercise the hedging / retry / circuit-breaker layer (resilience.py).
+"""
+from __future__ import annotations
+
+import random
+import threading
+from typing import Iterable, Iterator, Optional, Protocol, Sequence
+
+
+class StreamingProvider(Protocol):
+    name: str
+
+    def available(self) -> bool:
+        """Cheap offline check that the provider can be used."""
+
+    def open_stream(self, model_id: str, prompt: str) -> Iterable[str]:
+        """Start a generation and return a blocking iterator of text pieces."""
+
+
+DEFAULT_FAKE_RESPONSE = """```json
+{
+  "plottinggraph": [
+    {
+      "chartType": "BAR",
+      "xAxis": ["region"],
+      "yAxis": ["prescriptions_count"],
+      "chartData": [{"region": "Northeast", "prescriptions_count": 245}, {"region": "West", "prescriptions_count": 312}]
+    }
+  ]
+}
+```
+
+
+### Key Insights
+- Prescription volume is concentrated in a small group of high-volume prescribers.
+- Regional differences suggest uneven adoption across territories.
+
+### Business Implication
+Focus field effort on the regions and specialties where adoption is lagging.
+
+### Executive Summary
+A few prescribers drive most of the volume, so targeted engagement has outsized impact.
+"""
+
+
+class FakeUpstreamError(ConnectionError):
+    """Injected upstream failure (retryable, like a dropped connection)."""
+
+
+# Rough prompt size estimate of the fake's prefill model
+_CHARS_PER_TOKEN = 4
+
+# Per-call behaviours of FakeStreamingProvider(faults=...)
+FAULTS = ("ok", "slow", "error", "error_mid")
+
+
+class FakeStream:
+    """Blocking iterator emitting `text` in chunks at a fixed pace."""
+
+    def __init__(self, pieces, ttft_s: float, chunk_delay_s: float, fail_at: Optional[int] = None):
+        self._pieces = pieces
+        self._ttft_s = ttft_s
+        self._chunk_delay_s = chunk_delay_s
+        self._fail_at = fail_at  # raise FakeUpstreamError instead of chunk N
+        self._index = 0
+        self._cancelled = threading.Event()
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        if self._cancelled.is_set() or self._index >= len(self._pieces):
+            raise StopIteration
+        delay = self._ttft_s if self._index == 0 else self._chunk_delay_s
+        # Event.wait so cancel() interrupts the simulated network wait
+        if delay > 0 and self._cancelled.wait(delay):
+            raise StopIteration
+        if self._index == self._fail_at:
+            raise FakeUpstreamError(f"injected upstream failure at chunk {self._index}")
+        piece = self._pieces[self._index]
+        self._index += 1
+        return piece
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+
+class FakeStreamingProvider:
+    """
+    Local stand-in for a streaming LLM.
+
+    ttft_s          delay before the first chunk
+    tokens_per_s    generation speed after the first chunk
+    chunk_tokens    whitespace-delimited tokens per chunk
+    response        text to stream (default: a canned summarizer answer)
+
+    Fault injection (per call):
+    slow_rate       probability of a slow first chunk (`slow_ttft_s`)
+    error_rate      probability of failing before the first chunk
+    mid_error_rate  probability of failing halfway through the response
+    faults          fixed script of FAULTS values, cycled; overrides the rates
+    seed            seed for the random faults
+
+    Prompt processing (off by default):
+    prefill_s_per_ktok  extra first-chunk delay per 1k prompt tokens
+    context_cache       accept create_context_cache(); cached prefix tokens
+                        then cost no prefill time
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        ttft_s: float = 0.3,
+        tokens_per_s: float = 80.0,
+        chunk_tokens: int = 8,
+        response: Optional[str] = None,
+        slow_rate: float = 0.0,
+        slow_ttft_s: float = 2.0,
+        error_rate: float = 0.0,
+        mid_error_rate: float = 0.0,
+        faults: Optional[Sequence[str]] = None,
+        seed: Optional[int] = None,
+        prefill_s_per_ktok: float = 0.0,
+        context_cache: bool = False,
+    ):
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.response = response if response is not None else DEFAULT_FAKE_RESPONSE
+        self._pieces = self._split(self.response)
+        self.slow_rate = slow_rate
+        self.slow_ttft_s = slow_ttft_s
+        self.error_rate = error_rate
+        self.mid_error_rate = mid_error_rate
+        unknown = set(faults or ()) - set(FAULTS)
+        if unknown:
+            raise ValueError(f"Unknown fake faults: {sorted(unknown)}")
+        self.faults = list(faults or ())
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.prefill_s_per_ktok = prefill_s_per_ktok
+        self.context_cache = context_cache
+        self._contexts = {}
+        self.calls = 0
+        self.prompt_tokens = 0  # tokens actually sent (and prefilled)
+        self.injected = {f: 0 for f in FAULTS}
+
+    def _split(self, text: str):
+        # Keep the separators so joining the pieces reproduces `text`
+        tokens, word = [], ""
+        for ch in text:
+            word += ch
+            if ch.isspace():
+                tokens.append(word)
+                word = ""
+        if word:
+            tokens.append(word)
+        n = self.chunk_tokens
+        return ["".join(tokens[i:i + n]) for i in range(0, len(tokens), n)]
+
+    def available(self) -> bool:
+        return True
+
+    def _next_fault(self) -> str:
+        with self._lock:
+            self.calls += 1
+            if self.faults:
+                fault = self.faults[(self.calls - 1) % len(self.faults)]
+            else:
+                r = self._rng.random()
+                fault = "ok"
+                for name, rate in (("error", self.error_rate), ("error_mid", self.mid_error_rate), ("slow", self.slow_rate)):
+                    if r < rate:
+                        fault = name
+                        break
+                    r -= rate
+            self.injected[fault] += 1
+            return fault
+
+    def open_stream(self, model_id: str, prompt: str) -> FakeStream:
+        return self._open(prompt)
+
+    def create_context_cache(self, model_id: str, prefix: str, ttl_s: float):
+        if not self.context_cache:
+            return None  # like a backend without context caching
+        with self._lock:
+            handle = f"fake-context-{len(self._contexts)}"
+            self._contexts[handle] = prefix
+        return handle
+
+    def open_cached_stream(self, model_id: str, handle, suffix: str) -> FakeStream:
+        if handle not in self._contexts:
+            raise KeyError(f"unknown context cache {handle!r}")
+        return self._open(suffix)
+
+    def _open(self, sent_text: str) -> FakeStream:
+        fault = self._next_fault()
+        tokens = len(sent_text) / _CHARS_PER_TOKEN
+        with self._lock:
+            self.prompt_tokens += int(tokens)
+        chunk_delay = self.chunk_tokens / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        ttft = self.slow_ttft_s if fault == "slow" else self.ttft_s
+        ttft += self.prefill_s_per_ktok * tokens / 1000
+        fail_at = {"error": 0, "error_mid": len(self._pieces) // 2}.get(fault)
+        return FakeStream(self._pieces, ttft, chunk_delay, fail_at)
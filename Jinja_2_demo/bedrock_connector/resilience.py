@@ -0,0 +1,379 @@
+# bedrock_connector/resilience.py
+"""
+Tail-latency protection for upstream LLM streams.
+
+`ResilientStreamer.stream(open_source)` wraps an async chunk source with:
+
+  * hedging: if the first chunk has not arrived after the `hedge_percentile`
+    of recent time-to-first-chunk, a second identical request is started.
+    The first attempt to produce a chunk wins; the other is cancelled (its
+    worker thread and upstream connection are released)
+  * retries: an attempt that fails before its first chunk is retried with a
+    short jittered backoff, up to `max_attempts` in total
+  * a retry budget: hedges and retries spend tokens that every request
+    refills by `budget_ratio`, so extra load stays a fixed fraction of
+    traffic even when the upstream is slow for everyone
+  * a first-chunk timeout, so a stalled upstream never hangs the caller
+  * a circuit breaker: once `failure_rate` of the recent upstream attempts
+    failed, requests fail fast with CircuitOpenError for `reset_timeout_s`,
+    then a single probe request decides whether to close it again
+
+Once a chunk has been sent to the caller the stream is not retried (the
+caller would see duplicated text); a mid-stream failure is raised as is.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import AsyncIterator, Callable, Optional
+
+_NO_CHUNK = object()
+
+# Exception class names of transient upstream errors (google.api_core and co.)
+_RETRYABLE_NAMES = {
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "ResourceExhausted", "Aborted", "GatewayTimeout", "BadGateway", "RetryError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream is marked unhealthy; the request was not sent."""
+
+
+class FirstChunkTimeout(asyncio.TimeoutError):
+    """No attempt produced a first chunk within `first_chunk_timeout_s`."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient transport/server errors; client errors (bad request, auth) are not."""
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return type(exc).__name__ in _RETRYABLE_NAMES
+
+
+@dataclass
+class ResilienceConfig:
+    hedge: bool = True
+    hedge_percentile: float = 0.95
+    hedge_min_delay_s: float = 0.25
+    hedge_max_delay_s: float = 10.0
+    hedge_default_delay_s: float = 3.0  # until `hedge_min_samples` TTFTs are known
+    hedge_min_samples: int = 20
+    ttft_window: int = 512
+    max_attempts: int = 3  # first request + hedges + retries
+    retry_backoff_s: float = 0.1
+    first_chunk_timeout_s: float = 60.0
+    budget_ratio: float = 0.1
+    budget_min_tokens: float = 10.0
+    failure_rate: float = 0.5  # of the last `breaker_window` attempts
+    breaker_window: int = 50
+    breaker_min_calls: int = 20
+    reset_timeout_s: float = 30.0
+
+    @classmethod
+    def from_settings(cls, settings: Optional[dict]) -> "ResilienceConfig":
+        """From the `llms.gemini.resilience` mapping; unknown keys are ignored."""
+        settings = settings or {}
+        kwargs = {}
+        for f in fields(cls):
+            value = settings.get(f.name)
+            if value is None:
+                continue
+            if isinstance(f.default, bool):
+                kwargs[f.name] = str(value).lower() not in ("0", "false", "no", "off")
+            else:
+                kwargs[f.name] = type(f.default)(value)
+        return cls(**kwargs)
+
+
+class RetryBudget:
+    """
+    Token bucket shared by retries and hedges: each request deposits `ratio`
+    tokens, each extra attempt withdraws one. The balance never drops below
+    zero nor exceeds `min_tokens + ratio * 1000`.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = min_tokens + ratio * 1000
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    closed -> open when at least `failure_rate` of the last `window` upstream
+    attempts failed (after `min_calls`) -> half-open after `reset_timeout_s`,
+    where one probe request closes or re-opens it. Outcomes that arrive
+    while open (attempts launched before the trip) are ignored.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 50,
+        min_calls: int = 20,
+        reset_timeout_s: float = 30.0,
+        clock=time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout_s = reset_timeout_s
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)  # True = failed attempt
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and self._clock() - self._opened_at >= self.reset_timeout_s:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> Optional[str]:
+        """"closed", "probe" (the one half-open trial request) or None (fail fast)."""
+        with self._lock:
+            if self._state == "closed":
+                return "closed"
+            if self._state == "open":
+                if self._clock() - self._opened_at < self.reset_timeout_s:
+                    return None
+                self._state = "half_open"
+            if self._probe_in_flight:
+                return None
+            self._probe_in_flight = True
+            return "probe"
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == "open":
+                return  # only the half-open probe may close it
+            self._outcomes.append(False)
+            if self._state == "half_open":
+                self._state = "closed"
+                self._outcomes.clear()
+                self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == "open":
+                return
+            self._outcomes.append(True)
+            if self._state == "half_open":
+                self._trip()
+            elif self._state == "closed" and len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) >= self.failure_rate * len(self._outcomes):
+                    self._trip()
+
+    def release_probe(self) -> None:
+        """The probe ended without an upstream verdict (e.g. the caller went away)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trip(self) -> None:
+        self._state = "open"
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._probe_in_flight = False
+        self.opened += 1
+
+
+class _Attempt:
+    __slots__ = ("source", "task", "hedge")
+
+    def __init__(self, source: AsyncIterator[str], hedge: bool = False):
+        self.source = source
+        self.hedge = hedge
+        self.task = asyncio.ensure_future(_first_chunk(source))
+
+
+async def _first_chunk(source: AsyncIterator[str]):
+    try:
+        return await source.__anext__()
+    except StopAsyncIteration:
+        return _NO_CHUNK  # empty response: still a successful attempt
+
+
+async def _discard(attempt: _Attempt) -> None:
+    if not attempt.task.done():
+        attempt.task.cancel()
+    await asyncio.gather(attempt.task, return_exceptions=True)
+    try:
+        await attempt.source.aclose()
+    except Exception:
+        pass
+
+
+class ResilientStreamer:
+    def __init__(self, config: Optional[ResilienceConfig] = None, retryable: Callable[[BaseException], bool] = is_retryable):
+        self.config = config or ResilienceConfig()
+        self.retryable = retryable
+        cfg = self.config
+        self.breaker = CircuitBreaker(cfg.failure_rate, cfg.breaker_window, cfg.breaker_min_calls, cfg.reset_timeout_s)
+        self.budget = RetryBudget(self.config.budget_ratio, self.config.budget_min_tokens)
+        self._ttft = deque(maxlen=self.config.ttft_window)
+        self.requests = 0
+        self.attempts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first chunk before sending a hedge."""
+        cfg = self.config
+        samples = list(self._ttft)
+        if len(samples) < cfg.hedge_min_samples:
+            delay = cfg.hedge_default_delay_s
+        else:
+            samples.sort()
+            delay = samples[min(len(samples) - 1, int(cfg.hedge_percentile * len(samples)))]
+        return min(cfg.hedge_max_delay_s, max(cfg.hedge_min_delay_s, delay))
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "budget_exhausted": self.budget_exhausted,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "hedge_delay_s": round(self.hedge_delay(), 4),
+        }
+
+    async def stream(self, open_source: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        admitted = self.breaker.allow()
+        if admitted is None:
+            self.rejected += 1
+            raise CircuitOpenError("upstream circuit is open; failing fast")
+        self.requests += 1
+        self.budget.deposit()
+        attempts = []
+        try:
+            winner = await self._race(open_source, attempts)
+            for other in attempts:
+                if other is not winner:
+                    await _discard(other)
+            first = winner.task.result()
+            if first is not _NO_CHUNK:
+                yield first
+                try:
+                    async for chunk in winner.source:
+                        yield chunk
+                except Exception as e:
+                    # Chunks were already sent: report, do not retry
+                    self._attempt_failed(e)
+                    raise
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            if admitted == "probe":
+                self.breaker.release_probe()  # no-op once the probe recorded an outcome
+            for attempt in attempts:
+                await _discard(attempt)
+
+    def _attempt_failed(self, exc: BaseException) -> None:
+        if self.retryable(exc):
+            self.breaker.record_failure()
+
+    async def _race(self, open_source, attempts) -> _Attempt:
+        """Launch, hedge and retry attempts until one yields its first chunk."""
+        cfg = self.config
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + cfg.first_chunk_timeout_s
+        hedge_at = started + self.hedge_delay() if cfg.hedge else None
+        launched = 0
+        last_error: Optional[BaseException] = None
+
+        def launch(hedge: bool = False) -> None:
+            nonlocal launched
+            attempts.append(_Attempt(open_source(), hedge))
+            launched += 1
+            self.attempts += 1
+
+        def may_add_attempt() -> bool:
+            # Extra attempts need budget and a healthy (closed) circuit
+            if launched >= cfg.max_attempts or self.breaker.state != "closed":
+                return False
+            if self.budget.try_spend():
+                return True
+            self.budget_exhausted += 1
+            return False
+
+        launch()
+        while True:
+            for attempt in [a for a in attempts if a.task.done()]:
+                if not attempt.task.cancelled() and attempt.task.exception() is None:
+                    # From the request start: a winning hedge's own wait is shorter
+                    self._ttft.append(loop.time() - started)
+                    self.hedge_wins += attempt.hedge
+                    self.breaker.record_success()
+                    return attempt
+                if not attempt.task.cancelled():
+                    last_error = attempt.task.exception()
+                    self._attempt_failed(last_error)
+                attempts.remove(attempt)
+                await _discard(attempt)
+
+            now = loop.time()
+            if not attempts:
+                # Every attempt so far failed before its first chunk
+                if last_error is None:
+                    raise RuntimeError("upstream attempt was cancelled")
+                if not self.retryable(last_error) or not may_add_attempt():
+                    raise last_error
+                self.retries += 1
+                await asyncio.sleep(cfg.retry_backoff_s * (0.5 + random.random()) * launched)
+                launch()
+                continue
+
+            if now >= deadline:
+                self.timeouts += 1
+                error = FirstChunkTimeout(f"no first chunk after {cfg.first_chunk_timeout_s:.1f}s")
+                self._attempt_failed(error)
+                raise error
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None  # at most one hedge per request
+                if may_add_attempt():
+                    self.hedges += 1
+                    launch(hedge=True)
+                    continue
+
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            await asyncio.wait(
+                [a.task for a in attempts], timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED
+            )
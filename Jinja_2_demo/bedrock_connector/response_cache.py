@@ -0,0 +1,222 @@
+# bedrock_connector/response_cache.py
+"""
+Content-addressed cache for deterministic (temperature 0) LLM responses.
+
+Two tiers:
+  * in-memory LRU bounded by total response size, with a TTL
+  * optional SQLite file shared by every worker on the host, bounded by
+    `max_disk_bytes` (oldest entries evicted first)
+
+The SQLite calls block: async callers probe the memory tier with
+`get(key, disk=False)` and run full lookups and `put` in a worker thread.
+Memory and disk have separate locks, so a memory probe never waits for a
+disk write.
+
+Keys hash the model id, the generation config and the prompt, so any change
+to one of them is a different entry.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+def cache_key(model_id: str, generation_config: Dict[str, Any], prompt: str) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps(
+        {"model": model_id, "config": generation_config, "prompt": prompt_hash},
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_s: float = 24 * 3600,
+        db_path: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_s = ttl_s
+        # key -> (created_at, response, size in bytes)
+        self._mem: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Bytes this process believes are on disk; recounted before evicting
+        self._disk_bytes = 0
+        if db_path:
+            self._db = self._open_db(db_path)
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expirations = 0
+
+    # ---------- Public API ----------
+    @property
+    def has_disk(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str, disk: bool = True) -> Optional[str]:
+        """
+        Cached response or None. `disk=False` only probes the memory tier and
+        counts nothing on a miss (the full lookup that follows does).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                created, response, _ = entry
+                if now - created <= self.ttl_s:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return response
+                self._drop(key)
+                self.expirations += 1
+            if not disk:
+                return None
+
+        row = self._db_get(key)
+        with self._lock:
+            if row is not None:
+                created, response = row
+                if now - created <= self.ttl_s:
+                    self._mem_put(key, created, response)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return response
+                self.expirations += 1
+            self.misses += 1
+        if row is not None:
+            self._db_delete(key)
+        return None
+
+    def put(self, key: str, response: str) -> None:
+        """Store in both tiers; blocks on the SQLite write when there is a file."""
+        created = time.time()
+        with self._lock:
+            self._mem_put(key, created, response)
+        if self._db is not None:
+            self._db_put(key, created, response)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "expirations": self.expirations,
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+            }
+
+    # ---------- Memory tier ----------
+    def _mem_put(self, key: str, created: float, response: str) -> None:
+        if key in self._mem:
+            self._drop(key)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._mem[key] = (created, response, size)
+        self._mem_bytes += size
+        while self._mem_bytes > self.max_bytes:
+            oldest = next(iter(self._mem))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._mem.pop(key)
+        self._mem_bytes -= size
+
+    # ---------- Disk tier ----------
+    def _open_db(self, db_path: str) -> sqlite3.Connection:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, created REAL NOT NULL, response TEXT NOT NULL, size INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "size" not in [c[1] for c in db.execute("PRAGMA table_info(responses)")]:
+            # Files written before the disk cap
+            db.execute("ALTER TABLE responses ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            db.execute("UPDATE responses SET size = length(CAST(response AS BLOB))")
+        db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_s,))
+        self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return db
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, str]]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT created, response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _db_delete(self, key: str) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._disk_bytes -= self._db_size(key)
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _db_put(self, key: str, created: float, response: str) -> None:
+        size = len(response.encode("utf-8"))
+        if size > self.max_disk_bytes:
+            return
+        with self._db_lock:
+            replaced = self._db_size(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, created, response, size) VALUES (?, ?, ?, ?)",
+                (key, created, response, size),
+            )
+            self._disk_bytes += size - replaced
+            if self._disk_bytes > self.max_disk_bytes:
+                self._db_evict()
+
+    def _db_size(self, key: str) -> int:
+        """Stored size of `key` (0 when absent); caller holds _db_lock."""
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _db_evict(self) -> None:
+        """Delete the oldest entries down to 90% of max_disk_bytes (caller holds _db_lock)."""
+        # Other workers write to the same file: recount before deleting
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_disk_bytes * 9 // 10
+        if total > self.max_disk_bytes:
+            cutoff, freed, n = None, 0, 0
+            for created, size in self._db.execute("SELECT created, size FROM responses ORDER BY created"):
+                if total - freed <= target:
+                    break
+                cutoff, freed, n = created, freed + size, n + 1
+            if cutoff is not None:
+                self._db.execute("DELETE FROM responses WHERE created <= ?", (cutoff,))
+                total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                self.disk_evictions += n
+        self._disk_bytes = total
+
+
+def default_db_path() -> str:
+    """env RESPONSE_CACHE_PATH, else .../Jinja_2_demo/.response_cache.sqlite3"""
+    here = Path(__file__).resolve().parent.parent
+    return os.getenv("RESPONSE_CACHE_PATH") or str(here / ".response_cache.sqlite3")
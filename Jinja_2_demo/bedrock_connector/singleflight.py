@@ -0,0 +1,135 @@
+# bedrock_connector/singleflight.py
+"""
+Single-flight coalescing of identical in-flight streams.
+
+The first caller for a key starts one upstream stream, driven by a background
+task. Every concurrent caller with the same key subscribes to it: chunks that
+are already buffered are replayed first, then new chunks arrive as the
+upstream produces them. Subscribers are independent. One leaving early does
+not affect the others, and the upstream is cancelled only once nobody is
+listening.
+
+The full response is buffered for the lifetime of the flight, which late
+joiners need anyway. A flight is forgotten as soon as its upstream ends, so
+later callers start a fresh stream (or hit the response cache).
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self) -> None:
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    `stream(key, open_source)` yields the chunks of `open_source()`, sharing
+    one upstream between all concurrent callers with the same key.
+
+    `on_complete(text)` runs once per successful upstream with the joined
+    response (used to fill the response cache); an awaitable it returns is
+    awaited by the flight's task.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[int, Hashable], _Flight] = {}
+        self.leaders = 0
+        self.joined = 0
+        self.late_joiners = 0
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "joined": self.joined,
+            "late_joiners": self.late_joiners,
+            "in_flight": len(self._flights),
+        }
+
+    async def stream(
+        self,
+        key: Hashable,
+        open_source: Callable[[], AsyncIterator[str]],
+        on_complete: Optional[Callable[[str], None]] = None,
+    ) -> AsyncIterator[str]:
+        # Flights belong to one event loop (asyncio.Event / Task)
+        fkey = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(fkey)
+        if flight is None:
+            flight = self._flights[fkey] = _Flight()
+            flight.task = asyncio.create_task(self._drive(fkey, flight, open_source, on_complete))
+            self.leaders += 1
+        else:
+            self.joined += 1
+            if flight.chunks:
+                self.late_joiners += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                    yield chunk
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Last listener left: stop the upstream
+                self._forget(fkey, flight)
+                flight.task.cancel()
+
+    async def _drive(self, fkey, flight: _Flight, open_source, on_complete) -> None:
+        source = open_source()
+        try:
+            try:
+                async for chunk in source:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+            finally:
+                await source.aclose()  # closes the upstream on cancel as well
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(fkey, flight)
+            flight.notify()
+
+        if on_complete and flight.chunks:
+            try:
+                result = on_complete("".join(flight.chunks))
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("single-flight on_complete failed")
+
+    def _forget(self, fkey, flight: _Flight) -> None:
+        if self._flights.get(fkey) is flight:
+            del self._flights[fkey]
@@ -0,0 +1,125 @@
+# bedrock_connector/streaming.py
+"""
+Bridge a blocking (sync) stream onto asyncio without blocking the event loop.
+
+The upstream iterator is opened and drained on a worker thread. Items are
+handed to the loop through a bounded queue: when the consumer falls behind,
+the producer thread waits for a free slot instead of buffering the whole
+response. When the consumer stops early (break, aclose, task cancellation)
+the producer is told to stop and the upstream iterator is cancelled/closed.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+import instrumentation
+
+T = TypeVar("T")
+
+DEFAULT_QUEUE_SIZE = 16
+# A stream holds its thread for the whole response, so streams get their own
+# pool instead of competing with the loop's small default executor.
+STREAM_THREADS = int(os.getenv("STREAM_THREADS", "64"))
+# How often a producer blocked on backpressure re-checks for cancellation.
+_SLOT_POLL_S = 0.05
+
+_DONE = object()
+_stream_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_stream_executor() -> ThreadPoolExecutor:
+    global _stream_executor
+    if _stream_executor is None:
+        with _executor_lock:
+            if _stream_executor is None:
+                _stream_executor = ThreadPoolExecutor(
+                    max_workers=STREAM_THREADS, thread_name_prefix="llm-stream"
+                )
+    return _stream_executor
+
+
+def close_upstream(stream) -> None:
+    """Best-effort cancel/close of an upstream iterator (grpc iterators expose cancel())."""
+    for attr in ("cancel", "close"):
+        fn = getattr(stream, attr, None)
+        if callable(fn):
+            try:
+                fn()
+            except Exception:
+                # close() on a generator that is currently executing raises; the
+                # producer closes it itself once next() returns.
+                pass
+
+
+async def aiter_in_thread(
+    open_stream: Callable[[], Iterable[T]],
+    maxsize: int = DEFAULT_QUEUE_SIZE,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[T]:
+    """
+    Async-iterate `open_stream()` with every blocking call (the open itself
+    and each next()) running on `executor` (default: the shared stream pool).
+
+    At most `maxsize` items are buffered between the producer thread and the
+    consumer. Exceptions raised by the upstream are re-raised to the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max(1, maxsize))
+    stop = threading.Event()
+    upstream: list = []
+
+    def _post(item, exc=None) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, exc))
+            return True
+        except RuntimeError:  # loop already closed
+            stop.set()
+            return False
+
+    def _produce() -> None:
+        if instrumentation.ENABLED:
+            # Time spent waiting for a free stream worker
+            instrumentation.observe(
+                "demo_stage_seconds", time.perf_counter() - submitted, stage="executor_hop"
+            )
+        stream = None
+        try:
+            stream = open_stream()
+            upstream.append(stream)
+            for item in stream:
+                # Backpressure: wait for the consumer to free a slot.
+                while not slots.acquire(timeout=_SLOT_POLL_S):
+                    if stop.is_set():
+                        return
+                if stop.is_set() or not _post(item):
+                    return
+        except BaseException as exc:  # re-raised on the consumer side
+            _post(_DONE, exc)
+        else:
+            _post(_DONE)
+        finally:
+            if stream is not None and stop.is_set():
+                close_upstream(stream)
+
+    submitted = time.perf_counter()
+    loop.run_in_executor(executor or _get_stream_executor(), _produce)
+    try:
+        while True:
+            item, exc = await queue.get()
+            if item is _DONE:
+                if exc is not None:
+                    raise exc
+                return
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+        if upstream:
+            close_upstream(upstream[0])
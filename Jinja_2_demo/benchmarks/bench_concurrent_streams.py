@@ -0,0 +1,118 @@
+"""
+Concurrent streaming check for bedrock_connector.streaming.aiter_in_thread.
+
+Runs N fake slow streams concurrently and compares against the previous
+pattern (blocking `for ev in stream` on the event loop). With the threaded
+bridge, N streams should finish in about the time of one.
+
+Usage: python benchmarks/bench_concurrent_streams.py [N]
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_connector.streaming import aiter_in_thread
+
+CHUNKS = 10
+CHUNK_DELAY_S = 0.05
+
+
+class FakeSlowStream:
+    """Blocking iterator that sleeps before every chunk, like a network stream."""
+
+    def __init__(self, chunks=CHUNKS, delay=CHUNK_DELAY_S):
+        self.chunks = chunks
+        self.delay = delay
+        self.produced = 0
+        self.cancelled = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.cancelled.is_set() or self.produced >= self.chunks:
+            raise StopIteration
+        time.sleep(self.delay)
+        self.produced += 1
+        return f"chunk-{self.produced} "
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+async def _blocking_stream():
+    # Previous behaviour: only the open went to the executor.
+    loop = asyncio.get_running_loop()
+    stream = await loop.run_in_executor(None, FakeSlowStream)
+    for ev in stream:
+        yield ev
+
+
+async def _drain(agen):
+    return [piece async for piece in agen]
+
+
+async def _run_concurrent(n, make_agen):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_drain(make_agen()) for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    assert all(len(r) == CHUNKS for r in results)
+    return elapsed
+
+
+async def _check_backpressure():
+    stream = FakeSlowStream(chunks=50, delay=0.001)
+    agen = aiter_in_thread(lambda: stream, maxsize=4)
+    await agen.__anext__()
+    await asyncio.sleep(0.3)          # slow consumer
+    # 1 consumed + 4 buffered + at most 1 held by the blocked producer
+    assert stream.produced <= 6, stream.produced
+    await agen.aclose()
+
+
+async def _check_cancellation():
+    stream = FakeSlowStream(chunks=1000, delay=0.01)
+
+    async def consume():
+        async for _ in aiter_in_thread(lambda: stream):
+            pass
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    assert stream.cancelled.is_set()
+    produced = stream.produced
+    await asyncio.sleep(0.1)
+    assert stream.produced <= produced + 1, "upstream kept running after cancel"
+
+
+async def main(n):
+    one = await _run_concurrent(1, lambda: aiter_in_thread(FakeSlowStream))
+    threaded = await _run_concurrent(n, lambda: aiter_in_thread(FakeSlowStream))
+    blocking = await _run_concurrent(n, _blocking_stream)
+
+    print(f"1 stream (threaded):        {one:.3f}s")
+    print(f"{n} streams (threaded):       {threaded:.3f}s")
+    print(f"{n} streams (blocking loop):  {blocking:.3f}s")
+
+    assert threaded < one * 2, "concurrent streams did not overlap"
+    assert blocking > threaded * 2
+
+    await _check_backpressure()
+    print("backpressure: OK")
+    await _check_cancellation()
+    print("cancellation: OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
@@ -0,0 +1,77 @@
+"""
+Static prompt prefix + provider context cache (prompt v5) vs sending the
+whole prompt: input tokens sent and time to first chunk, against the fake
+backend with a prefill cost per prompt token.
+
+Usage: python benchmarks/bench_context_cache.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.context_cache import ContextCache
+from bedrock_connector.providers import FakeStreamingProvider
+from common import summarize_ms
+from demo_queries import QUERY_INPUTS
+from prompt_constellatiion import render__prompt
+
+# Fake prefill cost; real models are in this range for long prompts
+PREFILL_S_PER_KTOK = 0.2
+
+
+async def first_chunk(prompt):
+    start = time.perf_counter()
+    async for _ in gc.astream_gemini_synthesis("fake-model", prompt):
+        return (time.perf_counter() - start) * 1000
+
+
+def run(label, context_cache, prompts, version):
+    gc.init_connector()  # so the replacement below is not overwritten
+    gc._CONTEXT_CACHE = ContextCache()
+    provider = FakeStreamingProvider(ttft_s=0.1, prefill_s_per_ktok=PREFILL_S_PER_KTOK, context_cache=context_cache)
+    gc.set_provider(provider)
+
+    async def drive():
+        return [await first_chunk(p) for p in prompts]
+    ttft = summarize_ms(asyncio.run(drive()))
+    print(f"  {label:<30} tokens sent/request={provider.prompt_tokens / len(prompts):7.1f}  "
+          f"ttft p50={ttft['ms_p50']:7.1f} ms  context cache={gc.context_cache_stats()}")
+
+
+def make_prompts(n, version):
+    prompts = []
+    for i in range(n):
+        query_type = "table" if i % 2 else "marketshare"
+        inputs = QUERY_INPUTS[query_type]()
+        prompt, _ = render__prompt(
+            subquery=f"Request #{i}: summarize the {query_type} data",
+            table_text="",
+            visualization=inputs["visualization"],
+            user_pref={},
+            table_columns=inputs["table_columns"],
+            table_rows=inputs["table_rows"],
+            columns_metadata=inputs["columns_metadata"],
+            prompt_version=version,
+        )
+        prompts.append(prompt)
+    return prompts
+
+
+def main(n):
+    run("v4, one string", False, make_prompts(n, "v4"), "v4")
+    v5 = make_prompts(n, "v5")
+    run("v5, backend without cache", False, v5, "v5")
+    run("v5, prefix via context cache", True, v5, "v5")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
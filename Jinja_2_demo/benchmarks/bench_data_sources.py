@@ -0,0 +1,103 @@
+"""
+TABLE prompts from large extracts: loading the file into a list of dicts
+(what handle_query does with its in-memory rows) vs a CsvSource (and a
+ParquetSource when pyarrow is installed) that decodes only the rows the HTML
+table and the prompt's token budget can show.
+
+Reports the render__prompt time and the peak Python heap (tracemalloc) per
+file size, plus the time to serve a page deep into the file twice (the
+second seek starts from a remembered checkpoint).
+
+Usage: python benchmarks/bench_data_sources.py [rows ...]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_sources import CsvSource, open_source, parse_cell
+from pagination import TablePager, encode_cursor
+from prompt_constellatiion import render__prompt
+
+COLUMNS = ["physician_id", "physician_name", "specialty", "drug_name",
+           "prescriptions_count", "total_patients", "avg_dosage_mg", "region"]
+VISUALIZATION = {"chart_type": "TABLE", "title": "Top Prescribers Analysis"}
+# Above this, the list-of-dicts baseline takes too much RAM to be worth running
+BASELINE_MAX_ROWS = 200_000
+
+
+def write_csv(path, n):
+    rng = random.Random(5)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        for i in range(n):
+            w.writerow([f"HCP{i:07d}", f"Dr. Name {i}", rng.choice(["Cardiology", "Neurology", "Endocrinology"]),
+                        rng.choice(["Metformin", "Atorvastatin", "Lisinopril"]), rng.randint(1, 900),
+                        rng.randint(1, 800), rng.choice([10, 20, 40]), rng.choice(["West", "South", "Midwest"])])
+
+
+def load_records(path):
+    with open(path, newline="") as f:
+        return [{k: parse_cell(v) for k, v in row.items()} for row in csv.DictReader(f)]
+
+
+def measure(fn):
+    """(seconds, peak heap bytes): timed without tracemalloc, then measured with it."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def render(rows):
+    return render__prompt("Top prescribers", "", VISUALIZATION, {}, COLUMNS, rows, {})
+
+
+def try_parquet(csv_path):
+    try:
+        import pyarrow.csv as pcsv
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    path = csv_path[:-4] + ".parquet"
+    pq.write_table(pcsv.read_csv(csv_path), path, row_group_size=64 * 1024)
+    return path
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"extract_{n}.csv")
+            write_csv(path, n)
+            print(f"{n:,} rows, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+            if n <= BASELINE_MAX_ROWS:
+                elapsed, peak = measure(lambda: render(load_records(path)))
+                print(f"  list of dicts         {elapsed * 1000:8.1f} ms  peak heap {peak / 1e6:8.2f} MB")
+            elapsed, peak = measure(lambda: render(CsvSource(path)))
+            print(f"  CsvSource             {elapsed * 1000:8.1f} ms  peak heap {peak / 1e6:8.2f} MB")
+            parquet = try_parquet(path)
+            if parquet:
+                elapsed, peak = measure(lambda: render(open_source(parquet)))
+                print(f"  ParquetSource         {elapsed * 1000:8.1f} ms  peak heap {peak / 1e6:8.2f} MB")
+
+            pager = TablePager()
+            result_id = pager.store(COLUMNS, CsvSource(path))
+            cursor = encode_cursor(result_id, int(n * 0.9), 50)
+            first, _ = measure(lambda: pager.rows(cursor))
+            again, _ = measure(lambda: pager.rows(cursor))
+            print(f"  page at row {int(n * 0.9):,}: {first * 1000:.1f} ms first, {again * 1000:.1f} ms after (checkpoints)")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [20_000, 200_000, 2_000_000])
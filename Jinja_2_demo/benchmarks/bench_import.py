@@ -0,0 +1,41 @@
+"""
+Cold-start benchmark: wall time of a fresh interpreter importing the
+Gemini connector. Provider setup is deferred, so this must not need network
+access or credentials.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE = "pass"
+IMPORT = "import bedrock_connector.gemini_connector"
+
+
+def time_run(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def main(runs):
+    env = dict(os.environ, ENV=os.getenv("ENV", "DEV"), GEMINI_CREDENTIAL_SOURCE="env")
+    env.pop("GEMINI_API_KEY", None)   # prove no credential is needed at import
+
+    base = [time_run(BASELINE, env) for _ in range(runs)]
+    imp = [time_run(IMPORT, env) for _ in range(runs)]
+    interpreter = statistics.median(base)
+    total = statistics.median(imp)
+    print(f"interpreter startup: {interpreter:7.1f} ms (median of {runs})")
+    print(f"connector import:    {total:7.1f} ms (median of {runs})")
+    print(f"import cost:         {total - interpreter:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
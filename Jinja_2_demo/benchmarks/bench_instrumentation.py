@@ -0,0 +1,56 @@
+"""
+Instrumentation overhead: cost of span()/observe() when disabled vs enabled,
+and a full render__prompt with instrumentation off and on.
+
+Usage: python benchmarks/bench_instrumentation.py
+"""
+
+import os
+import sys
+import time
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import make_table, summarize_ms, time_calls
+
+import instrumentation
+from instrumentation import observe, span
+from prompt_constellatiion import render__prompt
+
+CALLS = 200_000
+
+
+def per_call_ns(fn):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        fn()
+    return (time.perf_counter() - start) / CALLS * 1e9
+
+
+def spanned():
+    with span("bench"):
+        pass
+
+
+def observed():
+    observe("demo_stage_seconds", 0.001, stage="bench")
+
+
+def main():
+    columns, rows, metadata = make_table(1_000)
+    kwargs = dict(
+        subquery="Top prescribers", table_text="", visualization={"chart_type": "TABLE"},
+        table_columns=columns, table_rows=rows, columns_metadata=metadata,
+    )
+    for flag in (False, True):
+        instrumentation.enable(flag)
+        render = summarize_ms(time_calls(lambda: render__prompt(**kwargs), repeat=20))
+        print(f"enabled={flag!s:<5}  span {per_call_ns(spanned):7.0f} ns  "
+              f"observe {per_call_ns(observed):7.0f} ns  render__prompt p50 {render['ms_p50']:.2f} ms")
+    print()
+    print(instrumentation.export_prometheus().split("# HELP demo_stage_seconds_window")[0][:1200])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Intent routing throughput: the original per-intent `any(word in query)` scan
+vs the compiled IntentRouter (uncached, cached, classify_many, and with the
+hashing-vector fallback), for the 2 demo intents and for a 40-intent catalogue.
+
+Usage: python benchmarks/bench_intent_router.py [n_queries]
+"""
+
+import os
+import random
+import sys
+import time
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import DEFAULT_INTENTS, HashingEmbedder, Intent, IntentRouter
+
+FILLER = ["give", "me", "the", "show", "by", "for", "last", "quarter", "top", "ten", "please", "Q3", "2024"]
+
+
+def make_catalogue(n_intents, keywords_per_intent=8):
+    """Demo intents plus synthetic visualization types with distinct keywords."""
+    intents = list(DEFAULT_INTENTS)
+    for i in range(n_intents - len(intents)):
+        intents.append(Intent(f"viz_{i}", tuple(f"viz{i}kw{k}" for k in range(keywords_per_intent))))
+    return intents
+
+
+def make_queries(intents, n, unique):
+    """`n` queries drawn from `unique` distinct ones; ~20% hit no keyword."""
+    rng = random.Random(7)
+    pool = []
+    for _ in range(unique):
+        words = rng.sample(FILLER, 4)
+        if rng.random() > 0.2:
+            words.insert(rng.randrange(5), rng.choice(rng.choice(intents).keywords))
+        pool.append(" ".join(words))
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def legacy_classifier(intents):
+    """The original classify_query shape, generalized to many intents."""
+    table = [(i.name, list(i.keywords)) for i in intents]
+
+    def classify(query):
+        query_lower = query.lower()
+        for name, words in table:
+            if any(word in query_lower for word in words):
+                return name
+        return "unknown"
+    return classify
+
+
+def rate(label, fn, queries, batch=False):
+    start = time.perf_counter()
+    if batch:
+        fn(queries)
+    else:
+        for q in queries:
+            fn(q)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {len(queries) / elapsed:>12,.0f} q/s  {elapsed / len(queries) * 1e6:8.2f} us/q")
+
+
+def run(n_intents, n_queries):
+    intents = make_catalogue(n_intents)
+    queries = make_queries(intents, n_queries, unique=n_queries)  # mostly distinct
+    repeated = make_queries(intents, n_queries, unique=200)       # gateway traffic
+    print(f"\n{len(intents)} intents, {sum(len(i.keywords) for i in intents)} keywords, {n_queries:,} queries")
+
+    rate("legacy any() scan", legacy_classifier(intents), queries)
+    rate("router (no cache)", IntentRouter(intents, cache_size=0).classify, queries)
+    rate("router (cached, 200 distinct)", IntentRouter(intents).classify, repeated)
+    rate("router.classify_many (no cache)", IntentRouter(intents, cache_size=0).classify_many, queries, batch=True)
+    vec = IntentRouter(intents, cache_size=0, embedder=HashingEmbedder())
+    rate("router + vectors, one at a time", vec.classify, queries[: n_queries // 10])
+    rate("router + vectors, classify_many", vec.classify_many, queries, batch=True)
+
+    legacy = legacy_classifier(intents)
+    agree = sum(legacy(q) == r for q, r in zip(queries, IntentRouter(intents).classify_many(queries)))
+    print(f"  agreement with legacy (priority mode): {agree}/{len(queries)}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    for n_intents in (2, 40):
+        run(n_intents, n)
+
+
+if __name__ == "__main__":
+    main()
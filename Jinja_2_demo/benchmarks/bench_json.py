@@ -0,0 +1,74 @@
+"""
+JSON serialization microbenchmark: Jinja's builtin `tojson` path vs the
+shared json_backend serializer (orjson when installed, with per-render memo).
+
+Usage: python benchmarks/bench_json.py
+       JSON_BACKEND=json python benchmarks/bench_json.py   # stdlib fallback
+"""
+
+import os
+import sys
+import time
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment
+from jinja2.utils import htmlsafe_json_dumps
+
+import json_backend
+from json_backend import install_tojson, render_scope
+
+SIZES = (1_000, 10_000, 100_000)
+# The v3 human message serializes the same rows more than once
+TEMPLATE = "{{ rows | tojson(indent=2) }}\n{{ rows | tojson }}\n{{ rows | tojson(indent=2) }}"
+
+
+def make_rows(n):
+    return [
+        {
+            "physician_id": f"HCP{i:06d}",
+            "physician_name": f"Dr. Example {i}",
+            "specialty": "Cardiology",
+            "prescriptions_count": i % 997,
+            "avg_dosage_mg": (i % 40) * 2.5,
+            "region": "Northeast",
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    print(f"backend: {json_backend.BACKEND}")
+    builtin_env = Environment()
+    shared_env = Environment()
+    install_tojson(shared_env)
+    builtin_tpl = builtin_env.from_string(TEMPLATE)
+    shared_tpl = shared_env.from_string(TEMPLATE)
+
+    def shared_render(rows):
+        with render_scope():
+            return shared_tpl.render(rows=rows)
+
+    print(f"{'rows':>8} {'builtin dumps':>14} {'backend dumps':>14} {'builtin render':>15} {'shared render':>14}")
+    for n in SIZES:
+        rows = make_rows(n)
+        repeat = 5 if n < 100_000 else 2
+        builtin_dumps = best_of(lambda: htmlsafe_json_dumps(rows, sort_keys=True, indent=2), repeat)
+        backend_dumps = best_of(lambda: json_backend.dumps(rows, indent=2, sort_keys=True), repeat)
+        builtin_render = best_of(lambda: builtin_tpl.render(rows=rows), repeat)
+        shared = best_of(lambda: shared_render(rows), repeat)
+        print(f"{n:>8} {builtin_dumps:>12.1f}ms {backend_dumps:>12.1f}ms {builtin_render:>13.1f}ms {shared:>12.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+MARKETSHARE_GRAPH at scale: prompt size and render time with the raw nested
+rows (v3) vs the NumPy pivot (v4: top products + "Other" and a summary).
+
+Usage: python benchmarks/bench_marketshare.py [regions] [products]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import make_marketshare
+
+from json_backend import dumps
+from marketshare import MarketSharePivot
+from prompt_constellatiion import marketshare_payload, render__prompt
+
+
+def render(rows, version):
+    stats = {}
+    start = time.perf_counter()
+    render__prompt(
+        subquery="Market share by region",
+        table_text=dumps(rows) if version == "v3" else "",
+        visualization={"chart_type": "MARKETSHARE_GRAPH", "title": "Market Share"},
+        user_pref={"format": "chart"},
+        table_columns=["region", "drug", "prescription_volume"],
+        table_rows=rows,
+        columns_metadata={"region": "Region", "drug": "Product", "prescription_volume": "Volume"},
+        prompt_version=version,
+        stats=stats,
+    )
+    return (time.perf_counter() - start) * 1000, stats["prompt_tokens"]
+
+
+def main(n_regions, n_products):
+    rows = make_marketshare(n_regions, n_products)
+    print(f"{n_regions} regions x {n_products} products = {n_regions * n_products:,} cells")
+
+    for version in ("v3", "v4"):
+        ms, tokens = render(rows, version)
+        print(f"  render {version}: {ms:8.1f} ms  prompt ~{tokens:,} tokens")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    pivot = MarketSharePivot.from_nested(rows)
+    build_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    payload = marketshare_payload(pivot)
+    shares = pivot.shares()
+    payload_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  pivot build {build_ms:.1f} ms, payload+shares {payload_ms:.1f} ms, peak {peak / 1e6:.1f} MB")
+    print(f"  matrix {pivot.values.nbytes / 1e6:.1f} MB dense, shares {shares.shape}, "
+          f"payload yAxis {len(payload['plottinggraph'][0]['yAxis'])} entries")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*(args + [2_000, 500][len(args):]))
@@ -0,0 +1,57 @@
+"""
+Paginated TABLE delivery: page latency and per-page memory at the start,
+middle and end of a large stored result, plus incremental row batches.
+
+Both should stay flat as the offset (and the result size) grows.
+
+Usage: python benchmarks/bench_pagination.py [rows ...]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_table import make_columnar
+from common import TABLE_COLUMNS, make_table, summarize_ms, time_calls
+
+from pagination import TablePager
+
+
+def page_cost(pager, cursor):
+    """(latency summary, peak traced bytes) of rendering one page."""
+    samples = time_calls(lambda: pager.page(cursor), repeat=20)
+    tracemalloc.start()
+    pager.page(cursor)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize_ms(samples), peak
+
+
+def run(n_rows):
+    _, dict_rows, metadata = make_table(n_rows)
+    for label, rows in (("dicts", dict_rows), ("columnar", make_columnar(n_rows))):
+        pager = TablePager()
+        result_id = pager.store(TABLE_COLUMNS, rows, metadata)
+        print(f"\n{n_rows:,} rows ({label})")
+        for where, offset in (("first", 0), ("middle", n_rows // 2), ("last", n_rows - pager.page_size)):
+            stats, peak = page_cost(pager, pager.cursor(result_id, offset))
+            print(f"  page @ {where:<6} p50 {stats['ms_p50']:7.2f} ms  peak {peak / 1024:7.1f} KiB")
+
+        start = time.perf_counter()
+        batches = sum(1 for _ in pager.iter_batches(pager.cursor(result_id, n_rows // 2), batch_rows=200, max_rows=10_000))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  incremental: {batches} x 200-row batches from the middle in {elapsed:.1f} ms")
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 1_000_000]
+    for n in sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Prompt size: summarizer v3 (rows repeated, indented JSON) vs v4 (columnar,
+token-budgeted, each table once).
+
+Usage: python benchmarks/bench_prompt_size.py [rows] [columns]
+"""
+
+import json
+import os
+import sys
+import time
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_constellatiion as pc
+from prompt_constellatiion import render__prompt
+from table_encoder import STRATEGIES
+
+
+def make_table(n_rows, n_cols):
+    columns = [f"metric_{i}" for i in range(n_cols - 2)] + ["physician_id", "region"]
+    regions = ["Northeast", "South", "Midwest", "West"]
+    rows = []
+    for r in range(n_rows):
+        row = {f"metric_{i}": (r * 31 + i * 7) % 1000 for i in range(n_cols - 2)}
+        row["physician_id"] = f"HCP{r:05d}"
+        row["region"] = regions[r % 4]
+        rows.append(row)
+    return columns, rows
+
+
+def measure(**kwargs):
+    stats = {}
+    start = time.perf_counter()
+    prompt, _ = render__prompt(stats=stats, **kwargs)
+    return stats, (time.perf_counter() - start) * 1000
+
+
+def main(n_rows, n_cols):
+    columns, rows = make_table(n_rows, n_cols)
+    base = dict(
+        subquery="Top prescribers by region",
+        table_text=json.dumps(rows),
+        visualization={"chart_type": "TABLE", "title": "Top Prescribers"},
+        user_pref={"format": "detailed"},
+        table_columns=columns,
+        table_rows=rows,
+        columns_metadata={c: f"Description of {c}" for c in columns},
+    )
+
+    v3, v3_ms = measure(prompt_version="v3", **base)
+    print(f"{n_rows} rows x {n_cols} cols")
+    print(f"  v3                 {v3['prompt_tokens']:>9} tokens  {v3_ms:8.1f} ms")
+    for budget in (None, 4000, 1000):
+        for strategy in STRATEGIES if budget else ("full",):
+            if budget:
+                pc.TABLE_ENCODE_STRATEGY = strategy
+            v4, v4_ms = measure(token_budget=budget, **base)
+            label = f"{pc.PROMPT_VERSION} budget={budget or '-'} {strategy}"
+            print(
+                f"  {label:<30} {v4['prompt_tokens']:>9} tokens  {v4_ms:8.1f} ms"
+                f"  rows {v4['rows_out']}/{v4['rows_in']}"
+                f"  ({v4['prompt_tokens'] / v3['prompt_tokens']:.1%} of v3)"
+            )
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*(args + [500, 20][len(args):]))
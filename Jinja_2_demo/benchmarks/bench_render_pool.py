@@ -0,0 +1,89 @@
+"""
+Event-loop stalls while a very large table renders: render__prompt on the
+loop, in a thread (asyncio.to_thread), and through the render pool, while
+fake streams run on the same loop.
+
+Reports the render latency, the loop's worst scheduling lag (a 5 ms ticker)
+and the worst gap between chunks of the concurrent streams.
+
+Usage: python benchmarks/bench_render_pool.py [rows] [streams]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.providers import FakeStreamingProvider
+from common import make_table
+from prompt_constellatiion import render__prompt
+from render_pool import RenderPool
+
+TICK_S = 0.005
+VISUALIZATION = {"chart_type": "TABLE", "title": "Top Prescribers Analysis"}
+
+
+async def ticker(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append(time.perf_counter() - start - TICK_S)
+
+
+async def stream(i, gaps):
+    last = time.perf_counter()
+    async for _ in gc.astream_gemini_synthesis("fake-model", f"prompt {i}"):
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def scenario(mode, pool, kwargs, n_streams):
+    lags, gaps, stop = [], [], asyncio.Event()
+    tick = asyncio.create_task(ticker(stop, lags))
+    streams = [asyncio.create_task(stream(i, gaps)) for i in range(n_streams)]
+    await asyncio.sleep(0.5)  # streams past their first chunk
+
+    start = time.perf_counter()
+    if mode == "on the loop":
+        render__prompt(**kwargs)
+    elif mode == "to_thread":
+        await asyncio.to_thread(render__prompt, **kwargs)
+    else:
+        await pool.render_prompt(**kwargs)
+    render_s = time.perf_counter() - start
+
+    await asyncio.gather(*streams)
+    stop.set()
+    await tick
+    print(f"  {mode:<12} render={render_s * 1000:7.0f} ms  worst loop lag={max(lags) * 1000:7.1f} ms  "
+          f"worst chunk gap={max(gaps[n_streams:]) * 1000:7.1f} ms")
+
+
+def main(rows, n_streams):
+    gc.set_provider(FakeStreamingProvider(ttft_s=0.1, tokens_per_s=200, response="word " * 400))
+    table_columns, table_rows, columns_metadata = make_table(rows)
+    kwargs = dict(subquery="Top prescribers", table_text="", visualization=VISUALIZATION, user_pref={},
+                  table_columns=table_columns, table_rows=table_rows, columns_metadata=columns_metadata)
+    pool = RenderPool()
+    start = time.perf_counter()
+    pool.warm()
+    print(f"{rows:,} rows, {n_streams} concurrent streams, {pool.workers} render workers "
+          f"(warm-up {time.perf_counter() - start:.1f} s)")
+    for mode in ("on the loop", "to_thread", "render pool"):
+        asyncio.run(scenario(mode, pool, kwargs, n_streams))
+    stats = pool.stats()
+    print("  pool:", {k: stats[k] for k in ("pooled", "shm_bytes", "pool_latency", "pool_wait")})
+    pool.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 16)
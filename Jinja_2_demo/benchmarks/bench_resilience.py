@@ -0,0 +1,95 @@
+"""
+Hedging, retries and circuit breaking against the fault-injecting fake
+backend, through astream_gemini_synthesis (response cache off, unique
+prompts so single-flight does not coalesce).
+
+Scenarios:
+  slow tail     10% of calls have a 2 s first chunk (normal: 0.2 s)
+  flaky         20% of calls fail before the first chunk
+  outage        every call fails; the breaker should start failing fast
+
+Usage: python benchmarks/bench_resilience.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.providers import FakeStreamingProvider
+from bedrock_connector.resilience import ResilienceConfig, ResilientStreamer
+from common import summarize_ms
+
+CONCURRENCY = 16
+
+
+async def one(i, results):
+    start = time.perf_counter()
+    ttft = None
+    try:
+        async for _ in gc.astream_gemini_synthesis("fake-model", f"prompt {i}"):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        results.append(("ok", ttft * 1000, time.perf_counter() - start))
+    except Exception as e:
+        results.append((type(e).__name__, None, time.perf_counter() - start))
+
+
+async def drive(n):
+    results, sem = [], asyncio.Semaphore(CONCURRENCY)
+
+    async def guarded(i):
+        async with sem:
+            await one(i, results)
+    await asyncio.gather(*(guarded(i) for i in range(n)))
+    return results
+
+
+def run(label, provider, n, enabled, config):
+    gc.init_connector()  # so the replacements below are not overwritten
+    gc.RESILIENCE_ENABLED = enabled
+    gc._RESILIENCE = ResilientStreamer(config)
+    gc.set_provider(provider)
+    start = time.perf_counter()
+    results = asyncio.run(drive(n))
+    wall = time.perf_counter() - start
+    ok = [r for r in results if r[0] == "ok"]
+    errors = {}
+    for kind, _, _ in results:
+        if kind != "ok":
+            errors[kind] = errors.get(kind, 0) + 1
+    ttft = summarize_ms([r[1] for r in ok]) if ok else {}
+    slowest_error = max((r[2] for r in results if r[0] != "ok"), default=0.0)
+    print(f"  {label:<11} resilience={'on ' if enabled else 'off'} ok={len(ok):>4}/{n}  "
+          f"ttft p50={ttft.get('ms_p50', 0):7.1f} p95={ttft.get('ms_p95', 0):7.1f} ms  "
+          f"upstream calls={provider.calls:<4} errors={errors} slowest error={slowest_error:.2f}s  wall={wall:.1f}s")
+    if enabled:
+        stats = gc.resilience_stats()
+        print("             ", {k: stats[k] for k in ("hedges", "hedge_wins", "retries", "budget_exhausted", "rejected", "breaker")})
+
+
+def main(n):
+    # Warm TTFT window quickly so the percentile (not the default) drives hedging
+    config = ResilienceConfig(hedge_min_samples=10, retry_backoff_s=0.05, reset_timeout_s=30.0)
+    fast = dict(ttft_s=0.2, tokens_per_s=2000)
+
+    print("slow tail")
+    for enabled in (False, True):
+        run("slow tail", FakeStreamingProvider(**fast, slow_rate=0.1, slow_ttft_s=2.0, seed=1), n, enabled, config)
+    print("flaky")
+    for enabled in (False, True):
+        run("flaky", FakeStreamingProvider(**fast, error_rate=0.2, seed=2), n, enabled, config)
+    print("outage")
+    for enabled in (False, True):
+        run("outage", FakeStreamingProvider(**fast, error_rate=1.0, seed=3), n, enabled, config)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,92 @@
+"""
+Retrieval on CPU: incremental re-indexing, index open time, and query
+throughput of one query at a time (the notebook's retrieve_with_rerank)
+vs retrieve_many batches.
+
+Uses the sentence-transformers models when they are installed, otherwise
+the offline fallbacks (HashingEmbedder + OverlapReranker).
+
+Usage: python benchmarks/bench_retrieval.py [documents] [queries]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import Document, Retriever, VectorIndex, load_embedder, load_reranker
+
+BATCH_SIZES = (8, 32, 128)
+
+
+def corpus(n_docs, words_per_doc=500):
+    rng = random.Random(7)
+    vocab = [f"{rng.choice('bcdfgklmnprstv')}{rng.choice('aeiou')}{rng.choice('lmnrst')}{rng.choice('aeiou')}{i % 97}"
+             for i in range(3000)]
+    docs = []
+    for d in range(n_docs):
+        sentences = []
+        for _ in range(words_per_doc // 10):
+            sentences.append(" ".join(rng.choice(vocab) for _ in range(10)).capitalize() + ".")
+        docs.append(Document(f"doc-{d}", " ".join(sentences)))
+    queries = [" ".join(rng.choice(vocab) for _ in range(6)) for _ in range(n_docs)]
+    return docs, queries
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def agreement(results, reference):
+    """Share of queries with the same hits (batched matmuls can reorder near-tied scores)."""
+    same = sum([(h.doc_id, h.seq) for h in a] == [(h.doc_id, h.seq) for h in b] for a, b in zip(results, reference))
+    return same / max(1, len(reference))
+
+
+def main(n_docs, n_queries):
+    docs, queries = corpus(n_docs)
+    queries = queries[:n_queries]
+    embedder, reranker = load_embedder(), load_reranker()
+    with tempfile.TemporaryDirectory() as tmp:
+        index = VectorIndex(tmp, embedder)
+        print(f"{n_docs:,} documents, embedder={index.embedder_id}, reranker={getattr(reranker, 'name', reranker)}")
+
+        elapsed, counts = timed(lambda: index.upsert(docs))
+        print(f"  index (cold)            {elapsed:7.2f} s  embedded={counts['embedded']:,} chunks")
+        elapsed, counts = timed(lambda: index.upsert(docs))
+        print(f"  re-index, unchanged     {elapsed:7.2f} s  embedded={counts['embedded']:,}")
+        edited = [Document(d.doc_id, d.text + " Revised figures follow.") if i % 20 == 0 else d
+                  for i, d in enumerate(docs)]
+        elapsed, counts = timed(lambda: index.upsert(edited))
+        print(f"  re-index, 5% edited     {elapsed:7.2f} s  embedded={counts['embedded']:,}")
+
+        stats = index.stats()
+        index.close()
+        elapsed, index = timed(lambda: VectorIndex(tmp, embedder))
+        vector_file = next(p for p in os.listdir(tmp) if p.endswith(".f32"))
+        load_s, _ = timed(lambda: np.fromfile(os.path.join(tmp, vector_file), dtype=np.float32))
+        print(f"  open (memmap)           {elapsed * 1000:7.1f} ms  vs reading all vectors {load_s * 1000:.1f} ms "
+              f"({stats['vector_bytes'] / 1e6:.1f} MB, {stats['live']:,} chunks)")
+
+        retriever = Retriever(index, reranker)
+        retriever.retrieve_many(queries[:8])  # warm-up
+        elapsed, single = timed(lambda: [retriever.retrieve(q) for q in queries])
+        print(f"  one query at a time     {len(queries) / elapsed:7.1f} queries/s")
+        for size in BATCH_SIZES:
+            elapsed, batched = timed(lambda: [hits for i in range(0, len(queries), size)
+                                              for hits in retriever.retrieve_many(queries[i:i + size])])
+            print(f"  retrieve_many({size:>3})      {len(queries) / elapsed:7.1f} queries/s  "
+                  f"(same hits for {agreement(batched, single):.1%} of queries)")
+        index.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 512)
@@ -0,0 +1,98 @@
+"""
+Session memory at scale: the notebook pattern (unbounded `store = {}` of
+message lists, the full history re-sent on every turn, or trimmed with
+`messages[-k:]`) vs SessionMemory (token window + rolling summary, LRU of
+hot sessions, SQLite behind it).
+
+Reports the Python heap held after the run (tracemalloc), the history size
+sent with the last follow-up, and the time per recorded exchange.
+
+Usage: python benchmarks/bench_session_memory.py [sessions] [turns per session]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bedrock_connector.providers import DEFAULT_FAKE_RESPONSE
+from session_memory import SessionMemory
+from table_encoder import estimate_tokens
+
+ANSWER = DEFAULT_FAKE_RESPONSE.split("```", 2)[2].strip()  # prose of a typical answer
+
+
+def traffic(n_sessions, turns):
+    """Interleaved session ids, like concurrent users."""
+    rng = random.Random(3)
+    order = [f"session-{s}" for s in range(n_sessions) for _ in range(turns)]
+    rng.shuffle(order)
+    return order
+
+
+def exchanges(order):
+    """(session, question, answer), built as they arrive: real answers are fresh strings."""
+    for i, sid in enumerate(order):
+        yield sid, f"Follow-up {i}: how does region {i % 7} compare with last quarter?", f"{ANSWER}\n(answer {i})"
+
+
+def notebook_store(events, k=None):
+    store = {}
+    last = ""
+    for sid, question, answer in exchanges(events):
+        hist = store.setdefault(sid, [])
+        if k is not None:
+            hist[:] = hist[-k:]
+        last = "\n".join(hist)
+        hist.extend((question, answer))
+    return store, last
+
+
+def session_memory(events, db_path, max_sessions):
+    memory = SessionMemory(db_path=db_path, max_sessions=max_sessions)
+    last = ""
+    for sid, question, answer in exchanges(events):
+        last = memory.window(sid).render()
+        memory.add_exchange(sid, question, answer)
+    return memory, last
+
+
+def measure(label, fn):
+    """Timed without tracemalloc (it slows allocation-heavy code), then measured with it."""
+    start = time.perf_counter()
+    kept, _ = fn()
+    elapsed = time.perf_counter() - start
+    if isinstance(kept, SessionMemory):
+        kept.close()
+    del kept
+    tracemalloc.start()
+    kept, last = fn()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return label, held, estimate_tokens(last), elapsed, kept
+
+
+def main(n_sessions, turns):
+    events = traffic(n_sessions, turns)
+    print(f"{n_sessions:,} sessions x {turns} turns = {len(events):,} exchanges")
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [
+            measure("store = {} (full history)", lambda: notebook_store(events)),
+            measure("store = {} + messages[-4:]", lambda: notebook_store(events, k=4)),
+            measure("SessionMemory, 1000 hot", lambda: session_memory(events, tempfile.mktemp(dir=tmp), 1000)),
+            measure("SessionMemory, 100 hot", lambda: session_memory(events, tempfile.mktemp(dir=tmp), 100)),
+        ]
+        for label, held, history_tokens, elapsed, kept in runs:
+            print(f"  {label:<28} heap held={held / 1e6:7.2f} MB  last history={history_tokens:6,} tokens  "
+                  f"{elapsed / len(events) * 1e6:7.1f} us/exchange")
+            if isinstance(kept, SessionMemory):
+                kept.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 30)
@@ -0,0 +1,56 @@
+"""
+Single-flight coalescing under a refresh storm: N concurrent identical
+requests (plus late joiners arriving mid-stream) against the fake backend.
+Reports upstream calls and latency with coalescing on and off.
+
+Usage: python benchmarks/bench_singleflight.py [clients]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.providers import FakeStreamingProvider
+
+PROMPT = "Summarize the top prescribers by region"
+
+
+async def one(delay):
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    text = "".join([piece async for piece in gc.astream_gemini_synthesis("fake-model", PROMPT)])
+    return text, time.perf_counter() - start
+
+
+async def storm(clients):
+    # A quarter of the callers join while the first stream is already producing
+    delays = [0.0 if i % 4 else 0.4 for i in range(clients)]
+    return await asyncio.gather(*(one(d) for d in delays))
+
+
+def main(clients):
+    gc.init_connector()  # so the override below is not overwritten
+    for enabled in (False, True):
+        gc.SINGLE_FLIGHT_ENABLED = enabled
+        provider = FakeStreamingProvider(ttft_s=0.3, tokens_per_s=200)
+        gc.set_provider(provider)
+        start = time.perf_counter()
+        results = asyncio.run(storm(clients))
+        wall = time.perf_counter() - start
+        texts = {t for t, _ in results}
+        slowest = max(lat for _, lat in results)
+        print(f"single_flight={enabled!s:<5} clients={clients} upstream calls={provider.calls:<4} "
+              f"identical={len(texts) == 1} slowest={slowest:.2f}s wall={wall:.2f}s")
+    print("stats:", gc.single_flight_stats())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
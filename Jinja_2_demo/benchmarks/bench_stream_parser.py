@@ -0,0 +1,79 @@
+"""
+When can a frontend draw the chart? Time to the chart_ready event vs time to
+the full response, streaming the canned answer (chart block first, then the
+Markdown sections, padded to a realistic length) from the fake backend
+through astream_events. Also the parser's own cost per streamed character.
+
+Usage: python benchmarks/bench_stream_parser.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ["RESILIENCE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.providers import DEFAULT_FAKE_RESPONSE, FakeStreamingProvider
+from common import summarize_ms
+from stream_parser import ChartReady, SectionStart, StreamParser, astream_events
+
+# ~600 tokens of insights after the chart block
+PADDING = "".join(f"- Observation {i}: adoption differs by region and specialty.\n" for i in range(60))
+RESPONSE = DEFAULT_FAKE_RESPONSE.replace("### Business Implication", PADDING + "\n### Business Implication")
+
+
+async def one(i, results):
+    start = time.perf_counter()
+    chart = first_section = None
+    async for event in astream_events("fake-model", f"prompt {i}"):
+        if isinstance(event, ChartReady) and chart is None:
+            chart = time.perf_counter() - start
+        elif isinstance(event, SectionStart) and first_section is None:
+            first_section = time.perf_counter() - start
+    results.append((chart * 1000, first_section * 1000, (time.perf_counter() - start) * 1000))
+
+
+async def drive(n, concurrency=8):
+    results, sem = [], asyncio.Semaphore(concurrency)
+
+    async def guarded(i):
+        async with sem:
+            await one(i, results)
+    await asyncio.gather(*(guarded(i) for i in range(n)))
+    return results
+
+
+def parser_cost(repeat=2000):
+    pieces = FakeStreamingProvider(response=RESPONSE)._pieces
+    chars = len(RESPONSE) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser = StreamParser()
+        for piece in pieces:
+            parser.feed(piece)
+        parser.close()
+    elapsed = time.perf_counter() - start
+    print(f"parser: {len(pieces)} pieces/response, {chars / elapsed / 1e6:.1f} M chars/s, "
+          f"{elapsed / repeat * 1e6:.1f} us/response")
+
+
+def main(n):
+    gc.set_provider(FakeStreamingProvider(ttft_s=0.3, tokens_per_s=80, response=RESPONSE))
+    results = asyncio.run(drive(n))
+    for label, idx in (("chart_ready", 0), ("first section", 1), ("full response", 2)):
+        stats = summarize_ms([r[idx] for r in results])
+        print(f"  {label:<14} p50={stats['ms_p50']:8.1f} ms  p95={stats['ms_p95']:8.1f} ms")
+    saved = sum(r[2] - r[0] for r in results) / len(results)
+    print(f"  chart drawable {saved:.0f} ms earlier than after the full response (mean, {n} requests)")
+    parser_cost()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
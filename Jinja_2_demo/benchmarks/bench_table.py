@@ -0,0 +1,80 @@
+"""
+List-of-dicts rows vs ColumnarTable: memory footprint and render time of
+build_html_table / render__prompt (TABLE) at 10k and 1M rows.
+
+Usage: python benchmarks/bench_table.py [rows ...]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# Add project root (Jinja_2_demo) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import DRUGS, REGIONS, SPECIALTIES, TABLE_COLUMNS, make_table
+
+import numpy as np
+
+from prompt_constellatiion import build_html_table, render__prompt
+from table import ColumnarTable
+
+
+def make_columnar(n):
+    """Same data as common.make_table, built column-wise."""
+    i = np.arange(n)
+    specialties = np.array(SPECIALTIES, dtype=object)
+    drugs = np.array(DRUGS, dtype=object)
+    regions = np.array(REGIONS, dtype=object)
+    return ColumnarTable.from_columns({
+        "physician_id": [f"HCP{k:06d}" for k in range(n)],
+        "physician_name": [f"Dr. Example {k}" for k in range(n)],
+        "specialty": specialties[i % len(SPECIALTIES)],
+        "drug_name": drugs[i % len(DRUGS)],
+        "prescriptions_count": (i * 37) % 600,
+        "total_patients": (i * 29) % 500,
+        "avg_dosage_mg": (i % 40) * 5,
+        "region": regions[i % len(REGIONS)],
+    }, TABLE_COLUMNS)
+
+
+def measure_build(fn):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = fn()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(sizes):
+    metadata = {c: f"Description of {c}" for c in TABLE_COLUMNS}
+    print(f"{'rows':>9} {'layout':<9} {'memory':>10} {'build':>9} {'html (50)':>10} {'render__prompt':>15}")
+    for n in sizes:
+        for label, build in (("dicts", lambda: make_table(n)[1]), ("columnar", lambda: make_columnar(n))):
+            rows, mem, build_s = measure_build(build)
+            html_ms = timed(lambda: build_html_table(TABLE_COLUMNS, rows, metadata))
+            render_ms = timed(lambda: render__prompt(
+                subquery="Top prescribers", table_text="", visualization={"chart_type": "TABLE"},
+                table_columns=TABLE_COLUMNS, table_rows=rows, columns_metadata=metadata,
+            ), repeat=1 if n >= 1_000_000 else 3)
+            print(f"{n:>9,} {label:<9} {mem / 1e6:>8.1f}MB {build_s * 1000:>7.0f}ms {html_ms:>8.2f}ms {render_ms:>13.1f}ms")
+            del rows
+            gc.collect()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 1_000_000])
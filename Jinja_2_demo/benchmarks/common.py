@@ -0,0 +1,67 @@
+"""
+Shared helpers for the benchmark scripts: synthetic tables and timers.
+"""
+
+import statistics
+import time
+
+REGIONS = ["Northeast", "South", "Midwest", "West"]
+SPECIALTIES = ["Cardiology", "Endocrinology", "Neurology", "Psychiatry", "Rheumatology"]
+DRUGS = ["Atorvastatin", "Metformin", "Lisinopril", "Gabapentin", "Sertraline", "Methotrexate"]
+
+TABLE_COLUMNS = [
+    "physician_id", "physician_name", "specialty", "drug_name",
+    "prescriptions_count", "total_patients", "avg_dosage_mg", "region",
+]
+
+
+def make_table(n_rows):
+    """(columns, rows, columns_metadata) shaped like the demo's TABLE data."""
+    rows = [
+        {
+            "physician_id": f"HCP{i:06d}",
+            "physician_name": f"Dr. Example {i}",
+            "specialty": SPECIALTIES[i % len(SPECIALTIES)],
+            "drug_name": DRUGS[i % len(DRUGS)],
+            "prescriptions_count": (i * 37) % 600,
+            "total_patients": (i * 29) % 500,
+            "avg_dosage_mg": (i % 40) * 5,
+            "region": REGIONS[i % len(REGIONS)],
+        }
+        for i in range(n_rows)
+    ]
+    metadata = {c: f"Description of {c}" for c in TABLE_COLUMNS}
+    return list(TABLE_COLUMNS), rows, metadata
+
+
+def make_marketshare(n_regions, n_products):
+    """Nested [{name, data: [{name, value}]}] rows like the demo's MARKETSHARE data."""
+    return [
+        {
+            "name": f"Region {r}",
+            "data": [{"name": f"Product {p}", "value": (r * 131 + p * 17) % 1000} for p in range(n_products)],
+        }
+        for r in range(n_regions)
+    ]
+
+
+def time_calls(fn, repeat=5, warmup=1):
+    """Run `fn` and return per-call wall times in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize_ms(samples):
+    ordered = sorted(samples)
+    return {
+        "ms_min": round(ordered[0], 3),
+        "ms_p50": round(statistics.median(ordered), 3),
+        "ms_p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "runs": len(ordered),
+    }
@@ -0,0 +1,124 @@
+"""
+Load test for service.py against the fake streaming backend (no network
+access or credentials needed). The service runs in-process on a free port.
+
+N clients stream /query concurrently and a fraction of them disconnect after
+the first chunk. The test reports TTFT / total latency percentiles and checks
+that every disconnected request was cancelled (no stream left in flight).
+
+Usage: python benchmarks/load_test_service.py [--clients 200] [--disconnect 0.2] [--out load.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+from common import summarize_ms
+
+from bedrock_connector.gemini_connector import set_provider
+from bedrock_connector.providers import FakeStreamingProvider
+from service import QueryService, start_service
+
+QUERIES = ["Give me a table of top prescribers", "Show market share by region"]
+
+
+async def client(port, i, disconnect_after_first):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    q = QUERIES[i % len(QUERIES)].replace(" ", "+")
+    writer.write(f"GET /query?q={q}+{i} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    start = time.perf_counter()
+    ttft = None
+    events = []
+    try:
+        status = await reader.readline()
+        if b" 200 " not in status:
+            return {"status": status.decode().strip(), "ok": False}
+        await reader.readuntil(b"\r\n\r\n")
+        while True:
+            frame = await reader.readuntil(b"\n\n")
+            event = frame.split(b"\n", 1)[0][len(b"event: "):].decode()
+            events.append(event)
+            if event == "chunk" and ttft is None:
+                ttft = time.perf_counter() - start
+                if disconnect_after_first:
+                    return {"ok": True, "disconnected": True, "ttft": ttft}
+            if event in ("done", "error"):
+                break
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        writer.close()
+    return {
+        "ok": events[-1:] == ["done"], "disconnected": False,
+        "ttft": ttft, "total": time.perf_counter() - start,
+    }
+
+
+async def run(clients, disconnect_ratio, provider):
+    set_provider(provider)
+    server, service = await start_service("127.0.0.1", 0, QueryService(max_streams=clients + 1))
+    port = server.sockets[0].getsockname()[1]
+    cut = int(clients * disconnect_ratio)
+
+    wall_start = time.perf_counter()
+    results = await asyncio.gather(*(client(port, i, i < cut) for i in range(clients)))
+    wall = time.perf_counter() - wall_start
+
+    # Let cancellations propagate to the service before checking its counters
+    for _ in range(100):
+        if service.in_flight == 0:
+            break
+        await asyncio.sleep(0.02)
+    stats = service.stats()
+    server.close()
+    await server.wait_closed()
+
+    full = [r for r in results if r.get("ok") and not r.get("disconnected")]
+    return {
+        "clients": clients,
+        "disconnected": cut,
+        "completed_ok": len(full),
+        "failed": sum(1 for r in results if not r.get("ok")),
+        "wall_s": round(wall, 3),
+        "streams_per_s": round(len(full) / wall, 2),
+        "ttft_ms": summarize_ms([r["ttft"] * 1000 for r in results if r.get("ttft")]),
+        "total_ms": summarize_ms([r["total"] * 1000 for r in full]) if full else None,
+        "service": stats,
+        "provider_calls": provider.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SSE load test (fake backend)")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--disconnect", type=float, default=0.2, help="fraction of clients that hang up early")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--out", default=None, help="optional JSON results file")
+    args = parser.parse_args()
+
+    provider = FakeStreamingProvider(ttft_s=args.ttft, tokens_per_s=args.tokens_per_s)
+    report = asyncio.run(run(args.clients, args.disconnect, provider))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    svc = report["service"]
+    ok = report["failed"] == 0 and svc["in_flight"] == 0 and svc["cancelled"] == report["disconnected"]
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Offline end-to-end benchmark suite. Runs the hot path against the fake
+streaming backend, so no Gemini or AWS access is needed:
+
+  * render__prompt       TABLE and MARKETSHARE_GRAPH across table sizes
+  * build_html_table     across table sizes
+  * classify_query       queries per second
+  * streaming loop       TTFT / total time / throughput at several concurrencies
+
+Results are written as JSON (one record per measurement plus run metadata)
+so two runs can be diffed to catch regressions between releases.
+
+Usage: python benchmarks/run_benchmarks.py [--out results.json] [--quick]
+       METRICS_ENABLED=1 python benchmarks/run_benchmarks.py   # adds per-stage metrics
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Never replay cached answers while measuring the stream path
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ.setdefault("ENV", "DEV")
+
+from common import make_marketshare, make_table, summarize_ms, time_calls
+
+import instrumentation
+import json_backend
+from bedrock_connector.gemini_connector import astream_gemini_synthesis, set_provider
+from bedrock_connector.providers import FakeStreamingProvider
+from interactive_demo import classify_query
+from prompt_constellatiion import build_html_table, render__prompt
+
+TABLE_SIZES = (10, 1_000, 10_000)
+MARKETSHARE_SIZES = ((4, 5), (20, 50), (50, 200))
+CONCURRENCY = (1, 8, 32)
+QUERIES = [
+    "Give me a table", "show prescriptions by physician", "market share by region",
+    "distribution chart", "what is the weather", "list doctors in the west",
+]
+
+
+def bench_render_prompt(sizes, repeat):
+    results = []
+    for n in sizes:
+        columns, rows, metadata = make_table(n)
+        kwargs = dict(
+            subquery="Top prescribers by region",
+            table_text=json_backend.dumps(rows),
+            visualization={"chart_type": "TABLE", "title": "Top Prescribers"},
+            user_pref={"format": "detailed"},
+            table_columns=columns,
+            table_rows=rows,
+            columns_metadata=metadata,
+        )
+        stats = {}
+        render__prompt(stats=stats, **kwargs)
+        results.append({
+            "bench": "render__prompt", "chart_type": "TABLE", "rows": n,
+            "prompt_chars": stats.get("prompt_chars"),
+            **summarize_ms(time_calls(lambda: render__prompt(**kwargs), repeat)),
+        })
+
+    for regions, products in MARKETSHARE_SIZES:
+        rows = make_marketshare(regions, products)
+        kwargs = dict(
+            subquery="Market share by region",
+            table_text=json_backend.dumps(rows),
+            visualization={"chart_type": "MARKETSHARE_GRAPH", "title": "Market Share"},
+            user_pref={"format": "chart"},
+            table_columns=["region", "drug", "prescription_volume"],
+            table_rows=rows,
+            columns_metadata={"region": "Region", "drug": "Product", "prescription_volume": "Volume"},
+        )
+        results.append({
+            "bench": "render__prompt", "chart_type": "MARKETSHARE_GRAPH", "rows": regions * products,
+            **summarize_ms(time_calls(lambda: render__prompt(**kwargs), repeat)),
+        })
+    return results
+
+
+def bench_html_table(sizes, repeat):
+    results = []
+    for n in sizes:
+        columns, rows, metadata = make_table(n)
+        results.append({
+            "bench": "build_html_table", "rows": n,
+            **summarize_ms(time_calls(lambda: build_html_table(columns, rows, metadata), repeat)),
+        })
+    return results
+
+
+def bench_classify(n_queries):
+    batch = (QUERIES * (n_queries // len(QUERIES) + 1))[:n_queries]
+    start = time.perf_counter()
+    for q in batch:
+        classify_query(q)
+    elapsed = time.perf_counter() - start
+    return [{
+        "bench": "classify_query", "queries": n_queries,
+        "queries_per_s": round(n_queries / elapsed, 1),
+        "us_per_query": round(elapsed / n_queries * 1e6, 3),
+    }]
+
+
+async def _one_stream(prompt):
+    start = time.perf_counter()
+    ttft = None
+    chars = 0
+    async for piece in astream_gemini_synthesis("fake-model", prompt):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        chars += len(piece)
+    return ttft, time.perf_counter() - start, chars
+
+
+async def _stream_level(concurrency):
+    # Distinct prompts so no layer can share work between streams
+    wall_start = time.perf_counter()
+    outcomes = await asyncio.gather(*(_one_stream(f"bench prompt {i}") for i in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    ttfts = [o[0] * 1000 for o in outcomes]
+    totals = [o[1] * 1000 for o in outcomes]
+    chars = sum(o[2] for o in outcomes)
+    return {
+        "bench": "stream", "concurrency": concurrency,
+        "ttft_ms": summarize_ms(ttfts),
+        "total_ms": summarize_ms(totals),
+        "wall_s": round(wall, 3),
+        "streams_per_s": round(concurrency / wall, 2),
+        "chars_per_s": round(chars / wall, 1),
+    }
+
+
+def bench_streaming(levels, provider):
+    set_provider(provider)
+    results = []
+    for level in levels:
+        record = asyncio.run(_stream_level(level))
+        record["provider"] = {
+            "ttft_s": provider.ttft_s, "tokens_per_s": provider.tokens_per_s,
+            "chunk_tokens": provider.chunk_tokens,
+        }
+        results.append(record)
+    return results
+
+
+def run_metadata():
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+    return {
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": json_backend.BACKEND,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline hot-path benchmarks (fake LLM backend)")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake backend time to first token (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=400.0, help="fake backend generation speed")
+    parser.add_argument("--chunk-tokens", type=int, default=8, help="fake backend tokens per chunk")
+    args = parser.parse_args()
+
+    sizes = TABLE_SIZES[:2] if args.quick else TABLE_SIZES
+    repeat = 3 if args.quick else 7
+    provider = FakeStreamingProvider(
+        ttft_s=args.ttft, tokens_per_s=args.tokens_per_s, chunk_tokens=args.chunk_tokens
+    )
+
+    results = []
+    for label, run in (
+        ("render__prompt", lambda: bench_render_prompt(sizes, repeat)),
+        ("build_html_table", lambda: bench_html_table(sizes, repeat)),
+        ("classify_query", lambda: bench_classify(10_000 if args.quick else 100_000)),
+        ("stream", lambda: bench_streaming(CONCURRENCY, provider)),
+    ):
+        print(f"running {label} ...", flush=True)
+        results.extend(run())
+
+    report = {"meta": run_metadata(), "results": results}
+    if instrumentation.ENABLED:
+        # METRICS_ENABLED=1: per-stage breakdown of everything measured above
+        report["metrics"] = instrumentation.snapshot()
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json_backend.dumps(report, indent=2))
+        f.write("\n")
+
+    for r in results:
+        if r["bench"] == "stream":
+            print(f"stream x{r['concurrency']:<3} ttft p50 {r['ttft_ms']['ms_p50']:8.1f} ms  "
+                  f"wall {r['wall_s']:6.2f} s  {r['streams_per_s']:7.2f} streams/s")
+        elif r["bench"] == "classify_query":
+            print(f"classify_query  {r['us_per_query']:8.3f} us/query")
+        else:
+            print(f"{r['bench']:<16} {r.get('chart_type', ''):<18} rows {r['rows']:>7}  p50 {r['ms_p50']:9.2f} ms")
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
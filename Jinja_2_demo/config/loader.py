@@ -1,11 +1,17 @@
 # config/loader.py
 from __future__ import annotations
+import logging
 import os
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import yaml
 
+logger = logging.getLogger(__name__)
+
 # ---------- Path resolution ----------
 def _default_cfg_path() -> Path:
     """
@@ -16,20 +22,130 @@ def _default_cfg_path() -> Path:
     config_dir = here.parent               # .../config
     return config_dir / "app_config.yaml"  # .../config/app_config.yaml
 
+def resolve_cfg_path(path: Optional[str] = None) -> Path:
+    """
+    Config file resolution order:
+      1) explicit `path` arg
+      2) env APP_CONFIG_PATH
+      3) default next to this file: .../config/app_config.yaml
+    """
+    return Path(path or os.getenv("APP_CONFIG_PATH") or _default_cfg_path()).resolve()
+
+# ---------- Config service ----------
+class ConfigService:
+    """
+    Parsed view of one YAML config file.
+
+    The file is parsed once and re-parsed only when its mtime changes. The
+    mtime is checked at most every `check_interval_s` seconds on access (or
+    continuously by `start_watching`). Subscribers are called with
+    (new_cfg, old_cfg) after every reload.
+
+    A file that cannot be read or parsed (e.g. half-written by an editor) is
+    logged and skipped, and the last good config stays in use; that mtime is
+    not parsed again. Only the first load raises.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval_s: float = 1.0):
+        self.path = resolve_cfg_path(path)
+        self.check_interval_s = check_interval_s
+        self._cfg: Optional[Dict[str, Any]] = None
+        self._mtime_ns: Optional[int] = None
+        self._bad_mtime_ns: Optional[int] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Dict[str, Any], Dict[str, Any]], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self.reloads = 0
+
+    def get(self) -> Dict[str, Any]:
+        if self._cfg is None or time.monotonic() >= self._next_check:
+            self.reload()
+        return self._cfg
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-parse the file if its mtime changed (or `force`). Returns True on reload."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval_s
+            try:
+                mtime_ns = self.path.stat().st_mtime_ns
+            except OSError as exc:
+                if self._cfg is not None:
+                    return False  # keep serving the last good config
+                if isinstance(exc, FileNotFoundError):
+                    raise FileNotFoundError(f"Config file not found: {self.path}") from None
+                raise
+            if not force and self._cfg is not None and mtime_ns in (self._mtime_ns, self._bad_mtime_ns):
+                return False
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    new_cfg = yaml.safe_load(f) or {}
+                if not isinstance(new_cfg, dict):
+                    raise yaml.YAMLError(f"top level is a {type(new_cfg).__name__}, not a mapping")
+            except (OSError, yaml.YAMLError) as exc:
+                if self._cfg is None:
+                    raise
+                self._bad_mtime_ns = mtime_ns
+                logger.error("Config %s not reloaded, keeping the last good config: %s", self.path, exc)
+                return False
+            old_cfg = self._cfg
+            self._cfg, self._mtime_ns = new_cfg, mtime_ns
+            self.reloads += 1
+            subscribers = list(self._subscribers) if old_cfg is not None else []
+
+        for callback in subscribers:
+            try:
+                callback(new_cfg, old_cfg)
+            except Exception:
+                logger.exception("Config subscriber %r failed", callback)
+        return True
+
+    def subscribe(self, callback: Callable[[Dict[str, Any], Dict[str, Any]], None]) -> None:
+        """Call `callback(new_cfg, old_cfg)` whenever the file is hot-reloaded."""
+        self._subscribers.append(callback)
+
+    def setting(self, ENV: str, dotted: str, default: Any = None) -> Any:
+        return get_setting(select_env(ENV, self.get())[1], dotted, default)
+
+    def start_watching(self, interval_s: Optional[float] = None) -> None:
+        """Poll the file's mtime on a daemon thread so reloads don't wait for an access."""
+        if self._watcher is not None:
+            return
+        interval = interval_s or self.check_interval_s
+
+        def _watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception:
+                    logger.exception("Config reload failed: %s", self.path)
+
+        self._watcher = threading.Thread(target=_watch, name="config-watch", daemon=True)
+        self._watcher.start()
+
+_services: Dict[Path, ConfigService] = {}
+_services_lock = threading.Lock()
+
+def config_service(path: Optional[str] = None) -> ConfigService:
+    """Process-wide ConfigService for the resolved config path."""
+    cfg_path = resolve_cfg_path(path)
+    service = _services.get(cfg_path)
+    if service is None:
+        with _services_lock:
+            service = _services.setdefault(cfg_path, ConfigService(str(cfg_path)))
+    return service
+
 # ---------- Loaders ----------
 def load_config(ENV:str,path: Optional[str] = None) -> Dict[str, Any]:
     """
-    Load YAML config. Resolution order:
+    Load YAML config (cached; re-parsed only when the file changes).
+    Resolution order:
       1) explicit `path` arg
       2) env APP_CONFIG_PATH
       3) default next to this file: .../config/app_config.yaml
     """
-    cfg_path = Path(_default_cfg_path())#Path(path or os.getenv("APP_CONFIG_PATH") or _default_cfg_path())
-    if not cfg_path.exists():
-        raise FileNotFoundError(f"Config file not found: {cfg_path}")
-
-    with open(cfg_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+    return config_service(path).get()
 
 def select_env(ENV:str,cfg: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     """
@@ -39,12 +155,33 @@ def select_env(ENV:str,cfg: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     env_cfg = cfg.get(env_name, {}) or {}
     return env_name, env_cfg
 
+@lru_cache(maxsize=1024)
+def _dotted_parts(dotted: str) -> Tuple[str, ...]:
+    return tuple(dotted.split("."))
+
+def compile_setting(dotted: str) -> Callable[..., Any]:
+    """
+    Precompile a dotted path into an accessor: `compile_setting("aws.region")(cfg, default)`.
+    """
+    parts = _dotted_parts(dotted)
+
+    def accessor(cfg: Dict[str, Any], default: Any = None) -> Any:
+        cur: Any = cfg
+        for part in parts:
+            if not isinstance(cur, dict) or part not in cur:
+                return default
+            cur = cur[part]
+        return cur
+
+    accessor.__name__ = f"setting[{dotted}]"
+    return accessor
+
 def get_setting(cfg: Dict[str, Any], dotted: str, default: Any = None) -> Any:
     """
     Safely read a nested value using a dotted path, e.g., "aws.region".
     """
     cur: Any = cfg
-    for part in dotted.split("."):
+    for part in _dotted_parts(dotted):
         if not isinstance(cur, dict) or part not in cur:
             return default
         cur = cur[part]
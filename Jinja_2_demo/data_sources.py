@@ -0,0 +1,411 @@
+# data_sources.py
+"""
+File-backed TABLE results that are decoded on demand, so rendering a page or
+a prompt from a multi-GB extract touches only the rows it shows.
+
+    source = open_source("extract.csv")                     # .csv, .parquet, .arrow/.feather
+    render__prompt(..., table_columns=cols, table_rows=source)
+    build_html_table(cols, source, columns_metadata)        # first 50 rows only
+    pager.open(cols, source, columns_metadata)              # later pages seek, not re-read
+
+Every source pushes the column projection and the row window (offset,
+limit) down to the reader:
+
+  * CsvSource reads the file through mmap; only the lines of the requested
+    rows are decoded and parsed, and only the projected cells are converted.
+    Every CSV_CHECKPOINT_ROWS rows the byte offset is remembered, so a later
+    page starts parsing near its first row instead of at the top of the file.
+  * ParquetSource reads only the projected columns of the row groups that
+    hold the window (pyarrow, memory-mapped).
+  * ArrowSource maps an Arrow IPC file and slices its record batches
+    (pyarrow); nothing is copied before conversion to Python values.
+
+pyarrow is optional: without it, Parquet and Arrow files raise ImportError
+when opened and CSV works as before.
+
+Row values are converted batch by batch into ColumnarTables (table.py).
+Peak memory therefore depends on the rows rendered, not on the file size.
+Sources do not define len(): counting a CSV means reading the whole file.
+`num_rows` is the count when it is known cheaply, and `count_rows()` does
+the scan once per file version.
+"""
+from __future__ import annotations
+
+import copy
+import csv
+import mmap
+import os
+import re
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from json_backend import dumps
+from table import ColumnarTable
+
+# Rows per ColumnarTable batch from scan()
+SOURCE_BATCH_ROWS = int(os.getenv("SOURCE_BATCH_ROWS", "1024"))
+# A CSV byte offset is remembered every this many rows (for page seeks)
+CSV_CHECKPOINT_ROWS = 8192
+# Bytes scanned per step when counting CSV lines
+_COUNT_BLOCK_BYTES = 64 * 1024 * 1024
+# Rows read per step by read_prefix (it stops soon after the budget)
+_PREFIX_BATCH_ROWS = 128
+# Numbers parse_cell converts: plain ASCII decimal only, so "1_000", "٣",
+# "inf" and "nan" stay strings
+_INT_RE = re.compile(r"[+-]?[0-9]+")
+_FLOAT_RE = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+
+# (path, size, mtime_ns) -> row count, so a file is counted once per version
+_ROW_COUNTS: Dict[Tuple[str, int, int], int] = {}
+_ROW_COUNTS_LOCK = threading.Lock()
+
+
+def _pyarrow(module: str = ""):
+    """pyarrow (or one of its submodules), with an actionable error if it is missing."""
+    try:
+        import pyarrow
+        if module:
+            import importlib
+            return importlib.import_module(f"pyarrow.{module}")
+        return pyarrow
+    except ImportError as e:
+        raise ImportError("Reading Parquet/Arrow files requires pyarrow (pip install pyarrow)") from e
+
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    st = os.stat(path)
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+
+class DataSource:
+    """A table read lazily from a file; `columns` is its (projected) schema."""
+
+    path: str
+    columns: Tuple[str, ...]
+
+    # ---------- Reader interface (per format) ----------
+    @property
+    def num_rows(self) -> Optional[int]:
+        """Row count if known without a scan, else None."""
+        return None
+
+    def count_rows(self) -> int:
+        raise NotImplementedError
+
+    def _iter_rows(self, columns: Sequence[str], offset: int, limit: Optional[int], fill: Any) -> Iterator[tuple]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    # ---------- Public API ----------
+    def select(self, columns: Optional[Sequence[str]]) -> "DataSource":
+        """Projection in `columns` order (unknown columns read as the fill value); shares the open file."""
+        if not columns or tuple(columns) == self.columns:
+            return self
+        view = copy.copy(self)
+        view.columns = tuple(columns)
+        return view
+
+    def row_tuples(
+        self, columns: Optional[Sequence[str]] = None, fill: Any = "", limit: Optional[int] = None, offset: int = 0
+    ) -> Iterator[tuple]:
+        """Rows `offset` .. `offset + limit` as tuples in `columns` order (table.iter_row_tuples)."""
+        if limit is not None and limit <= 0:
+            return iter(())
+        return self._iter_rows(tuple(columns or self.columns), max(0, offset), limit, fill)
+
+    def scan(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        batch_rows: int = SOURCE_BATCH_ROWS,
+    ) -> Iterator[ColumnarTable]:
+        """The row window as ColumnarTable batches of up to `batch_rows` rows."""
+        columns = tuple(columns or self.columns)
+        rows = self.row_tuples(columns, None, limit, offset)
+        while True:
+            batch = list(islice(rows, batch_rows))
+            if not batch:
+                return
+            yield _columnar(columns, batch)
+
+    def head(self, n: Optional[int], columns: Optional[Sequence[str]] = None, offset: int = 0) -> ColumnarTable:
+        columns = tuple(columns or self.columns)
+        return _columnar(columns, list(self.row_tuples(columns, None, n, offset)))
+
+    def read_prefix(
+        self, columns: Optional[Sequence[str]] = None, max_chars: Optional[int] = None, min_rows: int = 0
+    ) -> Tuple[ColumnarTable, bool]:
+        """
+        (first rows, complete): at least `min_rows` rows, and rows until their
+        compact JSON exceeds `max_chars` (all rows when it is None).
+        `complete` is True when the file has no more rows.
+        """
+        columns = tuple(columns or self.columns)
+        rows: List[tuple] = []
+        chars = 0
+        it = self.row_tuples(columns, None)
+        while max_chars is None or chars <= max_chars or len(rows) < min_rows:
+            batch = list(islice(it, _PREFIX_BATCH_ROWS))
+            if not batch:
+                return _columnar(columns, rows), True
+            rows.extend(batch)
+            if max_chars is not None:
+                chars += len(dumps(batch))
+        complete = next(it, None) is None
+        return _columnar(columns, rows), complete
+
+    def __enter__(self) -> "DataSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r}, columns={len(self.columns)})"
+
+
+def _columnar(columns: Sequence[str], rows: List[tuple]) -> ColumnarTable:
+    if not rows:
+        return ColumnarTable.from_columns({c: [] for c in columns}, columns)
+    return ColumnarTable.from_columns(dict(zip(columns, zip(*rows))), columns)
+
+
+def is_data_source(obj) -> bool:
+    return isinstance(obj, DataSource)
+
+
+# -----------------------------------------------------------------------------
+# CSV
+# -----------------------------------------------------------------------------
+def parse_cell(text: str):
+    """CSV cell -> int / float / str; "" -> None. Zero-padded codes stay strings."""
+    if not text:
+        return None
+    c = text[0]
+    if c in "0123456789" or (c in "-+." and len(text) > 1):
+        if len(text) > 1 and text[0] == "0" and text[1] in "0123456789":
+            return text  # "00123" is an identifier, not 123
+        if _INT_RE.fullmatch(text):
+            return int(text)
+        if _FLOAT_RE.fullmatch(text):
+            return float(text)
+    return text
+
+
+class _Lines:
+    """Decoded lines of a mapped file from a byte offset; `pos` is where the next line starts."""
+
+    __slots__ = ("_mm", "pos", "_end", "_encoding")
+
+    def __init__(self, mm, pos: int, encoding: str):
+        self._mm = mm
+        self.pos = pos
+        self._end = len(mm) if mm is not None else 0
+        self._encoding = encoding
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        pos = self.pos
+        if pos >= self._end:
+            raise StopIteration
+        nl = self._mm.find(b"\n", pos)
+        end = self._end if nl == -1 else nl + 1
+        self.pos = end
+        return self._mm[pos:end].decode(self._encoding, "replace")
+
+
+class CsvSource(DataSource):
+    def __init__(self, path: str, delimiter: str = ",", encoding: str = "utf-8"):
+        self.path = str(path)
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self._key = _file_key(self.path)
+        self._file = open(self.path, "rb")
+        # mmap refuses empty files; those have no header and no rows
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._key[1] else None
+        start = 3 if self._mm is not None and self._mm[:3] == b"\xef\xbb\xbf" else 0  # UTF-8 BOM
+        lines = _Lines(self._mm, start, encoding)
+        header = next(csv.reader(lines, delimiter=delimiter), [])
+        self.columns = tuple(h.strip() for h in header)
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        # Byte offset of row k * CSV_CHECKPOINT_ROWS (shared with select() views)
+        self._checkpoints: List[int] = [lines.pos]
+
+    @property
+    def num_rows(self) -> Optional[int]:
+        with _ROW_COUNTS_LOCK:
+            return _ROW_COUNTS.get(self._key)
+
+    def count_rows(self) -> int:
+        """Rows in the file: a newline count when no field can span lines, else a parse."""
+        known = self.num_rows
+        if known is not None:
+            return known
+        mm, data_start = self._mm, self._checkpoints[0]
+        if mm is None:
+            count = 0
+        elif mm.find(b'"', data_start) == -1 and mm.find(b"\n\n", data_start) == -1 and mm.find(b"\n\r\n", data_start) == -1:
+            count = sum(
+                mm[lo:min(lo + _COUNT_BLOCK_BYTES, len(mm))].count(b"\n")
+                for lo in range(data_start, len(mm), _COUNT_BLOCK_BYTES)
+            )
+            if len(mm) > data_start and mm[len(mm) - 1:] != b"\n":
+                count += 1  # last line without a newline
+        else:
+            count = sum(1 for _ in self._iter_rows((), 0, None, None))
+        with _ROW_COUNTS_LOCK:
+            _ROW_COUNTS[self._key] = count
+        return count
+
+    def _iter_rows(self, columns: Sequence[str], offset: int, limit: Optional[int], fill: Any) -> Iterator[tuple]:
+        idx = [self._index.get(c, -1) for c in columns]
+        checkpoints = self._checkpoints
+        k = min(offset // CSV_CHECKPOINT_ROWS, len(checkpoints) - 1)
+        row = k * CSV_CHECKPOINT_ROWS
+        lines = _Lines(self._mm, checkpoints[k], self.encoding)
+        produced = 0
+        for fields in csv.reader(lines, delimiter=self.delimiter):
+            if not fields:
+                continue  # blank line
+            if row >= offset:
+                n = len(fields)
+                yield tuple(parse_cell(fields[i]) if 0 <= i < n else fill for i in idx)
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+            row += 1
+            if row == len(checkpoints) * CSV_CHECKPOINT_ROWS:
+                checkpoints.append(lines.pos)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+# -----------------------------------------------------------------------------
+# Parquet / Arrow (pyarrow, optional)
+# -----------------------------------------------------------------------------
+def _batch_rows(batch, columns: Sequence[str], present: set, lo: int, hi: int, fill: Any) -> Iterator[tuple]:
+    """Rows lo..hi of a record batch, converting only the projected columns of that slice."""
+    part = batch.slice(lo, hi - lo)
+    n = hi - lo
+    values = [part.column(c).to_pylist() if c in present else [fill] * n for c in columns]
+    return zip(*values) if values else iter([()] * n)
+
+
+class ParquetSource(DataSource):
+    def __init__(self, path: str):
+        pq = _pyarrow("parquet")
+        self.path = str(path)
+        self._file = pq.ParquetFile(self.path, memory_map=True)
+        self.columns = tuple(self._file.schema_arrow.names)
+        self._all = set(self.columns)
+
+    @property
+    def num_rows(self) -> int:
+        return self._file.metadata.num_rows
+
+    def count_rows(self) -> int:
+        return self.num_rows
+
+    def _iter_rows(self, columns: Sequence[str], offset: int, limit: Optional[int], fill: Any) -> Iterator[tuple]:
+        read = [c for c in dict.fromkeys(columns) if c in self._all] or list(self.columns[:1])
+        present = set(read) & set(columns)
+        # Whole row groups before the window are never read
+        meta, groups, skip = self._file.metadata, [], offset
+        for i in range(meta.num_row_groups):
+            n = meta.row_group(i).num_rows
+            if not groups and skip >= n:
+                skip -= n
+                continue
+            groups.append(i)
+        if not groups:
+            return
+        left = limit
+        for batch in self._file.iter_batches(batch_size=SOURCE_BATCH_ROWS, row_groups=groups, columns=read):
+            lo = min(skip, batch.num_rows)
+            skip -= lo
+            hi = batch.num_rows if left is None else min(batch.num_rows, lo + left)
+            if hi > lo:
+                yield from _batch_rows(batch, columns, present, lo, hi, fill)
+                if left is not None:
+                    left -= hi - lo
+                    if left <= 0:
+                        return
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArrowSource(DataSource):
+    """Arrow IPC file format (.arrow / .feather v2), memory-mapped."""
+
+    def __init__(self, path: str):
+        pa = _pyarrow()
+        self.path = str(path)
+        self._map = pa.memory_map(self.path, "r")
+        self._reader = pa.ipc.open_file(self._map)
+        self.columns = tuple(self._reader.schema.names)
+        self._all = set(self.columns)
+        self._batch_sizes: Optional[List[int]] = None
+
+    @property
+    def num_rows(self) -> int:
+        return sum(self._sizes())
+
+    def count_rows(self) -> int:
+        return self.num_rows
+
+    def _sizes(self) -> List[int]:
+        if self._batch_sizes is None:
+            # Reading a batch from the map parses its metadata only
+            self._batch_sizes = [self._reader.get_batch(i).num_rows for i in range(self._reader.num_record_batches)]
+        return self._batch_sizes
+
+    def _iter_rows(self, columns: Sequence[str], offset: int, limit: Optional[int], fill: Any) -> Iterator[tuple]:
+        present = set(columns) & self._all
+        skip, left = offset, limit
+        for i, n in enumerate(self._sizes()):
+            if skip >= n:
+                skip -= n
+                continue
+            batch = self._reader.get_batch(i)
+            for lo in range(skip, n, SOURCE_BATCH_ROWS):
+                hi = min(n, lo + SOURCE_BATCH_ROWS)
+                if left is not None:
+                    hi = min(hi, lo + left)
+                yield from _batch_rows(batch, columns, present, lo, hi, fill)
+                if left is not None:
+                    left -= hi - lo
+                    if left <= 0:
+                        return
+            skip = 0
+
+    def close(self) -> None:
+        self._map.close()
+
+
+_FORMATS = {
+    ".csv": CsvSource,
+    ".parquet": ParquetSource,
+    ".pq": ParquetSource,
+    ".arrow": ArrowSource,
+    ".feather": ArrowSource,
+    ".ipc": ArrowSource,
+}
+
+
+def open_source(path: str, **kwargs) -> DataSource:
+    """Source for `path` by extension (.csv, .parquet/.pq, .arrow/.feather/.ipc)."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext not in _FORMATS:
+        raise ValueError(f"Unsupported data file {path!r}; expected one of {sorted(_FORMATS)}")
+    return _FORMATS[ext](path, **kwargs)
@@ -0,0 +1,214 @@
+# demo_queries.py
+"""
+Query inputs shared by the interactive demo, the HTTP service and the
+benchmarks: the mock TABLE / MARKETSHARE data and the prompt render step.
+
+With DEMO_TABLE_SOURCE=<extract.csv|.parquet|.arrow>, TABLE queries read
+their rows lazily from that file instead (data_sources.py).
+"""
+import asyncio
+import os
+
+from data_sources import open_source
+from marketshare import MarketSharePivot
+from prompt_constellatiion import marketshare_payload, render__prompt
+from render_pool import get_render_pool
+from retrieval import RETRIEVAL_INDEX_DIR, get_prompt_retrieval
+
+# Data file that TABLE queries read from instead of the mock rows
+DEMO_TABLE_SOURCE = os.getenv("DEMO_TABLE_SOURCE", "")
+
+
+def table_query_inputs() -> dict:
+    """Physician prescription table (chart type TABLE)."""
+    # Mock table data
+    table_columns = [
+        "physician_id", "physician_name", "specialty", "drug_name",
+        "prescriptions_count", "total_patients", "avg_dosage_mg", "region"
+    ]
+    
+    table_rows = [
+        {"physician_id": "HCP001", "physician_name": "Dr. Sarah Johnson", "specialty": "Cardiology", 
+         "drug_name": "Atorvastatin", "prescriptions_count": 245, "total_patients": 198, "avg_dosage_mg": 40, "region": "Northeast"},
+        {"physician_id": "HCP002", "physician_name": "Dr. Michael Chen", "specialty": "Cardiology", 
+         "drug_name": "Atorvastatin", "prescriptions_count": 312, "total_patients": 267, "avg_dosage_mg": 40, "region": "West"},
+        {"physician_id": "HCP003", "physician_name": "Dr. Emily Rodriguez", "specialty": "Endocrinology", 
+         "drug_name": "Metformin", "prescriptions_count": 428, "total_patients": 389, "avg_dosage_mg": 1000, "region": "South"},
+        {"physician_id": "HCP004", "physician_name": "Dr. James Wilson", "specialty": "Cardiology", 
+         "drug_name": "Lisinopril", "prescriptions_count": 198, "total_patients": 176, "avg_dosage_mg": 20, "region": "Midwest"},
+        {"physician_id": "HCP005", "physician_name": "Dr. Lisa Anderson", "specialty": "Endocrinology", 
+         "drug_name": "Metformin", "prescriptions_count": 356, "total_patients": 312, "avg_dosage_mg": 850, "region": "Northeast"},
+        {"physician_id": "HCP006", "physician_name": "Dr. Robert Martinez", "specialty": "Neurology", 
+         "drug_name": "Gabapentin", "prescriptions_count": 287, "total_patients": 245, "avg_dosage_mg": 300, "region": "West"},
+        {"physician_id": "HCP007", "physician_name": "Dr. Jennifer Lee", "specialty": "Cardiology", 
+         "drug_name": "Atorvastatin", "prescriptions_count": 401, "total_patients": 342, "avg_dosage_mg": 80, "region": "South"},
+        {"physician_id": "HCP008", "physician_name": "Dr. David Brown", "specialty": "Psychiatry", 
+         "drug_name": "Sertraline", "prescriptions_count": 523, "total_patients": 489, "avg_dosage_mg": 100, "region": "Midwest"},
+        {"physician_id": "HCP009", "physician_name": "Dr. Maria Garcia", "specialty": "Rheumatology", 
+         "drug_name": "Methotrexate", "prescriptions_count": 156, "total_patients": 134, "avg_dosage_mg": 15, "region": "Northeast"},
+        {"physician_id": "HCP010", "physician_name": "Dr. Thomas White", "specialty": "Endocrinology", 
+         "drug_name": "Insulin Glargine", "prescriptions_count": 289, "total_patients": 223, "avg_dosage_mg": 35, "region": "West"},
+    ]
+    
+    columns_metadata = {
+        "physician_id": "Unique identifier for the healthcare provider",
+        "physician_name": "Full name of the prescribing physician",
+        "specialty": "Medical specialty of the physician",
+        "drug_name": "Name of the prescribed pharmaceutical product",
+        "prescriptions_count": "Total number of prescriptions written in the reporting period",
+        "total_patients": "Total number of unique patients who received prescriptions",
+        "avg_dosage_mg": "Average dosage prescribed in milligrams",
+        "region": "Geographic region where the physician practices"
+    }
+    
+    visualization = {
+        "chart_type": "TABLE",
+        "title": "Top Prescribers Analysis",
+        "description": "Healthcare providers ranked by prescription volume"
+    }
+
+    if DEMO_TABLE_SOURCE:
+        return source_query_inputs(DEMO_TABLE_SOURCE, columns_metadata, visualization)
+
+    return {
+        "table_columns": table_columns,
+        "table_rows": table_rows,
+        "columns_metadata": columns_metadata,
+        "visualization": visualization,
+    }
+
+
+def source_query_inputs(path: str, columns_metadata: dict | None = None, visualization: dict | None = None) -> dict:
+    """TABLE inputs backed by a data file; rows are decoded only when rendered."""
+    source = open_source(path)
+    return {
+        "table_columns": list(source.columns),
+        "table_rows": source,
+        "columns_metadata": columns_metadata or {},
+        "visualization": visualization or {"chart_type": "TABLE", "title": os.path.basename(path)},
+    }
+
+
+def marketshare_query_inputs() -> dict:
+    """Drug volume by region (chart type MARKETSHARE_GRAPH)."""
+    # Mock marketshare data
+    table_rows = [
+        {
+            "name": "Northeast",
+            "data": [
+                {"name": "Atorvastatin", "value": 890},
+                {"name": "Metformin", "value": 784},
+                {"name": "Lisinopril", "value": 567},
+                {"name": "Gabapentin", "value": 423},
+                {"name": "Sertraline", "value": 678}
+            ]
+        },
+        {
+            "name": "South",
+            "data": [
+                {"name": "Atorvastatin", "value": 829},
+                {"name": "Metformin", "value": 923},
+                {"name": "Lisinopril", "value": 634},
+                {"name": "Gabapentin", "value": 512},
+                {"name": "Sertraline", "value": 701}
+            ]
+        },
+        {
+            "name": "Midwest",
+            "data": [
+                {"name": "Atorvastatin", "value": 745},
+                {"name": "Metformin", "value": 678},
+                {"name": "Lisinopril", "value": 789},
+                {"name": "Gabapentin", "value": 456},
+                {"name": "Sertraline", "value": 890}
+            ]
+        },
+        {
+            "name": "West",
+            "data": [
+                {"name": "Atorvastatin", "value": 956},
+                {"name": "Metformin", "value": 812},
+                {"name": "Lisinopril", "value": 701},
+                {"name": "Gabapentin", "value": 634},
+                {"name": "Sertraline", "value": 756}
+            ]
+        }
+    ]
+    
+    table_columns = ["region", "drug", "prescription_volume"]
+    columns_metadata = {
+        "region": "Geographic region in the United States",
+        "drug": "Pharmaceutical product name",
+        "prescription_volume": "Total number of prescriptions"
+    }
+    
+    visualization = {
+        "chart_type": "MARKETSHARE_GRAPH",
+        "title": "Drug Market Share by Region",
+        "description": "Stacked bar chart showing drug distribution across regions"
+    }
+
+    return {
+        "table_columns": table_columns,
+        "table_rows": table_rows,
+        "columns_metadata": columns_metadata,
+        "visualization": visualization,
+    }
+
+
+QUERY_INPUTS = {
+    "table": table_query_inputs,
+    "marketshare": marketshare_query_inputs,
+}
+
+
+def query_render_args(user_query: str, query_type: str, inputs: dict | None = None, conversation: str = ""):
+    """
+    (render__prompt kwargs, inputs) for a classified query; `inputs` defaults
+    to the mock data for `query_type`. For market share queries the pivot is
+    built once and `inputs["chart_payload"]` holds the ready `plottinggraph`.
+    `conversation` is the session history block (session_memory.py). With
+    RETRIEVAL_INDEX_DIR set, retrieved document excerpts and the relevant
+    columns' metadata are added (retrieval.py).
+    """
+    inputs = inputs if inputs is not None else QUERY_INPUTS[query_type]()
+    table_rows = inputs["table_rows"]
+    if inputs["visualization"].get("chart_type") == "MARKETSHARE_GRAPH":
+        table_rows = MarketSharePivot.from_nested(table_rows)
+        inputs["chart_payload"] = marketshare_payload(table_rows)
+    kwargs = dict(
+        subquery=user_query,
+        table_text="",  # only read by v3; the table is passed as rows
+        visualization=inputs["visualization"],
+        user_pref={"format": "detailed" if query_type == 'table' else "chart"},
+        table_columns=inputs["table_columns"],
+        table_rows=table_rows,
+        columns_metadata=inputs["columns_metadata"],
+        conversation=conversation,
+    )
+    retrieval = get_prompt_retrieval()
+    if retrieval is not None:
+        kwargs.update(retrieval.render_args(user_query, inputs["columns_metadata"]))
+    return kwargs, inputs
+
+
+def prepare_query(user_query: str, query_type: str, inputs: dict | None = None, conversation: str = ""):
+    """
+    Render the summarizer prompt for a classified query.
+
+    Returns (prompt_str, rendered_html, inputs); see query_render_args.
+    """
+    kwargs, inputs = query_render_args(user_query, query_type, inputs, conversation)
+    prompt_str, rendered_html = render__prompt(**kwargs)
+    return prompt_str, rendered_html, inputs
+
+
+async def aprepare_query(user_query: str, query_type: str, inputs: dict | None = None, conversation: str = ""):
+    """prepare_query for async callers: large tables render in the render pool."""
+    if RETRIEVAL_INDEX_DIR:
+        # Embedding and vector search stay off the event loop
+        kwargs, inputs = await asyncio.to_thread(query_render_args, user_query, query_type, inputs, conversation)
+    else:
+        kwargs, inputs = query_render_args(user_query, query_type, inputs, conversation)
+    prompt_str, rendered_html = await get_render_pool().render_prompt(**kwargs)
+    return prompt_str, rendered_html, inputs
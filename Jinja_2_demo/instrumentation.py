@@ -0,0 +1,195 @@
+# instrumentation.py
+"""
+Per-stage latency instrumentation with Prometheus text export.
+
+Stages are timed with `span("render_prompt")` and land in the
+`demo_stage_seconds{stage=...}` histogram. Streaming metrics (time to first
+chunk, inter-chunk gaps, tokens/s) and sizes go through `observe()`.
+
+Each histogram keeps cumulative Prometheus buckets plus a rolling window of
+recent samples for p50/p95/p99 (`snapshot()`, and `*_window` summaries in
+`export_prometheus()`).
+
+Disabled by default (METRICS_ENABLED=1 or `enable()` turns it on). When
+disabled, `span()` returns a shared no-op context manager and `observe()`
+returns immediately, so call sites can stay in the hot path.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Dict, Iterable, Optional, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+WINDOW_SIZE = int(os.getenv("METRICS_WINDOW", "1024"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1_000, 4_000, 16_000, 64_000, 256_000, 1_000_000, 4_000_000)
+RATE_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+# name -> (help, buckets); metrics not listed here use LATENCY_BUCKETS
+METRICS = {
+    "demo_stage_seconds": ("Wall time per pipeline stage", LATENCY_BUCKETS),
+    "llm_time_to_first_chunk_seconds": ("Time from request to the first streamed chunk", LATENCY_BUCKETS),
+    "llm_inter_chunk_seconds": ("Gap between consecutive streamed chunks", LATENCY_BUCKETS),
+    "llm_stream_seconds": ("Total stream duration", LATENCY_BUCKETS),
+    "llm_tokens_per_second": ("Estimated generation speed after the first chunk", RATE_BUCKETS),
+    "prompt_bytes": ("Rendered prompt size in UTF-8 bytes", BYTES_BUCKETS),
+    "render_seconds": ("Prompt/HTML render wall time, inline or through the render pool", LATENCY_BUCKETS),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Cumulative buckets plus a bounded window of recent samples."""
+
+    def __init__(self, buckets: Iterable[float], window: int = WINDOW_SIZE):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+            self.recent.append(value)
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        with self._lock:
+            ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        # nearest-rank, as in batch_synthesis.percentile
+        return {q: ordered[max(0, math.ceil(q * len(ordered)) - 1)] for q in qs}
+
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+_registry: Dict[str, Dict[_LabelKey, Histogram]] = {}
+_registry_lock = threading.Lock()
+
+
+def enable(flag: bool = True) -> None:
+    global ENABLED
+    ENABLED = flag
+
+
+def reset() -> None:
+    with _registry_lock:
+        _registry.clear()
+
+
+def _histogram(name: str, labels: _LabelKey) -> Histogram:
+    series = _registry.get(name)
+    hist = series.get(labels) if series is not None else None
+    if hist is None:
+        with _registry_lock:
+            series = _registry.setdefault(name, {})
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = Histogram(METRICS.get(name, ("", LATENCY_BUCKETS))[1])
+    return hist
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Record one sample; a no-op while instrumentation is disabled."""
+    if not ENABLED:
+        return
+    _histogram(name, tuple(sorted(labels.items()))).observe(value)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("demo_stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+def span(stage: str):
+    """Time a `with` block as `demo_stage_seconds{stage=...}`."""
+    return _Span(stage) if ENABLED else _NOOP
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def snapshot() -> dict:
+    """{name: {label string: {count, sum, p50, p95, p99}}} over the rolling window."""
+    out: dict = {}
+    with _registry_lock:
+        items = [(name, dict(series)) for name, series in _registry.items()]
+    for name, series in items:
+        for labels, hist in series.items():
+            entry = {"count": hist.count, "sum": round(hist.sum, 6)}
+            for q, v in hist.quantiles().items():
+                entry[f"p{int(q * 100)}"] = round(v, 6)
+            out.setdefault(name, {})[_format_labels(labels)] = entry
+    return out
+
+
+def _format_labels(labels: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_le(bound: float) -> str:
+    return repr(float(bound))
+
+
+def export_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _registry_lock:
+        items = sorted((name, dict(series)) for name, series in _registry.items())
+    for name, series in items:
+        help_text = METRICS.get(name, ("",))[0]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in sorted(series.items()):
+            with hist._lock:
+                counts, total, count = list(hist.counts), hist.sum, hist.count
+            cumulative = 0
+            for bound, n in zip(hist.buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_le(bound)))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        window = f"{name}_window"
+        lines.append(f"# HELP {window} {help_text} (last {WINDOW_SIZE} samples)")
+        lines.append(f"# TYPE {window} summary")
+        for labels, hist in sorted(series.items()):
+            with hist._lock:
+                recent = list(hist.recent)
+            for q, v in hist.quantiles().items():
+                lines.append(f"{window}{_format_labels(labels, ('quantile', str(q)))} {v}")
+            lines.append(f"{window}_sum{_format_labels(labels)} {sum(recent)}")
+            lines.append(f"{window}_count{_format_labels(labels)} {len(recent)}")
+    return "\n".join(lines) + "\n" if lines else ""
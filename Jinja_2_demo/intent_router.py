@@ -0,0 +1,324 @@
+# intent_router.py
+"""
+Query -> visualization intent routing.
+
+All intent keywords are compiled into one trie-shaped regular expression,
+so a query is scanned once, whatever the number of intents or keywords.
+Keywords match as substrings of the lowercased query, like the original
+`classify_query` ("regional" hits "region").
+
+    router = IntentRouter(DEFAULT_INTENTS)
+    router.classify("Give me a table")                 # "table"
+    router.classify_many(["market share", "hello"])    # ["marketshare", "unknown"]
+
+Resolution:
+  * mode="priority": the first registered intent with any keyword hit wins
+    (the original classify_query behaviour, used by default)
+  * mode="score": weighted keyword hits, ties go to the earlier intent
+
+With an `embedder` (e.g. `HashingEmbedder()`, or any callable mapping a list
+of texts to a 2-D array), queries without a keyword hit are scored against
+cached intent vectors. `classify_many` embeds all of them in one batch and
+does the similarity as a single matrix product.
+
+Results are cached per normalized query in a bounded LRU.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+UNKNOWN = "unknown"
+# Normalized queries kept in the LRU
+ROUTER_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    keywords: Tuple[str, ...]
+    examples: Tuple[str, ...] = ()  # extra text for the intent vector
+    weight: float = 1.0  # per keyword hit, mode="score"
+
+
+DEFAULT_INTENTS = (
+    Intent("table", ("table", "physician", "doctor", "prescription", "list")),
+    Intent("marketshare", ("market", "share", "distribution", "chart", "graph", "region")),
+)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+# -----------------------------
+# Keyword matcher
+# -----------------------------
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation of `words` shaped as a prefix trie: shared prefixes are
+    matched once and the longest word at a position wins.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return body + "?" if len(body) == 1 else f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Counts keyword hits per intent with a single regex scan."""
+
+    def __init__(self, intents: Sequence[Intent]):
+        keywords: Dict[str, List[int]] = {}
+        for idx, intent in enumerate(intents):
+            for kw in intent.keywords:
+                kw = normalize_query(kw)
+                if kw:
+                    keywords.setdefault(kw, []).append(idx)
+        # A lookahead matches at every position, so overlapping keywords
+        # ("chartable": chart + table) are all found. Only the longest keyword
+        # per position is captured; its shorter prefixes are credited with it.
+        self._hits: Dict[str, List[int]] = {
+            kw: [i for other, ids in keywords.items() if kw.startswith(other) for i in ids]
+            for kw in keywords
+        }
+        self._first = {kw: min(ids) for kw, ids in self._hits.items()}
+        self._regex = re.compile(f"(?=({trie_pattern(keywords)}))") if keywords else None
+        self._n = len(intents)
+
+    def hits(self, text: str) -> np.ndarray:
+        """Hit counts per intent for an already normalized `text`."""
+        counts = np.zeros(self._n, dtype=np.int64)
+        if self._regex is not None:
+            for m in self._regex.finditer(text):
+                for i in self._hits[m.group(1)]:
+                    counts[i] += 1
+        return counts
+
+    def first_hit(self, text: str) -> Optional[int]:
+        """Index of the first registered intent with any hit (no counting)."""
+        if self._regex is None:
+            return None
+        best = None
+        for m in self._regex.finditer(text):
+            first = self._first[m.group(1)]
+            if best is None or first < best:
+                if first == 0:
+                    return 0
+                best = first
+        return best
+
+
+# -----------------------------
+# Intent vectors
+# -----------------------------
+class HashingEmbedder:
+    """
+    Dependency-free text vectors: hashed character n-grams, L2-normalized.
+    Good enough to route paraphrases and typos ("marketshar", "prescriber
+    listing"); pass a sentence-embedding model for real semantic routing.
+    """
+
+    def __init__(self, dim: int = 1024, ngrams: Tuple[int, ...] = (3, 4)):
+        self.dim = dim
+        self.ngrams = ngrams
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        rows, cols = [], []
+        for r, text in enumerate(texts):
+            padded = f" {normalize_query(text)} "
+            for n in self.ngrams:
+                for i in range(len(padded) - n + 1):
+                    rows.append(r)
+                    cols.append(zlib.crc32(padded[i:i + n].encode("utf-8")) % self.dim)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), 1.0)
+        return _l2_normalize(out)
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+
+# -----------------------------
+# Router
+# -----------------------------
+class IntentRouter:
+    def __init__(
+        self,
+        intents: Iterable[Intent] = DEFAULT_INTENTS,
+        mode: str = "priority",
+        embedder: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        min_similarity: float = 0.3,
+        cache_size: int = ROUTER_CACHE_SIZE,
+        default: str = UNKNOWN,
+    ):
+        if mode not in ("priority", "score"):
+            raise ValueError(f"Unknown routing mode: {mode!r}")
+        self.mode = mode
+        self.embedder = embedder
+        self.min_similarity = min_similarity
+        self.cache_size = cache_size
+        self.default = default
+        self._intents: List[Intent] = []
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._compile(list(intents))
+
+    @property
+    def intents(self) -> Tuple[str, ...]:
+        return tuple(i.name for i in self._intents)
+
+    def add_intent(self, intent: Intent) -> None:
+        """Register (or replace, keeping its position) an intent and recompile."""
+        intents = list(self._intents)
+        names = [i.name for i in intents]
+        if intent.name in names:
+            intents[names.index(intent.name)] = intent
+        else:
+            intents.append(intent)
+        self._compile(intents)
+
+    # ---------- Public API ----------
+    def classify(self, query: str) -> str:
+        text = normalize_query(query or "")
+        with self._lock:
+            name = self._cache.get(text)
+            if name is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return name
+        idx = self._keyword_route(text)
+        name = self._intents[idx].name if idx is not None else self._vector_route([text])[0]
+        self._remember([text], {text: name})
+        return name
+
+    def classify_many(self, queries: Sequence[str]) -> List[str]:
+        """Route a batch; keyword misses are vector-scored together."""
+        texts = [normalize_query(q or "") for q in queries]
+        resolved: Dict[str, str] = {}
+        with self._lock:
+            for text in texts:
+                if text in resolved:
+                    continue
+                name = self._cache.get(text)
+                if name is not None:
+                    self._cache.move_to_end(text)
+                    resolved[text] = name
+                    self.hits += 1
+
+        pending = [t for t in dict.fromkeys(texts) if t not in resolved]
+        unmatched = []
+        for text in pending:
+            idx = self._keyword_route(text)
+            if idx is None:
+                unmatched.append(text)
+            else:
+                resolved[text] = self._intents[idx].name
+        if unmatched:
+            resolved.update(zip(unmatched, self._vector_route(unmatched)))
+
+        if pending:
+            self._remember(pending, resolved)
+        return [resolved[t] for t in texts]
+
+    def scores(self, query: str) -> Dict[str, Dict[str, float]]:
+        """Keyword hit score and (with an embedder) cosine similarity per intent."""
+        text = normalize_query(query or "")
+        hits = self._matcher.hits(text) * self._weights
+        out = {i.name: {"keywords": float(h)} for i, h in zip(self._intents, hits)}
+        if self._intent_matrix is not None:
+            sims = self.embedder([text]) @ self._intent_matrix.T
+            for intent, s in zip(self._intents, sims[0]):
+                out[intent.name]["similarity"] = round(float(s), 4)
+        return out
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "intents": len(self._intents),
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached": len(self._cache),
+            }
+
+    # ---------- Internals ----------
+    def _remember(self, texts: List[str], resolved: Dict[str, str]) -> None:
+        with self._lock:
+            self.misses += len(texts)
+            for text in texts:
+                self._cache[text] = resolved[text]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _compile(self, intents: List[Intent]) -> None:
+        matcher = KeywordMatcher(intents)
+        weights = np.array([i.weight for i in intents], dtype=np.float64)
+        intent_matrix = None
+        if self.embedder is not None and intents:
+            # One vector per intent: mean of its keyword/example vectors
+            texts, owners = [], []
+            for idx, intent in enumerate(intents):
+                for text in (*intent.keywords, *intent.examples):
+                    texts.append(text)
+                    owners.append(idx)
+            vectors = np.asarray(self.embedder(texts), dtype=np.float32)
+            summed = np.zeros((len(intents), vectors.shape[1]), dtype=np.float32)
+            np.add.at(summed, np.asarray(owners), vectors)
+            intent_matrix = _l2_normalize(summed)
+        with self._lock:
+            self._intents = intents
+            self._matcher, self._weights, self._intent_matrix = matcher, weights, intent_matrix
+            self._cache.clear()
+
+    def _keyword_route(self, text: str) -> Optional[int]:
+        if self.mode == "priority":
+            return self._matcher.first_hit(text)
+        scores = self._matcher.hits(text) * self._weights
+        best = int(scores.argmax()) if len(scores) else 0
+        return best if len(scores) and scores[best] > 0 else None
+
+    def _vector_route(self, texts: List[str]) -> List[str]:
+        if self._intent_matrix is None:
+            return [self.default] * len(texts)
+        sims = np.asarray(self.embedder(texts), dtype=np.float32) @ self._intent_matrix.T
+        best = sims.argmax(axis=1)
+        best_sim = sims[np.arange(len(texts)), best]
+        return [
+            self._intents[b].name if s >= self.min_similarity else self.default
+            for b, s in zip(best.tolist(), best_sim.tolist())
+        ]
+
+
+_DEFAULT_ROUTER = IntentRouter(DEFAULT_INTENTS)
+
+
+def classify_query(query: str) -> str:
+    """'table', 'marketshare' or 'unknown' (keyword routing, cached)."""
+    return _DEFAULT_ROUTER.classify(query)
@@ -0,0 +1,116 @@
+# json_backend.py
+"""
+Shared JSON serialization for prompt and HTML rendering.
+
+Uses orjson when it is installed (set JSON_BACKEND=json to force the
+standard library). Both backends produce the same text for the options used
+here: compact separators, indent=None or 2, and non-ASCII kept as UTF-8.
+
+Inside `render_scope()`, `dumps_memo` serializes each object at most once
+per (indent, sort_keys). The `tojson` filter installed by `install_tojson`
+goes through it, so a table referenced several times in one render is only
+encoded once.
+"""
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from jinja2 import pass_eval_context
+from markupsafe import Markup
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if os.getenv("JSON_BACKEND", "").lower() == "json":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_memo: ContextVar[Optional[Dict[Tuple[int, Optional[int], bool], Tuple[Any, str]]]] = ContextVar(
+    "json_render_memo", default=None
+)
+
+
+def _stdlib_dumps(obj: Any, indent: Optional[int], sort_keys: bool) -> str:
+    return json.dumps(
+        obj,
+        indent=indent,
+        sort_keys=sort_keys,
+        ensure_ascii=False,
+        separators=(",", ":") if indent is None else (",", ": "),
+        default=str,
+    )
+
+
+def dumps(obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+    """Serialize `obj` to a JSON string with the fastest available backend."""
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=str, option=option).decode("utf-8")
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib handles them
+    return _stdlib_dumps(obj, indent, sort_keys)
+
+
+@contextmanager
+def render_scope():
+    """Memoize `dumps_memo` results until the block exits (one render)."""
+    token = _memo.set({})
+    try:
+        yield
+    finally:
+        _memo.reset(token)
+
+
+def dumps_memo(obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+    memo = _memo.get()
+    if memo is None:
+        return dumps(obj, indent=indent, sort_keys=sort_keys)
+    key = (id(obj), indent, sort_keys)
+    hit = memo.get(key)
+    if hit is not None and hit[0] is obj:
+        return hit[1]
+    text = dumps(obj, indent=indent, sort_keys=sort_keys)
+    # Keep a reference so the id cannot be reused within the scope
+    memo[key] = (obj, text)
+    return text
+
+
+def _htmlsafe(text: str) -> str:
+    return (
+        text.replace("<", "\\u003c")
+        .replace(">", "\\u003e")
+        .replace("&", "\\u0026")
+        .replace("'", "\\u0027")
+    )
+
+
+def install_tojson(env, html_safe: bool = True) -> None:
+    """
+    Register the shared serializer as `tojson` on a Jinja environment.
+
+    Keys are sorted as with Jinja's default policy. `html_safe=False` skips
+    the HTML escaping for environments that do not produce HTML (prompts).
+    """
+    # Same calling convention as Jinja's builtin, so compiled (and cached)
+    # templates stay valid whichever filter they were compiled against.
+    @pass_eval_context
+    def tojson(eval_ctx, value: Any, indent: Optional[int] = None) -> Markup:
+        text = dumps_memo(value, indent=indent, sort_keys=True)
+        return Markup(_htmlsafe(text) if html_safe else text)
+
+    env.filters["tojson"] = tojson
+    env.policies["json.dumps_function"] = lambda obj, **kw: dumps(
+        obj, indent=kw.get("indent"), sort_keys=kw.get("sort_keys", False)
+    )
@@ -0,0 +1,203 @@
+# marketshare.py
+"""
+Vectorized market-share pivot for MARKETSHARE_GRAPH.
+
+The region x product data is turned into one dense float matrix once;
+totals, shares, top-N products and the "Other" bucket are then computed with
+NumPy instead of walking nested dicts:
+
+    pivot = MarketSharePivot.from_nested(table_rows)   # [{name, data:[{name, value}]}]
+    payload = pivot.plottinggraph(top_products=10)     # ready for the frontend
+    summary = pivot.summary(top_products=10)           # compact text for the prompt
+
+`chartData` keeps the nested {name, data:[{name, value}]} shape the chart
+renderer already consumes, just reduced to the kept products (+ "Other").
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+OTHER = "Other"
+OTHER_REGIONS = "Other regions"
+
+
+@dataclass
+class MarketSharePivot:
+    regions: List[str]
+    products: List[str]
+    values: np.ndarray  # shape (len(regions), len(products)), float64
+
+    # ---------- Construction ----------
+    @classmethod
+    def from_arrays(
+        cls,
+        region_codes: Sequence[int],
+        product_codes: Sequence[int],
+        values: Sequence[float],
+        regions: List[str],
+        products: List[str],
+    ) -> "MarketSharePivot":
+        """Dense pivot from coded long-format arrays; duplicate cells are summed."""
+        n_regions, n_products = len(regions), len(products)
+        flat = np.asarray(region_codes, dtype=np.int64) * n_products + np.asarray(product_codes, dtype=np.int64)
+        # bincount sums duplicates in one pass (much faster than np.add.at)
+        matrix = np.bincount(
+            flat, weights=np.asarray(values, dtype=np.float64), minlength=n_regions * n_products
+        ).reshape(n_regions, n_products)
+        return cls(list(regions), list(products), matrix)
+
+    @classmethod
+    def from_nested(cls, table_rows: Iterable[dict]) -> "MarketSharePivot":
+        """From the demo layout: [{"name": region, "data": [{"name": product, "value": v}]}]."""
+        regions: List[str] = []
+        product_index: Dict[str, int] = {}
+        counts: List[int] = []
+        product_codes: List[int] = []
+        values: List[float] = []
+        last_names, last_codes = None, None
+        for row in table_rows:
+            regions.append(str(row.get("name")))
+            data = row.get("data") or ()
+            names = [item.get("name") for item in data]
+            # Regions usually list the same products in the same order
+            if names != last_names:
+                last_codes = [product_index.setdefault(str(n), len(product_index)) for n in names]
+                last_names = names
+            product_codes.extend(last_codes)
+            values.extend([item.get("value") or 0 for item in data])
+            counts.append(len(names))
+        region_codes = np.repeat(np.arange(len(regions)), counts)
+        return cls.from_arrays(region_codes, product_codes, values, regions, list(product_index))
+
+    @classmethod
+    def from_records(
+        cls,
+        table_rows: Iterable[dict],
+        region_key: str = "region",
+        product_key: str = "drug",
+        value_key: str = "prescription_volume",
+    ) -> "MarketSharePivot":
+        """From long-format rows such as {"region", "drug", "prescription_volume"}."""
+        region_index: Dict[str, int] = {}
+        product_index: Dict[str, int] = {}
+        region_codes: List[int] = []
+        product_codes: List[int] = []
+        values: List[float] = []
+        for row in table_rows:
+            region_codes.append(region_index.setdefault(str(row.get(region_key)), len(region_index)))
+            product_codes.append(product_index.setdefault(str(row.get(product_key)), len(product_index)))
+            values.append(row.get(value_key) or 0)
+        return cls.from_arrays(region_codes, product_codes, values, list(region_index), list(product_index))
+
+    # ---------- Vectorized views ----------
+    def region_totals(self) -> np.ndarray:
+        return self.values.sum(axis=1)
+
+    def product_totals(self) -> np.ndarray:
+        return self.values.sum(axis=0)
+
+    def shares(self) -> np.ndarray:
+        """Row-normalized shares; regions with no volume get all zeros."""
+        totals = self.region_totals()[:, None]
+        return np.divide(self.values, totals, out=np.zeros_like(self.values), where=totals != 0)
+
+    def top_n(self, top_products: Optional[int] = None, top_regions: Optional[int] = None) -> "MarketSharePivot":
+        """
+        Keep the `top_products` products by overall volume (rest summed into
+        "Other") and the `top_regions` regions by total (rest summed into
+        "Other regions"). Kept items stay in descending order of volume.
+        """
+        pivot = self
+        if top_products is not None and top_products < len(self.products):
+            order = np.argsort(-self.product_totals(), kind="stable")
+            keep, rest = order[:top_products], order[top_products:]
+            matrix = np.column_stack([self.values[:, keep], self.values[:, rest].sum(axis=1)])
+            pivot = MarketSharePivot(self.regions, [self.products[i] for i in keep] + [OTHER], matrix)
+        if top_regions is not None and top_regions < len(pivot.regions):
+            order = np.argsort(-pivot.region_totals(), kind="stable")
+            keep, rest = order[:top_regions], order[top_regions:]
+            matrix = np.vstack([pivot.values[keep], pivot.values[rest].sum(axis=0, keepdims=True)])
+            pivot = MarketSharePivot([pivot.regions[i] for i in keep] + [OTHER_REGIONS], pivot.products, matrix)
+        return pivot
+
+    # ---------- Outputs ----------
+    def chart_data(self) -> List[dict]:
+        """Nested {name, data:[{name, value}]} rows, one per region."""
+        products = self.products
+        out = []
+        for region, row in zip(self.regions, _plain_numbers(self.values)):
+            out.append({"name": region, "data": [{"name": p, "value": v} for p, v in zip(products, row)]})
+        return out
+
+    def plottinggraph(
+        self,
+        top_products: Optional[int] = None,
+        top_regions: Optional[int] = None,
+        chart_type: str = "STACKED_BAR",
+    ) -> dict:
+        reduced = self.top_n(top_products, top_regions)
+        return {
+            "plottinggraph": [
+                {
+                    "chartType": chart_type,
+                    "xAxis": ["name"],
+                    "yAxis": list(reduced.products),
+                    "chartData": reduced.chart_data(),
+                }
+            ]
+        }
+
+    def summary(self, top_products: Optional[int] = 10, max_regions: int = 20) -> str:
+        """A few lines of totals and shares for the prompt (not the raw matrix)."""
+        grand_total = float(self.values.sum())
+        product_totals = self.product_totals()
+        lines = [
+            f"Regions: {len(self.regions)} | Products: {len(self.products)} | Total volume: {_fmt(grand_total)}"
+        ]
+        if grand_total <= 0:
+            return lines[0]
+
+        reduced = self.top_n(top_products)
+        overall = reduced.product_totals() / grand_total
+        ranked = sorted(zip(reduced.products, overall), key=lambda ps: (ps[0] == OTHER, -ps[1]))
+        lines.append("Overall share: " + ", ".join(f"{p} {s:.1%}" for p, s in ranked))
+
+        region_totals = self.region_totals()
+        shares = self.shares()
+        leaders = shares.argmax(axis=1)
+        order = np.argsort(-region_totals, kind="stable")[:max_regions]
+        lines.append("Per region (total; leading product and share):")
+        for r in order:
+            leader = leaders[r]
+            lines.append(
+                f"- {self.regions[r]}: {_fmt(region_totals[r])}; "
+                f"{self.products[leader]} {shares[r, leader]:.1%}"
+            )
+        if len(self.regions) > max_regions:
+            lines.append(f"- ... {len(self.regions) - max_regions} more regions")
+
+        top = int(product_totals.argmax())
+        lines.append(f"Market leader: {self.products[top]} ({product_totals[top] / grand_total:.1%} overall)")
+        return "\n".join(lines)
+
+
+def is_nested_marketshare(table_rows) -> bool:
+    """True for the [{name, data:[...]}] layout used by MARKETSHARE_GRAPH."""
+    if not table_rows:
+        return False
+    first = table_rows[0]
+    return isinstance(first, dict) and isinstance(first.get("data"), list)
+
+
+def _plain_numbers(matrix: np.ndarray) -> List[list]:
+    # ints stay ints in the JSON payload when every value is integral
+    if np.all(np.mod(matrix, 1) == 0):
+        return matrix.astype(np.int64).tolist()
+    return matrix.round(6).tolist()
+
+
+def _fmt(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
@@ -0,0 +1,279 @@
+# pagination.py
+"""
+Cursor-based pagination for TABLE results.
+
+`build_html_table` shows the first HTML_TABLE_MAX_ROWS rows. The pager keeps
+the ordered result server-side so later pages can be served from it without
+re-running the query:
+
+    pager = TablePager()
+    first = pager.open(table_columns, table_rows, columns_metadata)   # page 0 + cursor
+    page = pager.page(first.next_cursor)                             # legend + table
+    rows = pager.rows(first.next_cursor)                             # <tr> rows only
+    for batch in pager.iter_batches(first.next_cursor, batch_rows=200):
+        ...                                                          # incremental mode
+
+Results are stored by reference (a list of dicts is wrapped, not copied; a
+ColumnarTable is already compact), in an LRU bounded by entry count and total
+rows, with a TTL. Each page renders only its own rows from a slice view, so
+the work and memory per request depend on the page size, not on the size of
+the result. A file-backed DataSource (data_sources.py) holds no rows in
+memory; each page decodes only its own rows from the file. The pager owns a
+stored DataSource and closes it when the result is closed, evicted or expires.
+
+Cursors are opaque url-safe strings; an expired or unknown cursor raises
+CursorError.
+"""
+from __future__ import annotations
+
+import base64
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Sequence
+
+from data_sources import is_data_source
+from prompt_constellatiion import HTML_TABLE_MAX_ROWS, build_html_rows, build_html_table
+from table import as_table
+
+# How long a stored result stays pageable after its last use
+TABLE_RESULT_TTL_S = float(os.getenv("TABLE_RESULT_TTL_S", "900"))
+# Stored results, and total rows across them, before LRU eviction
+TABLE_RESULT_MAX_ENTRIES = int(os.getenv("TABLE_RESULT_MAX_ENTRIES", "64"))
+TABLE_RESULT_MAX_ROWS = int(os.getenv("TABLE_RESULT_MAX_ROWS", "5000000"))
+# Largest page a client may ask for
+MAX_PAGE_ROWS = 1000
+
+
+class CursorError(ValueError):
+    """Malformed, expired or evicted cursor."""
+
+
+@dataclass
+class TablePage:
+    html: str
+    offset: int
+    rows: int
+    total_rows: Optional[int]  # None: a DataSource that has not been counted
+    next_cursor: Optional[str]
+    result_id: str
+
+    def to_dict(self) -> dict:
+        return {
+            "html": self.html,
+            "offset": self.offset,
+            "rows": self.rows,
+            "total_rows": self.total_rows,
+            "next_cursor": self.next_cursor,
+        }
+
+
+@dataclass
+class _Result:
+    table: object  # ColumnarTable / RecordsTable / DataSource
+    columns_metadata: dict
+    page_size: int
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def encode_cursor(result_id: str, offset: int, page_size: int) -> str:
+    raw = f"{result_id}:{offset}:{page_size}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(result_id, offset, page_size) of a cursor made by `encode_cursor`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        result_id, offset, page_size = raw.split(":")
+        offset, page_size = int(offset), int(page_size)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorError("malformed cursor") from None
+    if offset < 0 or not 0 < page_size <= MAX_PAGE_ROWS:
+        raise CursorError("malformed cursor")
+    return result_id, offset, page_size
+
+
+class TablePager:
+    """Server-side store of ordered TABLE results, served page by page."""
+
+    def __init__(
+        self,
+        max_entries: int = TABLE_RESULT_MAX_ENTRIES,
+        max_rows: int = TABLE_RESULT_MAX_ROWS,
+        ttl_s: float = TABLE_RESULT_TTL_S,
+        page_size: int = HTML_TABLE_MAX_ROWS,
+    ):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl_s = ttl_s
+        self.page_size = page_size
+        self._results: "OrderedDict[str, _Result]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+        self.pages_served = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---------- Public API ----------
+    def store(
+        self,
+        table_columns: Optional[Sequence[str]],
+        table_rows,
+        columns_metadata: Optional[dict] = None,
+        page_size: Optional[int] = None,
+    ) -> str:
+        """Keep `table_rows` pageable; returns its result id (nothing is rendered)."""
+        if is_data_source(table_rows):
+            table = table_rows.select(table_columns or None)
+        else:
+            table = as_table(table_rows, table_columns or None, fill="")
+        result = _Result(table, columns_metadata or {}, _clamp(page_size or self.page_size))
+        result_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._expire(time.monotonic())
+            self._results[result_id] = result
+            self._rows += _held_rows(table)
+            while len(self._results) > 1 and (
+                len(self._results) > self.max_entries or self._rows > self.max_rows
+            ):
+                self._drop(next(iter(self._results)))
+                self.evictions += 1
+        return result_id
+
+    def open(
+        self,
+        table_columns: Optional[Sequence[str]],
+        table_rows,
+        columns_metadata: Optional[dict] = None,
+        page_size: Optional[int] = None,
+    ) -> TablePage:
+        """Store the result and render its first page."""
+        result_id = self.store(table_columns, table_rows, columns_metadata, page_size)
+        return self._render(result_id, 0, None, rows_only=False)
+
+    def cursor(self, result_id: str, offset: int, page_size: Optional[int] = None) -> Optional[str]:
+        """Cursor for the page at `offset`, or None past the last row."""
+        result = self._get(result_id)
+        if not _has_row(result.table, offset):
+            return None
+        return encode_cursor(result_id, offset, _clamp(page_size or result.page_size))
+
+    def total_rows(self, result_id: str) -> Optional[int]:
+        """Rows in the stored result (None for a DataSource that would need a full scan)."""
+        table = self._get(result_id).table
+        return table.num_rows if is_data_source(table) else len(table)
+
+    def page(self, cursor: str, page_size: Optional[int] = None) -> TablePage:
+        """Legend + table HTML for the page at `cursor`."""
+        result_id, offset, size = decode_cursor(cursor)
+        return self._render(result_id, offset, page_size or size, rows_only=False)
+
+    def rows(self, cursor: str, page_size: Optional[int] = None) -> TablePage:
+        """Only the `<tr>` rows of the page at `cursor` (append to the shown table)."""
+        result_id, offset, size = decode_cursor(cursor)
+        return self._render(result_id, offset, page_size or size, rows_only=True)
+
+    def iter_batches(self, cursor: str, batch_rows: Optional[int] = None, max_rows: Optional[int] = None) -> Iterator[TablePage]:
+        """
+        Incremental mode: `<tr>` batches from `cursor` onwards, one batch at a
+        time, until the end of the result (or `max_rows` rows).
+        """
+        sent = 0
+        while cursor is not None and (max_rows is None or sent < max_rows):
+            size = batch_rows
+            if max_rows is not None:
+                size = min(size or decode_cursor(cursor)[2], max_rows - sent)
+            batch = self.rows(cursor, size)
+            sent += batch.rows
+            yield batch
+            cursor = batch.next_cursor
+
+    def close(self, result_id: str) -> None:
+        with self._lock:
+            if result_id in self._results:
+                self._drop(result_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "results": len(self._results),
+                "rows": self._rows,
+                "pages_served": self.pages_served,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    # ---------- Internals ----------
+    def _render(self, result_id: str, offset: int, page_size: Optional[int], rows_only: bool) -> TablePage:
+        result = self._get(result_id)
+        size = _clamp(page_size or result.page_size)
+        table = result.table
+        if is_data_source(table):
+            # Decode only this page, plus one row past it for the next cursor
+            rows = table.head(size + 1, offset=offset)
+            if offset and not len(rows) and not _has_row(table, offset - 1):
+                raise CursorError("cursor is past the end of the result")
+            page, page_offset, total = rows[:size], 0, table.num_rows
+            end = offset + len(page)
+            more = len(rows) > size
+        else:
+            total = len(table)
+            if offset > total:
+                raise CursorError("cursor is past the end of the result")
+            page, page_offset = table, offset
+            end = min(offset + size, total)
+            more = end < total
+        if rows_only:
+            html = build_html_rows(page.columns, page, offset=page_offset, max_rows=size)
+        else:
+            html = build_html_table(page.columns, page, result.columns_metadata, offset=page_offset, max_rows=size)
+        next_cursor = encode_cursor(result_id, end, size) if more else None
+        with self._lock:
+            self.pages_served += 1
+        return TablePage(html, offset, end - offset, total, next_cursor, result_id)
+
+    def _get(self, result_id: str) -> _Result:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            result = self._results.get(result_id)
+            if result is None:
+                raise CursorError("result expired or unknown; re-run the query")
+            result.last_used = now
+            self._results.move_to_end(result_id)
+            return result
+
+    def _expire(self, now: float) -> None:
+        # LRU order is also last-use order, so expired entries are at the front
+        while self._results:
+            result_id, result = next(iter(self._results.items()))
+            if now - result.last_used <= self.ttl_s:
+                break
+            self._drop(result_id)
+            self.expirations += 1
+
+    def _drop(self, result_id: str) -> None:
+        result = self._results.pop(result_id)
+        self._rows -= _held_rows(result.table)
+        if is_data_source(result.table):
+            result.table.close()  # release the file handle and mapping
+
+
+def _held_rows(table) -> int:
+    """Rows kept in memory (a DataSource keeps none)."""
+    return 0 if is_data_source(table) else len(table)
+
+
+def _has_row(table, offset: int) -> bool:
+    if is_data_source(table):
+        return next(table.row_tuples(limit=1, offset=offset), None) is not None
+    return offset < len(table)
+
+
+def _clamp(page_size: int) -> int:
+    return max(1, min(int(page_size), MAX_PAGE_ROWS))
@@ -1,67 +1,190 @@
-import json 
 from langchain_core.prompts import ChatPromptTemplate
 
 import os
+import textwrap
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+from html_minify import MinifyHTMLExtension
+import instrumentation
+from instrumentation import observe, span
+from json_backend import dumps, dumps_memo, install_tojson, render_scope
+from marketshare import MarketSharePivot, is_nested_marketshare
+from prompt_registry import PromptRegistry, default_bytecode_cache
+from data_sources import DataSource, is_data_source
+from table import ColumnarTable, is_table, iter_row_tuples
+from table_encoder import CHARS_PER_TOKEN, encode_table, estimate_tokens
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # ↑ gets the current directory where this script is located
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
 
+# Version of the summarizer prompt used by render__prompt (v5: static, cacheable
+# system prefix; see SplitPrompt)
+PROMPT_VERSION = "v5"
+
+# Token budget for the table data embedded in the prompt (v4+)
+TABLE_TOKEN_BUDGET = 4000
+TABLE_ENCODE_STRATEGY = "aggregate"
+
+_bytecode_cache = default_bytecode_cache()
+
 _jinja_env = Environment(
     loader=FileSystemLoader(TEMPLATE_DIR),
-    autoescape=select_autoescape(["html", "xml"])
+    autoescape=select_autoescape(["html", "xml"]),
+    bytecode_cache=_bytecode_cache,
+    # Static markup is minified when the template is compiled
+    extensions=[MinifyHTMLExtension],
 )
+install_tojson(_jinja_env)
+
+# Compiled once per process; see prompt_registry.py
+_prompt_registry = PromptRegistry(_jinja_env, bytecode_cache=_bytecode_cache)
+
+# MARKETSHARE_GRAPH: products kept before the "Other" bucket, regions kept
+# before "Other regions" (chart payload and prompt summary)
+MARKETSHARE_TOP_PRODUCTS = 10
+MARKETSHARE_MAX_REGIONS = 50
+
+# Rows rendered by build_html_table
+HTML_TABLE_MAX_ROWS = 50
+# Target size of the chunks yielded by iter_html_table
+HTML_CHUNK_CHARS = 16 * 1024
+
 
-import re
 def build_html_table(
     table_columns,
     table_rows,
-    columns_metadata
+    columns_metadata,
+    offset: int = 0,
+    max_rows: int | None = HTML_TABLE_MAX_ROWS,
+) -> str:
+    """
+    Legend + table HTML for rows `offset` .. `offset + max_rows` (the first
+    HTML_TABLE_MAX_ROWS by default). Later pages: see pagination.TablePager.
+    """
+    table_columns = list(table_columns or getattr(table_rows, "columns", ()))
+    with span("build_html_table"):
+        template = _prompt_registry.get_template("table.html")
+        html = template.render(
+            table_columns=table_columns,
+            # Lazy row tuples: no slice copy, no per-cell dict lookups in the template
+            table_rows=iter_row_tuples(table_rows, table_columns, limit=max_rows, offset=offset),
+            columns_metadata=columns_metadata or {}
+        )
+    # Whitespace was already removed at compile time (MinifyHTMLExtension)
+    return html.strip()
+
+
+def build_html_rows(
+    table_columns,
+    table_rows,
+    offset: int = 0,
+    max_rows: int | None = HTML_TABLE_MAX_ROWS,
 ) -> str:
-    template = _jinja_env.get_template("table.html")
-    html = template.render(
+    """Only the `<tr>` rows of a page, for appending to an already rendered table."""
+    table_columns = list(table_columns or getattr(table_rows, "columns", ()))
+    with span("build_html_rows"):
+        template = _prompt_registry.get_template("table_rows.html")
+        html = template.render(
+            table_columns=table_columns,
+            table_rows=iter_row_tuples(table_rows, table_columns, limit=max_rows, offset=offset),
+        )
+    return html.strip()
+
+
+def iter_html_table(
+    table_columns,
+    table_rows,
+    columns_metadata,
+    max_rows: int | None = None,
+    chunk_chars: int = HTML_CHUNK_CHARS,
+):
+    """
+    Stream the minified table HTML in chunks of roughly `chunk_chars`.
+    Rows are consumed lazily, so `table_rows` can be a table or any iterable
+    of dicts and the full document is never held in memory. `max_rows=None`
+    renders every row.
+    """
+    table_columns = list(table_columns or getattr(table_rows, "columns", ()))
+    template = _prompt_registry.get_template("table.html")
+    buf, size = [], 0
+    for piece in template.generate(
         table_columns=table_columns,
-        table_rows=table_rows[:50],
-        columns_metadata=columns_metadata or {}
-    )
+        table_rows=iter_row_tuples(table_rows, table_columns, limit=max_rows),
+        columns_metadata=columns_metadata or {},
+    ):
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_chars:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
 
-    # --- HARD NORMALIZATION ---
-    # 1. Remove newlines and tabs
-    html = html.replace("\n", "").replace("\t", "")
 
-    # 2. Collapse multiple spaces into one
-    html = re.sub(r"\s{2,}", " ", html)
+# System text shared by every prompt version: v3/v4 embed it, indented, in a
+# templated system message; v5 sends it unindented as its static system message
+_ROLE = r"""You are a **Healthcare Marketing Analytics Summarizer** trained to interpret structured, tabular outputs
+from InsightIQ — a data-driven HCP analytics system.
 
-    # 3. Remove spaces between tags: >   <
-    html = re.sub(r">\s+<", "><", html)
-    return html.strip()
+Your job: analyze summarized analytical outputs (top 100 rows) and produce a **Markdown summary**.
+"""
 
+_SUMMARY_RULES = r"""## RULES OF SUMMARIZATION (Apply to ALL outputs)
+1. **CRITICAL:** If you output a JSON code block, you **MUST** close it with triple backticks (```) and insert **two blank lines** before starting the "Key Insights" section.
+2. Use **column descriptions** from "Columns Metadata" to interpret variables.
+3. Output the summary in **Markdown**.
+4. Derive **insights**, not repetitions of numbers.
+5. Include the following sections in order:
+   - **Key Insights** — concise, data-driven points
+   - **Business Implication** — brief strategic or marketing interpretation
+   - **Executive Summary** — one concise insight sentence
+6. Be concise, clear, and business-focused.
+"""
 
+_OUTPUT_FORMAT = r"""## EXPECTED OUTPUT FORMAT
 
+#### The Below information being presented to you is curated from the Real World data avaialble within our exosystem .
 
+### Key Insights
+- Write 2–3 concise insights derived from the data.
 
-def build_prompt_v3() -> ChatPromptTemplate:
-    system_text = r"""
-    You are a **Healthcare Marketing Analytics Summarizer** trained to interpret structured, tabular outputs
-    from InsightIQ — a data-driven HCP analytics system.
+### Business Implication
+Write 1–2 sentences summarizing marketing or adoption impact.
+
+### Executive Summary
+One concise takeaway summarizing the finding.
 
-    Your job: analyze summarized analytical outputs (top 100 rows) and produce a **Markdown summary**.
-    
-    DATA PRESENTATION RULES:
-    1. If the chart type is a GRAPH, output the data as a JSON code block for rendering, followed by the text summary.
+<br>
+---
 
-    ---
+## FINAL FORMATTING RULES
+- Do NOT output any literal "\n" or "\\n" text. Use real newlines only.
+- Ensure the JSON block is completely closed before the Markdown text begins.
+"""
 
-    ## CONTEXT
 
-    ### Subquery
-    {{ subquery }}
+def _indented(text: str) -> str:
+    return textwrap.indent(text, "    ")
 
-    ---
-    ### Visual Data Output
-    {%- if visualization and visualization.chart_type == "TABLE" -%}
+
+_SYSTEM_HEAD = "\n" + _indented(_ROLE + r"""
+DATA PRESENTATION RULES:
+1. If the chart type is a GRAPH, output the data as a JSON code block for rendering, followed by the text summary.
+
+---
+
+## CONTEXT
+
+### Subquery
+{{ subquery }}
+
+---
+### Visual Data Output
+""")
+
+_V3_VISUAL_BLOCK = r"""    {%- if visualization and visualization.chart_type == "TABLE" -%}
     The visualization for this query is a TABLE.
     The table will be rendered externally.
     You must NOT generate any table, HTML, Markdown table, or tabular structure.
@@ -99,49 +222,63 @@ def build_prompt_v3() -> ChatPromptTemplate:
     }
     ```
     {%- endif -%}
-    
-    ---
-
-    ### Visualization Metadata
-    {{ visualization_pretty }}
+    """
 
-    ---
+# v4: every table appears once, in compact form (see table_encoder.py)
+_V4_VISUAL_BLOCK = r"""    {%- if visualization and visualization.chart_type == "TABLE" -%}
+    The visualization for this query is a TABLE.
+    The table will be rendered externally.
+    You must NOT generate any table, HTML, Markdown table, or tabular structure.
+    Proceed directly to the analytical summary sections only.
 
-    ## RULES OF SUMMARIZATION (Apply to ALL outputs)
-    1. **CRITICAL:** If you output a JSON code block above, you **MUST** close it with triple backticks (```) and insert **two blank lines** before starting the "Key Insights" section.
-    2. Use **column descriptions** from "Column Metadata" to interpret variables.
-    3. Output the summary in **Markdown**.
-    4. Derive **insights**, not repetitions of numbers.
-    5. Include the following sections in order:
-       - **Key Insights** — concise, data-driven points
-       - **Business Implication** — brief strategic or marketing interpretation
-       - **Executive Summary** — one concise insight sentence
-    6. Be concise, clear, and business-focused.
+    {%- elif visualization and visualization.chart_type == "MARKETSHARE_GRAPH" -%}
+    Provide the data in a JSON code block for plotting.
+    Structure:
+    ```json
+    {
+      "plottinggraph": [
+        {
+          "chartType": "STACKED_BAR",
+          "xAxis": ["name"],
+          "yAxis": {{ y_axis | tojson }},
+          "chartData": {{ chart_data }}
+        }
+      ]
+    }
+    ```
 
-    ## EXPECTED OUTPUT FORMAT
-    
-    #### The Below information being presented to you is curated from the Real World data avaialble within our exosystem .  
+    {%- else -%}
+    Provide the data in a JSON code block for plotting.
+    Structure:
+    ```json
+    {
+      "plottinggraph": [
+        {
+          "chartType": "BAR",
+          "xAxis": [""],
+          "yAxis": ["", ""],
+          "chartData": <rows of "Table Data" below, one JSON object per row>
+        }
+      ]
+    }
+    ```
+    {%- endif -%}
+    """
 
-    ### Key Insights
-    - Write 2–3 concise insights derived from the data.
+_SYSTEM_FOOT = "\n" + _indented(r"""---
 
-    ### Business Implication
-    Write 1–2 sentences summarizing marketing or adoption impact.
+### Visualization Metadata
+{{ visualization_pretty }}
 
-    ### Executive Summary
-    One concise takeaway summarizing the finding.
+---
 
-    <br>
-    ---
+""" + _SUMMARY_RULES + "\n" + _OUTPUT_FORMAT) + "    "
 
-    ## FINAL FORMATTING RULES
-    - Do NOT output any literal "\n" or "\\n" text. Use real newlines only.
-    - Ensure the JSON block is completely closed before the Markdown text begins.
-    """
 
+def build_prompt_v3() -> ChatPromptTemplate:
     return ChatPromptTemplate.from_messages(
         [
-            ("system", system_text),
+            ("system", _SYSTEM_HEAD + _V3_VISUAL_BLOCK + _SYSTEM_FOOT),
             (
                 "human",
                 "Subquery:\n\n{{ subquery }}\n\n"
@@ -157,51 +294,281 @@ def build_prompt_v3() -> ChatPromptTemplate:
     )
 
 
+def build_prompt_v4() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", _SYSTEM_HEAD + _V4_VISUAL_BLOCK + _SYSTEM_FOOT),
+            (
+                "human",
+                "Subquery:\n\n{{ subquery }}\n\n"
+                "User Preference:\n{{ user_pref | tojson }}\n\n"
+                "{% if table_data %}"
+                "Table Data (columnar: \"columns\" names each position of every row array):\n"
+                "{{ table_data }}\n\n"
+                "{% endif %}"
+                "{% if market_summary %}"
+                "Market Share Summary:\n{{ market_summary }}\n\n"
+                "{% endif %}"
+                "Columns Metadata:\n{{ columns_metadata | tojson }}\n\n"
+            ),
+        ],
+        template_format="jinja2",
+    )
+
+
+# v5: the system message is fully static (rules + output format for every
+# chart type), so it is rendered once and can be cached by the provider as a
+# prompt prefix. Everything request-specific goes in the human message.
+_V5_SYSTEM = "\n" + _ROLE + r"""The request below gives the subquery, the visualization metadata and the data.
+
+## DATA PRESENTATION RULES
+1. chart type TABLE: the table is rendered externally. You must NOT generate any table, HTML,
+   Markdown table, or tabular structure. Proceed directly to the analytical summary sections only.
+2. Any GRAPH chart type: first output the data as a JSON code block for plotting, exactly in the
+   structure given under "Visual Data Output" in the request, followed by the text summary.
+
+""" + _SUMMARY_RULES + "\n" + _OUTPUT_FORMAT
+
+_V5_VISUAL_BLOCK = (
+    "{% if visualization and visualization.chart_type == \"TABLE\" %}"
+    "TABLE (rendered externally; no table in your answer)"
+    "{% elif visualization and visualization.chart_type == \"MARKETSHARE_GRAPH\" %}"
+    "```json\n"
+    "{\"plottinggraph\": [{\"chartType\": \"STACKED_BAR\", \"xAxis\": [\"name\"], "
+    "\"yAxis\": {{ y_axis | tojson }}, \"chartData\": {{ chart_data }}}]}\n"
+    "```"
+    "{% else %}"
+    "```json\n"
+    "{\"plottinggraph\": [{\"chartType\": \"BAR\", \"xAxis\": [\"\"], \"yAxis\": [\"\", \"\"], "
+    "\"chartData\": <rows of \"Table Data\" below, one JSON object per row>}]}\n"
+    "```"
+    "{% endif %}"
+)
+
+
+def build_prompt_v5() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", _V5_SYSTEM),
+            (
+                "human",
+                "{% if conversation %}"
+                "Conversation So Far (earlier turns of this session; the subquery may refer to them):\n"
+                "{{ conversation }}\n\n"
+                "{% endif %}"
+                "Subquery:\n\n{{ subquery }}\n\n"
+                "Visual Data Output:\n" + _V5_VISUAL_BLOCK + "\n\n"
+                "Visualization Metadata:\n{{ visualization_pretty }}\n\n"
+                "User Preference:\n{{ user_pref | tojson }}\n\n"
+                "{% if table_data %}"
+                "Table Data (columnar: \"columns\" names each position of every row array):\n"
+                "{{ table_data }}\n\n"
+                "{% endif %}"
+                "{% if market_summary %}"
+                "Market Share Summary:\n{{ market_summary }}\n\n"
+                "{% endif %}"
+                "{% if context %}"
+                "Reference Documents (retrieved excerpts; use them only where they bear on the subquery):\n"
+                "{{ context }}\n\n"
+                "{% endif %}"
+                "Columns Metadata:\n{{ columns_metadata | tojson }}\n\n"
+            ),
+        ],
+        template_format="jinja2",
+    )
+
+
+_prompt_registry.register("summarizer", "v3", build_prompt_v3)
+_prompt_registry.register("summarizer", "v4", build_prompt_v4)
+_prompt_registry.register("summarizer", "v5", build_prompt_v5)
+
+
+class SplitPrompt(str):
+    """
+    The full prompt text, plus its static `prefix` (identical for every
+    request of a prompt version, identified by `fingerprint`) and the
+    request-specific `suffix`; `prefix + suffix == prompt`. Behaves as a
+    plain str everywhere else.
+    """
+
+    prefix: str
+    suffix: str
+    fingerprint: str
+
+    def __new__(cls, prefix: str, suffix: str, fingerprint: str) -> "SplitPrompt":
+        obj = super().__new__(cls, prefix + suffix)
+        obj.prefix, obj.suffix, obj.fingerprint = prefix, suffix, fingerprint
+        return obj
+
+    def __getnewargs__(self):
+        # Pickled by parts (e.g. back from a render_pool worker)
+        return (self.prefix, self.suffix, self.fingerprint)
+
+
+def marketshare_payload(pivot: MarketSharePivot) -> dict:
+    """`plottinggraph` payload for MARKETSHARE_GRAPH, reduced like the prompt's copy."""
+    return pivot.plottinggraph(MARKETSHARE_TOP_PRODUCTS, MARKETSHARE_MAX_REGIONS)
+
+
+def prompt_cache_stats() -> dict:
+    """Hit/miss counters of the prompt registry and its on-disk bytecode cache."""
+    return _prompt_registry.stats()
+
+
+def warm_prompts() -> None:
+    """Compile every registered prompt and the HTML table templates up front."""
+    _prompt_registry.warm()
+    for name in ("table.html", "table_rows.html"):
+        _prompt_registry.get_template(name)
+
+
 def render__prompt(
     subquery: str,
     table_text: str,
     visualization: dict | None = None,
     user_pref: dict | None = None,
     table_columns: list | None = None,
-    table_rows: list | None = None,
+    table_rows: list | ColumnarTable | MarketSharePivot | DataSource | None = None,
     columns_metadata: dict | None = None,
+    token_budget: int | None = TABLE_TOKEN_BUDGET,
+    prompt_version: str = PROMPT_VERSION,
+    stats: dict | None = None,
+    conversation: str | None = None,
+    context: str | None = None,
+    metadata_columns: list | None = None,
 ) -> str:
+    """
+    Render the summarizer prompt and (for TABLE) the HTML table.
+
+    The table goes into the prompt once, compactly encoded and fitted to
+    `token_budget` tokens. Pass a dict as `stats` to receive the table
+    encoding report and the final prompt size.
+
+    TABLE rows may be a list of dicts, a ColumnarTable (see table.py) or a
+    file-backed DataSource (data_sources.py), of which only the rows the HTML
+    table and the token budget can show are decoded.
+    MARKETSHARE_GRAPH rows (nested, or an already built MarketSharePivot) go
+    in as the reduced chart payload plus a short share summary.
+
+    `conversation` is the session history block (session_memory.py) and
+    `context` the retrieved document excerpts (retrieval.py); v5 only.
+    `metadata_columns` limits the prompt's Columns Metadata to those columns
+    (the HTML legend keeps every description).
+    """
     visualization = visualization or {}
     user_pref = user_pref or {}
-
-    visualization_pretty = json.dumps(visualization, indent=2, ensure_ascii=False)
-
-    rendered_html = ""
-    if visualization.get("chart_type") == "TABLE":
-        rendered_html = build_html_table(
-            table_columns=table_columns,
-            table_rows=table_rows,
-            columns_metadata=columns_metadata,
-        )
-
-    template = build_prompt_v3()
-
-    formatted = template.format_prompt(
-        subquery=subquery or "",
-        table_text=table_text or "",
-        visualization_pretty=visualization_pretty,
-        visualization=visualization,
-        user_pref=user_pref,
-        table_columns=table_columns or [],
-        table_rows=table_rows or [],
-        columns_metadata=columns_metadata or {},
-        rendered_html="",  # IMPORTANT: DO NOT PASS HTML INTO TEMPLATE
-    )
-
-    # 1. Serialize prompt (LLM-safe)
-    try:
-        prompt_str = formatted.to_string()
-        if not prompt_str.strip():
+    table_rows = table_rows or []
+    source = None
+    if is_data_source(table_rows):
+        # Without a budget, the first HTML page's rows (max_chars=0), never the whole file
+        max_chars = token_budget * CHARS_PER_TOKEN if token_budget is not None else 0
+        prefix, complete = table_rows.read_prefix(table_columns or None, max_chars, min_rows=HTML_TABLE_MAX_ROWS)
+        source = None if complete else table_rows
+        table_rows = prefix
+    # A prefix of a larger file is truncated, not summarized (see encode_table)
+    prefix_args = dict(partial=True, total_rows=source.num_rows) if source is not None else {}
+    if prompt_version == "v3" and is_table(table_rows):
+        table_rows = table_rows.to_records()  # v3 reads dict rows in the template
+
+    with span("render_prompt"):
+        # Objects referenced several times are serialized once per render
+        with render_scope():
+            visualization_pretty = dumps_memo(visualization, indent=2)
+
+            rendered_html = ""
+            if visualization.get("chart_type") == "TABLE":
+                rendered_html = build_html_table(
+                    table_columns=table_columns,
+                    table_rows=table_rows,
+                    columns_metadata=columns_metadata,
+                )
+
+            # Each table is encoded once: chart payload for MARKETSHARE_GRAPH,
+            # columnar "Table Data" otherwise
+            encoded = None
+            table_data, chart_data, y_axis, market_summary = "", "", [], ""
+            if visualization.get("chart_type") == "MARKETSHARE_GRAPH":
+                pivot = None
+                if isinstance(table_rows, MarketSharePivot):
+                    pivot = table_rows
+                elif prompt_version != "v3" and is_nested_marketshare(table_rows):
+                    pivot = MarketSharePivot.from_nested(table_rows)
+                if pivot is not None and prompt_version == "v3":
+                    table_rows = pivot.chart_data()  # v3 reads the nested rows itself
+                elif pivot is not None:
+                    # Dense pivot: top products + "Other", plus a short summary
+                    # instead of the raw nested JSON
+                    graph = marketshare_payload(pivot)["plottinggraph"][0]
+                    chart_data = dumps(graph["chartData"])
+                    y_axis = graph["yAxis"]
+                    market_summary = pivot.summary(MARKETSHARE_TOP_PRODUCTS)
+                elif table_rows:
+                    encoded = encode_table(table_columns, table_rows, token_budget, layout="records", **prefix_args)
+                    chart_data = encoded.text
+                    first = table_rows[0]
+                    if isinstance(first, dict) and isinstance(first.get("data"), list):
+                        y_axis = [d.get("name") for d in first["data"]]
+                else:
+                    chart_data = table_text or "[]"
+            elif table_rows:
+                encoded = encode_table(
+                    table_columns, table_rows, token_budget, strategy=TABLE_ENCODE_STRATEGY, **prefix_args
+                )
+                table_data = encoded.text
+            else:
+                table_data = table_text or ""
+
+            prompt_metadata = columns_metadata or {}
+            if metadata_columns is not None:
+                keep = set(metadata_columns)
+                prompt_metadata = {c: d for c, d in prompt_metadata.items() if c in keep}
+
+            template = _prompt_registry.get("summarizer", prompt_version)
+
+            formatted = template.format_prompt(
+                subquery=subquery or "",
+                table_text=table_text or "",
+                visualization_pretty=visualization_pretty,
+                visualization=visualization,
+                user_pref=user_pref,
+                table_columns=table_columns or [],
+                table_rows=table_rows,
+                columns_metadata=prompt_metadata,
+                table_data=table_data,
+                chart_data=chart_data,
+                y_axis=y_axis,
+                market_summary=market_summary,
+                conversation=conversation or "",
+                context=context or "",
+                rendered_html="",  # IMPORTANT: DO NOT PASS HTML INTO TEMPLATE
+            )
+
+        # 1. Serialize prompt (LLM-safe)
+        try:
+            prompt_str = formatted.to_string()
+            if not prompt_str.strip():
+                prompt_str = "\n\n".join([m.content for m in formatted.to_messages()])
+        except Exception:
             prompt_str = "\n\n".join([m.content for m in formatted.to_messages()])
-    except Exception:
-        prompt_str = "\n\n".join([m.content for m in formatted.to_messages()])
-
-    prompt_str = prompt_str.strip()
 
+        prompt_str = prompt_str.strip()
+        prefix = template.prefix
+        if prefix and prompt_str.startswith(prefix):
+            prompt_str = SplitPrompt(prefix, prompt_str[len(prefix):], template.fingerprint)
+
+    if instrumentation.ENABLED:
+        observe("prompt_bytes", len(prompt_str.encode("utf-8")))
+    if stats is not None:
+        if encoded is not None:
+            stats.update(encoded.report())
+        stats["prompt_version"] = prompt_version
+        stats["prompt_chars"] = len(prompt_str)
+        stats["prompt_tokens"] = estimate_tokens(prompt_str)
+        if isinstance(prompt_str, SplitPrompt):
+            stats["prompt_prefix_tokens"] = estimate_tokens(prompt_str.prefix)
+            stats["prompt_suffix_tokens"] = estimate_tokens(prompt_str.suffix)
+            stats["prompt_prefix_fingerprint"] = prompt_str.fingerprint
+        stats["prompt_history_tokens"] = estimate_tokens(conversation) if conversation else 0
+        stats["prompt_context_tokens"] = estimate_tokens(context) if context else 0
 
     return prompt_str,rendered_html
@@ -0,0 +1,229 @@
+# prompt_registry.py
+"""
+Process-wide registry of compiled prompt and HTML templates.
+
+LangChain's jinja2 path re-parses the template source on every
+`format_prompt` call, so `render__prompt` spent most of its time compiling
+the same system/human text over and over. The registry compiles every
+(name, version) once per process, keeps the compiled Jinja templates and
+renders them itself. Compiled bytecode is also written to disk so a cold
+worker can load it instead of parsing the sources again.
+
+Leading messages without template variables (a static system prompt) are
+rendered once at compile time and fingerprinted, so providers can cache
+them as a prompt prefix (see `CompiledPrompt.prefix`).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, Template, meta
+from jinja2.sandbox import SandboxedEnvironment
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.prompt_values import ChatPromptValue
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts.chat import (
+    AIMessagePromptTemplate,
+    HumanMessagePromptTemplate,
+    SystemMessagePromptTemplate,
+)
+
+from json_backend import install_tojson
+
+# Bump when a change to the environments alters compiled output for an
+# unchanged template source (Jinja only checksums the source itself).
+BYTECODE_TAG = "v2"
+
+
+# ---------- Disk cache ----------
+def _default_cache_dir() -> Path:
+    """
+    Resolve the bytecode cache directory:
+      1) env PROMPT_CACHE_DIR
+      2) .../Jinja_2_demo/.jinja_cache
+    """
+    here = Path(__file__).resolve().parent
+    return Path(os.getenv("PROMPT_CACHE_DIR") or here / ".jinja_cache")
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that counts disk hits and misses."""
+
+    def __init__(self, directory: str, pattern: str = "__jinja2_%s.cache"):
+        super().__init__(directory, pattern)
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+def default_bytecode_cache() -> Optional[CountingBytecodeCache]:
+    """Shared on-disk bytecode cache, or None if the directory is not writable."""
+    cache_dir = _default_cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return CountingBytecodeCache(str(cache_dir), f"__jinja2_{BYTECODE_TAG}_%s.cache")
+
+
+# ---------- Compiled prompts ----------
+_ROLE_MESSAGES = (
+    (SystemMessagePromptTemplate, SystemMessage),
+    (HumanMessagePromptTemplate, HumanMessage),
+    (AIMessagePromptTemplate, AIMessage),
+)
+
+
+@dataclass
+class CompiledPrompt:
+    """A chat prompt whose message templates are already compiled."""
+
+    name: str
+    version: str
+    messages: List[Tuple[type, Template]] = field(default_factory=list)
+    # Leading variable-free messages, rendered once
+    static_messages: List[BaseMessage] = field(default_factory=list)
+
+    @property
+    def prefix(self) -> str:
+        """Prompt text of the static messages as `to_string()` lays it out ("" if none)."""
+        if not self.static_messages:
+            return ""
+        return get_buffer_string(self.static_messages) + "\n"
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable id of the static prefix (changes whenever its text does)."""
+        material = f"{self.name}@{self.version}\n{self.prefix}".encode("utf-8")
+        return hashlib.sha256(material).hexdigest()[:16]
+
+    def format_messages(self, **kwargs: Any) -> List[BaseMessage]:
+        dynamic = self.messages[len(self.static_messages):]
+        return self.static_messages + [msg_cls(content=tpl.render(**kwargs)) for msg_cls, tpl in dynamic]
+
+    def format_prompt(self, **kwargs: Any) -> ChatPromptValue:
+        """Drop-in for ChatPromptTemplate.format_prompt."""
+        return ChatPromptValue(messages=self.format_messages(**kwargs))
+
+
+class PromptRegistry:
+    """
+    Compile each registered prompt version (and each file template) once
+    per process and hand out the compiled objects on every later call.
+    """
+
+    def __init__(
+        self,
+        template_env: Environment,
+        bytecode_cache: Optional[CountingBytecodeCache] = None,
+    ):
+        self._template_env = template_env
+        self._bytecode_cache = bytecode_cache
+        self._sources: Dict[str, str] = {}
+        # Same sandbox LangChain uses for template_format="jinja2".
+        self._prompt_env = SandboxedEnvironment(
+            loader=DictLoader(self._sources),
+            bytecode_cache=bytecode_cache,
+        )
+        # Prompts are not HTML: no \u003c-style escaping in `tojson`
+        install_tojson(self._prompt_env, html_safe=False)
+        self._builders: Dict[Tuple[str, str], Callable[[], ChatPromptTemplate]] = {}
+        self._prompts: Dict[Tuple[str, str], CompiledPrompt] = {}
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def prompt_env(self) -> Environment:
+        return self._prompt_env
+
+    def register(self, name: str, version: str, builder: Callable[[], ChatPromptTemplate]) -> None:
+        """Register a builder; it is only called the first time the version is requested."""
+        self._builders[(name, version)] = builder
+
+    def get(self, name: str, version: str) -> CompiledPrompt:
+        key = (name, version)
+        compiled = self._prompts.get(key)
+        if compiled is not None:
+            self.hits += 1
+            return compiled
+        with self._lock:
+            compiled = self._prompts.get(key)
+            if compiled is None:
+                self.misses += 1
+                compiled = self._compile(name, version)
+                self._prompts[key] = compiled
+            else:
+                self.hits += 1
+        return compiled
+
+    def get_template(self, template_name: str) -> Template:
+        """Cached equivalent of `template_env.get_template(template_name)`."""
+        template = self._templates.get(template_name)
+        if template is not None:
+            self.hits += 1
+            return template
+        with self._lock:
+            template = self._templates.get(template_name)
+            if template is None:
+                self.misses += 1
+                template = self._template_env.get_template(template_name)
+                self._templates[template_name] = template
+            else:
+                self.hits += 1
+        return template
+
+    def warm(self) -> None:
+        """Compile every registered prompt up front (cheap when bytecode is on disk)."""
+        for name, version in list(self._builders):
+            self.get(name, version)
+
+    def stats(self) -> Dict[str, int]:
+        bcc = self._bytecode_cache
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "compiled": len(self._prompts) + len(self._templates),
+            "bytecode_hits": bcc.hits if bcc else 0,
+            "bytecode_misses": bcc.misses if bcc else 0,
+        }
+
+    def _compile(self, name: str, version: str) -> CompiledPrompt:
+        try:
+            builder = self._builders[(name, version)]
+        except KeyError:
+            raise KeyError(f"Prompt not registered: {name}@{version}") from None
+
+        chat_template = builder()
+        compiled = CompiledPrompt(name=name, version=version)
+        for idx, message_template in enumerate(chat_template.messages):
+            msg_cls = next(
+                (m for t, m in _ROLE_MESSAGES if isinstance(message_template, t)), None
+            )
+            if msg_cls is None:
+                raise ValueError(f"{name}@{version}: unsupported message {type(message_template).__name__}")
+            if message_template.prompt.template_format != "jinja2":
+                raise ValueError(f"{name}@{version}: only jinja2 templates are supported")
+            source_name = f"{name}/{version}/{idx}"
+            self._sources[source_name] = message_template.prompt.template
+            compiled.messages.append((msg_cls, self._prompt_env.get_template(source_name)))
+
+        # Render the static leading messages once
+        for (msg_cls, template), message_template in zip(compiled.messages, chat_template.messages):
+            source = message_template.prompt.template
+            if meta.find_undeclared_variables(self._prompt_env.parse(source)):
+                break
+            compiled.static_messages.append(msg_cls(content=template.render()))
+        return compiled
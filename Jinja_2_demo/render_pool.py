@@ -0,0 +1,373 @@
+# render_pool.py
+"""
+Async rendering front end: large renders run in a warm process pool.
+
+`render__prompt` and `build_html_table` are CPU-bound pure Python. Run on
+the event loop (or in a thread, which still holds the GIL), rendering a
+100k-row table stalls every other in-flight stream for the whole render.
+Through the pool, a render only costs the loop a submit and an await:
+
+    pool = get_render_pool()
+    prompt_str, rendered_html = await pool.render_prompt(subquery=..., table_rows=..., ...)
+    html = await pool.build_html_table(table_columns, table_rows, columns_metadata)
+
+Renders of up to RENDER_INLINE_MAX_CELLS cells (rows x columns actually
+rendered) stay inline: they are cheaper than the hand-off.
+
+Table rows reach the workers through a shared memory segment instead of
+being pickled. Numeric columns are copied in as packed arrays. Text columns
+are dictionary-encoded as int32 codes plus one UTF-8 blob of the distinct
+values, so repeated strings (specialty, region...) cross once. Mixed columns
+are pickled into the segment. The worker rebuilds a ColumnarTable and renders
+it. Only the other arguments and the result go through the pool's pipe, and
+the prompt and the first HTML page have bounded sizes.
+
+Workers import the builders and compile every template once, at start-up
+(`warm()` starts them up front). `stats()` reports the pending renders, the
+queue depth (renders waiting for a worker) and the latency percentiles.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import instrumentation
+from instrumentation import LATENCY_BUCKETS, Histogram
+from marketshare import MarketSharePivot, is_nested_marketshare
+from prompt_constellatiion import HTML_TABLE_MAX_ROWS, build_html_table, render__prompt, warm_prompts
+from table import ColumnarTable, as_table
+
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Renders up to this many cells run inline on the caller
+RENDER_INLINE_MAX_CELLS = int(os.getenv("RENDER_INLINE_MAX_CELLS", "20000"))
+# spawn: workers never inherit the parent's threads (stream pool, locks)
+RENDER_POOL_START_METHOD = os.getenv("RENDER_POOL_START_METHOD", "spawn")
+
+_ALIGN = 8
+
+
+# -----------------------------------------------------------------------------
+# Shared-memory table transport
+# -----------------------------------------------------------------------------
+@dataclass
+class SharedTable:
+    """Picklable description of a table packed into a shared memory segment."""
+
+    shm_name: str
+    columns: Tuple[str, ...]
+    length: int
+    # Per column: ("array", dtype, offset) | ("dict", codes offset, ends offset,
+    # distinct values, blob offset, blob bytes) | ("pickle", offset, bytes)
+    layout: List[tuple]
+    nbytes: int
+
+
+def _encode_column(arr: np.ndarray) -> Tuple[tuple, List[Any]]:
+    """(layout spec without offsets, byte parts) for one column."""
+    if arr.dtype.kind in "biuf":
+        return ("array", arr.dtype.str), [np.ascontiguousarray(arr)]
+    values = arr.tolist()
+    if all(type(v) is str for v in values):
+        index: Dict[str, int] = {}
+        codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+        uniques = list(index)
+        ends = np.cumsum([len(u) for u in uniques], dtype=np.int64)
+        return ("dict", len(uniques)), [codes, ends, "".join(uniques).encode("utf-8")]
+    return ("pickle",), [pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)]
+
+
+def share_table(table_columns: Sequence[str] | None, table_rows) -> Tuple[SharedMemory, SharedTable]:
+    """
+    Pack `table_rows` (list of dicts or ColumnarTable) into a new shared
+    memory segment. The caller owns the segment: close() and unlink() it once
+    the render is done.
+    """
+    table = as_table(table_rows, list(table_columns) if table_columns else None)
+    if not isinstance(table, ColumnarTable):
+        table = ColumnarTable.from_records(table.to_records(), table.columns)
+    specs, parts = [], []
+    for c in table.columns:
+        spec, col_parts = _encode_column(table.column(c))
+        specs.append(spec)
+        parts.append(col_parts)
+
+    offset, placed = 0, []
+    for col_parts in parts:
+        offsets = []
+        for part in col_parts:
+            offsets.append(offset)
+            offset += -(-memoryview(part).nbytes // _ALIGN) * _ALIGN
+        placed.append(offsets)
+
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    try:
+        layout = []
+        for spec, col_parts, offsets in zip(specs, parts, placed):
+            for part, at in zip(col_parts, offsets):
+                view = memoryview(part).cast("B")
+                shm.buf[at:at + view.nbytes] = view
+                view.release()
+            if spec[0] == "array":
+                layout.append((spec[0], spec[1], offsets[0]))
+            elif spec[0] == "dict":
+                blob = memoryview(col_parts[2]).nbytes
+                layout.append(("dict", offsets[0], offsets[1], spec[1], offsets[2], blob))
+            else:
+                layout.append(("pickle", offsets[0], memoryview(col_parts[0]).nbytes))
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, SharedTable(shm.name, table.columns, len(table), layout, offset)
+
+
+def load_table(shared: SharedTable) -> ColumnarTable:
+    """Rebuild the ColumnarTable packed by `share_table` (worker side)."""
+    shm = SharedMemory(name=shared.shm_name)
+    buf, n = shm.buf, shared.length
+    try:
+        data = {}
+        for name, spec in zip(shared.columns, shared.layout):
+            kind = spec[0]
+            if kind == "array":
+                arr = np.frombuffer(buf, dtype=np.dtype(spec[1]), count=n, offset=spec[2]).copy()
+            elif kind == "dict":
+                _, codes_at, ends_at, n_unique, blob_at, blob_bytes = spec
+                codes = np.frombuffer(buf, dtype=np.int32, count=n, offset=codes_at).copy()
+                ends = np.frombuffer(buf, dtype=np.int64, count=n_unique, offset=ends_at).tolist()
+                text = bytes(buf[blob_at:blob_at + blob_bytes]).decode("utf-8")
+                uniques = np.empty(n_unique, dtype=object)
+                uniques[:] = [text[a:b] for a, b in zip([0] + ends[:-1], ends)]
+                # Cells share the distinct string objects
+                arr = uniques[codes]
+            else:
+                values = pickle.loads(buf[spec[1]:spec[1] + spec[2]])
+                arr = np.empty(n, dtype=object)
+                arr[:] = values
+            data[name] = arr
+    finally:
+        del buf
+        shm.close()
+    return ColumnarTable(shared.columns, data)
+
+
+# -----------------------------------------------------------------------------
+# Worker side
+# -----------------------------------------------------------------------------
+def _init_worker() -> None:
+    warm_prompts()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _render_in_worker(kind: str, kwargs: dict, shared: SharedTable | None):
+    """(result, render stats, render seconds) of one pooled render."""
+    start = time.perf_counter()
+    if shared is not None:
+        kwargs["table_rows"] = load_table(shared)
+    stats: Dict[str, Any] = {}
+    if kind == "prompt":
+        result = render__prompt(**kwargs, stats=stats)
+    else:
+        result = build_html_table(**kwargs)
+    return result, stats, time.perf_counter() - start
+
+
+# -----------------------------------------------------------------------------
+# Pool
+# -----------------------------------------------------------------------------
+def render_cells(table_columns, table_rows, max_rows: int | None = None) -> int:
+    """Rows x columns a render touches; the inline/pool decision."""
+    if isinstance(table_rows, MarketSharePivot):
+        return int(table_rows.values.size)
+    try:
+        rows = len(table_rows or ())
+    except TypeError:
+        return 0
+    if max_rows is not None:
+        rows = min(rows, max_rows)
+    return rows * max(1, len(table_columns or getattr(table_rows, "columns", ()) or ()))
+
+
+class RenderPool:
+    def __init__(
+        self,
+        workers: int = RENDER_POOL_WORKERS,
+        inline_max_cells: int = RENDER_INLINE_MAX_CELLS,
+        start_method: str = RENDER_POOL_START_METHOD,
+    ):
+        self.workers = max(1, workers)
+        self.inline_max_cells = inline_max_cells
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.inline = 0
+        self.pooled = 0
+        self.errors = 0
+        self.shm_bytes = 0
+        self._latency = {"inline": Histogram(LATENCY_BUCKETS), "pool": Histogram(LATENCY_BUCKETS)}
+        self._wait = Histogram(LATENCY_BUCKETS)
+
+    async def render_prompt(self, **kwargs) -> Tuple[str, str]:
+        """`render__prompt(**kwargs)` -> (prompt_str, rendered_html)."""
+        visualization = kwargs.get("visualization") or {}
+        if visualization.get("chart_type") == "MARKETSHARE_GRAPH" and is_nested_marketshare(kwargs.get("table_rows")):
+            # Pivoted here, as query_render_args does: nested rows would be packed as a flat table
+            kwargs = dict(kwargs, table_rows=MarketSharePivot.from_nested(kwargs["table_rows"]))
+        cells = render_cells(kwargs.get("table_columns"), kwargs.get("table_rows"))
+        stats = kwargs.pop("stats", None)
+        if cells <= self.inline_max_cells:
+            return self._inline(render__prompt, dict(kwargs, stats=stats))
+        result, worker_stats = await self._submit("prompt", kwargs)
+        if stats is not None:
+            stats.update(worker_stats)
+        return result
+
+    async def build_html_table(
+        self,
+        table_columns,
+        table_rows,
+        columns_metadata,
+        offset: int = 0,
+        max_rows: int | None = HTML_TABLE_MAX_ROWS,
+    ) -> str:
+        """`build_html_table(...)`; pages are usually small enough to stay inline."""
+        kwargs = dict(table_columns=table_columns, table_rows=table_rows,
+                      columns_metadata=columns_metadata, offset=offset, max_rows=max_rows)
+        try:
+            remaining = max(0, len(table_rows or ()) - offset)
+        except TypeError:
+            remaining = 0  # a DataSource decodes only the page's rows (data_sources.py)
+        if render_cells(table_columns, range(remaining), max_rows) <= self.inline_max_cells:
+            return self._inline(build_html_table, kwargs)
+        result, _ = await self._submit("html", kwargs)
+        return result
+
+    def warm(self) -> None:
+        """Start every worker now (imports + template compiles), not on the first big render."""
+        executor = self._get_executor()
+        for f in [executor.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(hist: Histogram) -> Dict[str, float]:
+            q = hist.quantiles((0.5, 0.95))
+            return {"ms_p50": round(q.get(0.5, 0.0) * 1000, 3), "ms_p95": round(q.get(0.95, 0.0) * 1000, 3)}
+
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "inline_max_cells": self.inline_max_cells,
+                "pending": self.pending,
+                "queue_depth": max(0, self.pending - self.workers),
+                "inline": self.inline,
+                "pooled": self.pooled,
+                "errors": self.errors,
+                "shm_bytes": self.shm_bytes,
+                "inline_latency": ms(self._latency["inline"]),
+                "pool_latency": ms(self._latency["pool"]),
+                "pool_wait": ms(self._wait),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Internals ----------
+    def _inline(self, fn, kwargs):
+        start = time.perf_counter()
+        result = fn(**kwargs)
+        self._record("inline", time.perf_counter() - start)
+        return result
+
+    async def _submit(self, kind: str, kwargs: dict):
+        start = time.perf_counter()
+        shm, shared = None, None
+        table_rows = kwargs.get("table_rows")
+        if table_rows is not None and not isinstance(table_rows, MarketSharePivot):
+            # Packing is vectorized per column; off the loop all the same
+            shm, shared = await asyncio.to_thread(share_table, kwargs.get("table_columns"), table_rows)
+            kwargs = dict(kwargs, table_rows=None)
+        executor = self._get_executor()
+        with self._lock:
+            self.pending += 1
+            self.shm_bytes += shared.nbytes if shared else 0
+        try:
+            loop = asyncio.get_running_loop()
+            result, stats, render_s = await loop.run_in_executor(executor, _render_in_worker, kind, kwargs, shared)
+        except BrokenProcessPool:
+            # A worker died; the next render starts a fresh pool
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            self._count_error()
+            raise
+        except Exception:
+            self._count_error()
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        elapsed = time.perf_counter() - start
+        self._record("pool", elapsed)
+        self._wait.observe(max(0.0, elapsed - render_s))
+        return result, stats
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                    )
+        return self._executor
+
+    def _record(self, mode: str, seconds: float) -> None:
+        with self._lock:
+            if mode == "inline":
+                self.inline += 1
+            else:
+                self.pooled += 1
+        self._latency[mode].observe(seconds)
+        instrumentation.observe("render_seconds", seconds, mode=mode)
+
+    def _count_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+
+_render_pool: Optional[RenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> RenderPool:
+    """Process-wide pool; workers start on the first pooled render (or warm())."""
+    global _render_pool
+    if _render_pool is None:
+        with _pool_lock:
+            if _render_pool is None:
+                _render_pool = RenderPool()
+    return _render_pool
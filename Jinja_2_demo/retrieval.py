@@ -0,0 +1,888 @@
+# retrieval.py
+"""
+Two-stage retrieval (embedding search, then cross-encoder rerank) over a
+persistent on-disk index, packaged from 2_stage_Retrieval_RAG_.ipynb.
+
+  * documents are split into overlapping chunks (800/150 characters, as in
+    the notebook); every chunk is keyed by a hash of its text, so
+    re-indexing a corpus only embeds the chunks that are new or changed
+  * vectors live in one flat float32 file opened with np.memmap: opening an
+    index reads no vectors, and processes that open the same index share
+    its pages through the OS page cache
+  * writes (upsert, remove, compact) hold an exclusive lock on index.lock
+    and first reload the committed state, so the CLI can index into the
+    directory of a running service; readers notice other handles' commits
+    (PRAGMA data_version) and remap
+  * `retrieve_many` embeds all queries in one call, scores them against the
+    vectors block by block as one matrix product, and reranks every
+    (query, candidate) pair in one batched predict call
+
+    index = VectorIndex("indexes/documents")
+    index.upsert([Document("handbook.txt", text)])        # unchanged chunks are skipped
+    retriever = Retriever(index)
+    hits = retriever.retrieve_many(["What drives Metformin volume?", "..."])
+
+sentence-transformers is optional. Without it (or with
+RETRIEVAL_EMBED_MODEL=hashing / RETRIEVAL_RERANK_MODEL=overlap) the index
+uses intent_router.HashingEmbedder and a lexical-overlap reranker, so the
+demo and the benchmark run offline.
+
+PromptRetrieval feeds render__prompt: it picks the columns of a wide table
+whose descriptions go into the prompt (`metadata_columns`), and retrieves
+document excerpts for the prompt's "Reference Documents" block (`context`). It is enabled by
+setting RETRIEVAL_INDEX_DIR; fill the document index with
+
+    python retrieval.py index docs/*.txt
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from intent_router import HashingEmbedder
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: handles in one process still share the thread lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Index root for PromptRetrieval ("" disables retrieval in demo_queries)
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "")
+RETRIEVAL_EMBED_MODEL = os.getenv("RETRIEVAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+RETRIEVAL_RERANK_MODEL = os.getenv("RETRIEVAL_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates from the vector search, and hits kept after the rerank
+RETRIEVAL_K_STAGE1 = int(os.getenv("RETRIEVAL_K_STAGE1", "20"))
+RETRIEVAL_K_FINAL = int(os.getenv("RETRIEVAL_K_FINAL", "4"))
+# Wider tables send only this many (retrieved) column descriptions
+RETRIEVAL_MAX_COLUMNS = int(os.getenv("RETRIEVAL_MAX_COLUMNS", "12"))
+RETRIEVAL_CHUNK_SIZE = int(os.getenv("RETRIEVAL_CHUNK_SIZE", "800"))
+RETRIEVAL_CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "150"))
+
+# Texts per embedder / reranker call
+EMBED_BATCH = 64
+RERANK_BATCH = 64
+# Vector rows scored per matrix product (bounds the score matrix, not the index)
+SEARCH_BLOCK_ROWS = 65536
+# New chunks embedded and appended per step of an upsert
+UPSERT_BATCH = 4096
+# Compact once dead rows outnumber live ones (and there are at least this many)
+COMPACT_MIN_DEAD = 1024
+
+Embedder = Callable[[Sequence[str]], np.ndarray]
+Reranker = Callable[[Sequence[Tuple[str, str]]], np.ndarray]
+
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+_WORD_RE = re.compile(r"\w+")
+_SQL_VARS = 900  # host parameters per IN (...) query
+
+
+@dataclass(frozen=True)
+class Document:
+    doc_id: str
+    text: str
+
+
+@dataclass(frozen=True)
+class Hit:
+    doc_id: str
+    seq: int             # chunk number within the document
+    text: str
+    score: float         # rerank score (the stage-1 score without a reranker)
+    stage1_score: float  # cosine similarity
+
+
+# -----------------------------------------------------------------------------
+# Chunking
+# -----------------------------------------------------------------------------
+def chunk_text(text: str, size: int = RETRIEVAL_CHUNK_SIZE, overlap: int = RETRIEVAL_CHUNK_OVERLAP) -> List[str]:
+    """
+    Chunks of at most `size` characters, each starting about `overlap`
+    characters before the previous one ended. A chunk is cut at the coarsest
+    separator (paragraph, line, sentence, word) in the back half of its window.
+    """
+    text = text.strip()
+    chunks: List[str] = []
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            for sep in _SEPARATORS:
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        nxt = max(end - overlap, start + 1)
+        space = text.find(" ", nxt, end)  # overlap starts on a word
+        start = space + 1 if space != -1 else nxt
+    return chunks
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+# -----------------------------------------------------------------------------
+# Models (optional dependencies)
+# -----------------------------------------------------------------------------
+class SentenceTransformerEmbedder:
+    """sentence-transformers model, normalized embeddings (as in the notebook)."""
+
+    def __init__(self, model_name: str = RETRIEVAL_EMBED_MODEL, batch_size: int = EMBED_BATCH):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self._model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class CrossEncoderReranker:
+    """sentence-transformers CrossEncoder; one predict call per batch of pairs."""
+
+    def __init__(self, model_name: str = RETRIEVAL_RERANK_MODEL, batch_size: int = RERANK_BATCH):
+        from sentence_transformers import CrossEncoder
+
+        self.name = model_name
+        self.batch_size = batch_size
+        self._model = CrossEncoder(model_name)
+
+    def __call__(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        scores = self._model.predict([list(p) for p in pairs], batch_size=self.batch_size)
+        return np.asarray(scores, dtype=np.float32)
+
+
+class OverlapReranker:
+    """
+    Dependency-free stand-in for the cross-encoder: the share of the query's
+    distinct words that occur in the passage. Ties keep the stage-1 order.
+    """
+
+    name = "overlap"
+
+    def __call__(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        out = np.zeros(len(pairs), dtype=np.float32)
+        terms: Dict[str, set] = {}
+        words: Dict[str, set] = {}
+        for i, (query, passage) in enumerate(pairs):
+            q = terms.get(query)
+            if q is None:
+                q = terms[query] = set(_WORD_RE.findall(query.lower()))
+            p = words.get(passage)
+            if p is None:
+                p = words[passage] = set(_WORD_RE.findall(passage.lower()))
+            if q:
+                out[i] = len(q & p) / len(q)
+        return out
+
+
+def load_embedder(name: str = RETRIEVAL_EMBED_MODEL) -> Embedder:
+    """The named sentence-transformers model, or HashingEmbedder if it cannot be loaded."""
+    if name and name != "hashing":
+        try:
+            return SentenceTransformerEmbedder(name)
+        except (ImportError, OSError) as e:
+            logger.warning("Embedding model %s unavailable (%s); using HashingEmbedder", name, e)
+    return HashingEmbedder()
+
+
+def load_reranker(name: str = RETRIEVAL_RERANK_MODEL) -> Reranker:
+    """The named cross-encoder, or OverlapReranker if it cannot be loaded."""
+    if name and name != "overlap":
+        try:
+            return CrossEncoderReranker(name)
+        except (ImportError, OSError) as e:
+            logger.warning("Reranker %s unavailable (%s); using OverlapReranker", name, e)
+    return OverlapReranker()
+
+
+def embedder_id(embedder: Embedder) -> str:
+    """Identifies the vector space an index was built in."""
+    name = getattr(embedder, "name", None)
+    if name:
+        return str(name)
+    if isinstance(embedder, HashingEmbedder):
+        return f"hashing-{embedder.dim}-{'-'.join(map(str, embedder.ngrams))}"
+    return type(embedder).__name__
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+
+
+def _topk(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The `k` best columns of each row of `scores` (unordered)."""
+    if scores.shape[1] <= k:
+        return rows, scores
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(rows, idx, axis=1), np.take_along_axis(scores, idx, axis=1)
+
+
+# -----------------------------------------------------------------------------
+# Index
+# -----------------------------------------------------------------------------
+class IndexStateError(RuntimeError):
+    """The index directory cannot be used as is (other embedder, missing vector rows)."""
+
+
+class VectorIndex:
+    """
+    Chunks and their vectors under `path`:
+
+      chunks.sqlite3     one row per chunk: vector row, doc_id, seq, hash, text, live
+      vectors.<gen>.f32  float32 [rows x dim], row i = chunk row i, memory-mapped
+
+      index.lock         flock()ed: shared to reload, exclusive to write
+
+    Replaced chunks stay as dead rows (their vectors are reused if the same
+    text comes back) until a compaction rewrites the vector file under the
+    next generation number. An index built with another embedder, or whose
+    vector file is shorter than its chunk table, raises IndexStateError;
+    nothing is deleted to recover.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedder: Optional[Embedder] = None,
+        chunk_size: int = RETRIEVAL_CHUNK_SIZE,
+        chunk_overlap: int = RETRIEVAL_CHUNK_OVERLAP,
+        embed_batch: int = EMBED_BATCH,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder if embedder is not None else load_embedder()
+        self.embedder_id = embedder_id(self.embedder)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch = embed_batch
+        self._lock = threading.RLock()
+        self._lock_fd = os.open(self.path / "index.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._held = False
+        self._data_version = None
+        self.embedded = 0
+        self.reused = 0
+        self._db = None
+        try:
+            self._db = self._open_db()
+            self._refresh()
+        except BaseException:
+            if self._db is not None:
+                self._db.close()
+            os.close(self._lock_fd)
+            raise
+
+    # ---------- Public API ----------
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """L2-normalized vectors for `texts`, `embed_batch` texts per embedder call."""
+        parts = [
+            self.embedder(list(texts[i:i + self.embed_batch]))
+            for i in range(0, len(texts), self.embed_batch)
+        ]
+        if not parts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return _normalize(np.concatenate(parts) if len(parts) > 1 else parts[0])
+
+    def upsert(self, documents: Iterable[Document]) -> Dict[str, int]:
+        """
+        Index (or re-index) documents. Chunks whose text is already in the
+        index keep or reuse their vector; only new text is embedded.
+        """
+        counts = {"documents": 0, "chunks": 0, "unchanged": 0, "reused": 0, "embedded": 0, "removed": 0}
+        with self._locked():
+            rows_before, dim_before = self._rows, self.dim
+            try:
+                with self._db:
+                    fresh: List[Tuple[str, int, str, str]] = []
+                    dead: List[int] = []
+                    seen = set()
+                    for doc in documents:
+                        counts["documents"] += 1
+                        if doc.doc_id in seen and fresh:
+                            # The same document again: diff against its new rows
+                            self._append(fresh, counts)
+                            fresh = []
+                        seen.add(doc.doc_id)
+                        self._diff(doc, fresh, dead, counts)
+                        if len(fresh) >= UPSERT_BATCH:
+                            self._append(fresh, counts)
+                            fresh = []
+                    if fresh:
+                        self._append(fresh, counts)
+                    if dead:
+                        self._db.executemany("UPDATE chunks SET live = 0 WHERE row = ?", [(r,) for r in dead])
+                        counts["removed"] = len(dead)
+                    self._set_meta("rows", self._rows)
+            except BaseException:
+                self._rows, self.dim = rows_before, dim_before
+                self._truncate_vectors()
+                self._open_vectors()
+                raise
+            self._open_vectors()
+            if self._dead_rows() > max(len(self), COMPACT_MIN_DEAD - 1):
+                self._compact()
+        return counts
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Drop documents from the index; returns the number of chunks removed."""
+        with self._locked():
+            with self._db:
+                removed = 0
+                for batch in _batched(list(doc_ids), _SQL_VARS):
+                    marks = ",".join("?" * len(batch))
+                    removed += self._db.execute(
+                        f"UPDATE chunks SET live = 0 WHERE live = 1 AND doc_id IN ({marks})", batch
+                    ).rowcount
+            self._open_vectors()
+        return removed
+
+    def search_many(
+        self, query_vectors: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best `k` live rows per query by cosine similarity, best first:
+        (rows, scores), both [queries x k]; missing hits are row -1.
+        `rows` restricts the search to those vector rows.
+        """
+        with self._lock:
+            self._refresh()
+            vectors, live = self._vectors, self._live
+        q = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        m = len(q)
+        best_rows = np.full((m, 0), -1, dtype=np.int64)
+        best_scores = np.zeros((m, 0), dtype=np.float32)
+        if vectors is not None and m and k > 0:
+            if rows is not None:
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[rows < len(live)]
+                rows = rows[live[rows]]
+                blocks = [rows[i:i + SEARCH_BLOCK_ROWS] for i in range(0, len(rows), SEARCH_BLOCK_ROWS)]
+            else:
+                blocks = [slice(i, min(i + SEARCH_BLOCK_ROWS, len(vectors))) for i in range(0, len(vectors), SEARCH_BLOCK_ROWS)]
+            for block in blocks:
+                scores = q @ vectors[block].T
+                if isinstance(block, slice):
+                    ids = np.arange(block.start, block.stop, dtype=np.int64)
+                    scores[:, ~live[block]] = -np.inf
+                else:
+                    ids = block
+                ids = np.broadcast_to(ids, scores.shape)
+                best_rows, best_scores = _topk(
+                    np.concatenate([best_rows, ids], axis=1), np.concatenate([best_scores, scores], axis=1), k
+                )
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows[~np.isfinite(best_scores)] = -1
+        return best_rows, best_scores
+
+    def chunks(self, rows: Iterable[int]) -> Dict[int, Tuple[str, int, str]]:
+        """row -> (doc_id, seq, text)."""
+        out: Dict[int, Tuple[str, int, str]] = {}
+        with self._lock:
+            self._refresh()
+            for batch in _batched(sorted({int(r) for r in rows if r >= 0}), _SQL_VARS):
+                marks = ",".join("?" * len(batch))
+                for row, doc_id, seq, text in self._db.execute(
+                    f"SELECT row, doc_id, seq, text FROM chunks WHERE row IN ({marks})", batch
+                ):
+                    out[row] = (doc_id, seq, text)
+        return out
+
+    def rows_for(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """Live vector rows of the given documents."""
+        rows: List[int] = []
+        with self._lock:
+            self._refresh()
+            for batch in _batched(list(doc_ids), _SQL_VARS):
+                marks = ",".join("?" * len(batch))
+                rows.extend(r for (r,) in self._db.execute(
+                    f"SELECT row FROM chunks WHERE live = 1 AND doc_id IN ({marks})", batch
+                ))
+        return np.asarray(sorted(rows), dtype=np.int64)
+
+    def has_document(self, doc_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._db.execute(
+                "SELECT 1 FROM chunks WHERE live = 1 AND doc_id = ? LIMIT 1", (doc_id,)
+            ).fetchone() is not None
+
+    @property
+    def generation(self) -> int:
+        """Vector file generation; it changes when a compaction renumbers the rows."""
+        with self._lock:
+            self._refresh()
+            return self._gen
+
+    def compact(self) -> None:
+        """Rewrite the vector file without dead rows."""
+        with self._locked():
+            self._compact()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            self._refresh()
+            return {
+                "embedder": self.embedder_id,
+                "dim": self.dim,
+                "rows": self._rows,
+                "live": len(self),
+                "vector_bytes": self._rows * (self.dim or 0) * 4,
+                "embedded": self.embedded,
+                "reused": self.reused,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._db.close()
+            os.close(self._lock_fd)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._live.sum())
+
+    # ---------- Internals ----------
+    def _open_db(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.path / "chunks.sqlite3"), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, "
+            "seq INTEGER NOT NULL, hash TEXT NOT NULL, text TEXT NOT NULL, live INTEGER NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (hash)")
+        with db:
+            db.execute("INSERT OR IGNORE INTO meta VALUES ('embedder', ?)", (self.embedder_id,))
+        (built_with,) = db.execute("SELECT value FROM meta WHERE key = 'embedder'").fetchone()
+        if built_with != self.embedder_id:
+            db.close()
+            raise IndexStateError(
+                f"Index {self.path} was built with {built_with}, not {self.embedder_id}; "
+                "load that embedder or index into a new directory"
+            )
+        return db
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """
+        Hold the thread lock and flock index.lock (shared or exclusive), with
+        the state other handles committed loaded. The exclusive lock also
+        removes what failed or interrupted writes left behind: bytes past the
+        committed rows, and other generations' vector files.
+        """
+        with self._lock:
+            if self._held:
+                yield
+                return
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._held = True
+            try:
+                self._sync()
+                if exclusive:
+                    self._truncate_vectors()
+                    for stale in self.path.glob("vectors.*.f32"):
+                        if stale != self._vector_path(self._gen):
+                            stale.unlink(missing_ok=True)
+                yield
+            finally:
+                self._held = False
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Reload (under the shared lock) if another handle has committed since the last load."""
+        if not self._held and self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            with self._locked(exclusive=False):
+                pass
+
+    def _sync(self) -> None:
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        self._gen = int(meta.get("generation", 0))
+        self._rows = int(meta.get("rows", 0))
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self._open_vectors()
+        self._data_version = version
+
+    def _set_meta(self, key: str, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def _vector_path(self, gen: int) -> Path:
+        return self.path / f"vectors.{gen}.f32"
+
+    def _truncate_vectors(self) -> None:
+        """Cut rows past the committed count (left by a failed upsert)."""
+        path = self._vector_path(self._gen)
+        size = self._rows * (self.dim or 0) * 4
+        if path.exists() and path.stat().st_size > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _open_vectors(self) -> None:
+        """Map the committed rows (a writer may be appending past them) and the live mask."""
+        with self._lock:
+            path = self._vector_path(self._gen)
+            size = path.stat().st_size if path.exists() else 0
+            if self._rows and size < self._rows * self.dim * 4:
+                raise IndexStateError(
+                    f"Vector file {path} holds {size // (self.dim * 4)} of {self._rows} rows; "
+                    "restore it or index into a new directory"
+                )
+            self._vectors = (
+                np.memmap(path, dtype=np.float32, mode="r", shape=(self._rows, self.dim)) if self._rows else None
+            )
+            live = np.zeros(self._rows, dtype=bool)
+            rows = [r for (r,) in self._db.execute("SELECT row FROM chunks WHERE live = 1")]
+            live[rows] = True
+            self._live = live
+
+    def _dead_rows(self) -> int:
+        return self._rows - len(self)
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._live)
+        gen = self._gen + 1
+        target = self._vector_path(gen)
+        with open(target, "wb") as f:
+            for i in range(0, len(keep), SEARCH_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(self._vectors[keep[i:i + SEARCH_BLOCK_ROWS]]).tobytes())
+        try:
+            with self._db:
+                self._db.execute("DELETE FROM chunks WHERE live = 0")
+                # Ascending, so a new row number is always free when it is taken
+                self._db.executemany(
+                    "UPDATE chunks SET row = ? WHERE row = ?",
+                    [(new, int(old)) for new, old in enumerate(keep) if new != old],
+                )
+                self._set_meta("generation", gen)
+                self._set_meta("rows", len(keep))
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+        old = self._vector_path(self._gen)
+        self._gen, self._rows = gen, len(keep)
+        self._open_vectors()
+        old.unlink(missing_ok=True)
+        logger.info("Compacted %s to %d rows", self.path, len(keep))
+
+    def _diff(self, doc: Document, fresh: list, dead: list, counts: Dict[str, int]) -> None:
+        """Queue a document's new chunks in `fresh` and its replaced rows in `dead`."""
+        chunks = chunk_text(doc.text, self.chunk_size, self.chunk_overlap)
+        hashes = [chunk_hash(c) for c in chunks]
+        counts["chunks"] += len(chunks)
+        old = self._db.execute(
+            "SELECT row, seq, hash FROM chunks WHERE live = 1 AND doc_id = ? ORDER BY seq", (doc.doc_id,)
+        ).fetchall()
+        if [h for _, _, h in old] == hashes:
+            counts["unchanged"] += len(chunks)
+            return
+        old_rows: Dict[str, List[Tuple[int, int]]] = {}
+        for row, seq, h in old:
+            old_rows.setdefault(h, []).append((row, seq))
+        moved = []
+        for seq, (h, text) in enumerate(zip(hashes, chunks)):
+            kept = old_rows.get(h)
+            if kept:
+                row, old_seq = kept.pop(0)
+                counts["unchanged"] += 1
+                if old_seq != seq:
+                    moved.append((seq, row))
+            else:
+                fresh.append((doc.doc_id, seq, h, text))
+        self._db.executemany("UPDATE chunks SET seq = ? WHERE row = ?", moved)
+        dead.extend(row for kept in old_rows.values() for row, _ in kept)
+
+    def _append(self, fresh: List[Tuple[str, int, str, str]], counts: Dict[str, int]) -> None:
+        """Embed (or copy) vectors for new chunks, append them and insert their rows."""
+        by_hash: Dict[str, int] = {}     # hash -> index into `vectors`
+        mapped = len(self._vectors) if self._vectors is not None else 0
+        sources: List[int] = []          # existing row to copy, or -1
+        texts: List[str] = []
+        for _, _, h, text in fresh:
+            if h in by_hash:
+                continue
+            by_hash[h] = len(sources)
+            row = self._db.execute(
+                "SELECT row FROM chunks WHERE hash = ? AND row < ? LIMIT 1", (h, mapped)
+            ).fetchone() if mapped else None
+            sources.append(row[0] if row else -1)
+            if not row:
+                texts.append(text)
+
+        embedded = self.embed(texts) if texts else None
+        if embedded is not None and self.dim is None:
+            self.dim = embedded.shape[1]
+            self._set_meta("dim", self.dim)
+        vectors = np.empty((len(sources), self.dim), dtype=np.float32)
+        copy = [i for i, s in enumerate(sources) if s >= 0]
+        new = [i for i, s in enumerate(sources) if s < 0]
+        if copy:
+            vectors[copy] = self._vectors[[sources[i] for i in copy]]
+        if new:
+            vectors[new] = embedded
+        counts["reused"] += len(copy)
+        counts["embedded"] += len(new)
+        self.reused += len(copy)
+        self.embedded += len(new)
+
+        # One row per chunk; duplicate texts in this batch share a vector
+        order = [by_hash[h] for _, _, h, _ in fresh]
+        with open(self._vector_path(self._gen), "ab") as f:
+            f.write(vectors[order].tobytes())
+        self._db.executemany(
+            "INSERT INTO chunks (row, doc_id, seq, hash, text, live) VALUES (?, ?, ?, ?, ?, 1)",
+            [(self._rows + i, doc_id, seq, h, text) for i, (doc_id, seq, h, text) in enumerate(fresh)],
+        )
+        self._rows += len(fresh)
+
+
+def _batched(items: Sequence, size: int) -> Iterable[list]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# -----------------------------------------------------------------------------
+# Retriever
+# -----------------------------------------------------------------------------
+class Retriever:
+    """Stage 1: vector search for `k_stage1` candidates. Stage 2: rerank, keep `k_final`."""
+
+    def __init__(
+        self,
+        index: VectorIndex,
+        reranker: Optional[Reranker] = None,
+        k_stage1: int = RETRIEVAL_K_STAGE1,
+        k_final: int = RETRIEVAL_K_FINAL,
+    ):
+        self.index = index
+        self.reranker = reranker
+        self.k_stage1 = k_stage1
+        self.k_final = k_final
+
+    def retrieve(self, query: str, **kwargs) -> List[Hit]:
+        return self.retrieve_many([query], **kwargs)[0]
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        k_final: Optional[int] = None,
+        k_stage1: Optional[int] = None,
+        doc_ids: Optional[Iterable[str]] = None,
+    ) -> List[List[Hit]]:
+        """
+        Hits per query, best first. All queries are embedded and searched
+        together, and all their candidates go through the reranker in one
+        call. `doc_ids` restricts the search to those documents.
+        """
+        k_final = self.k_final if k_final is None else k_final
+        k_stage1 = max(k_final, self.k_stage1 if k_stage1 is None else k_stage1)
+        if not queries:
+            return []
+        query_vectors = self.index.embed(list(queries))
+        for _ in range(3):
+            # A compaction in another process renumbers rows: search again if one lands in between
+            generation = self.index.generation
+            rows = self.index.rows_for(doc_ids) if doc_ids is not None else None
+            cand_rows, cand_scores = self.index.search_many(query_vectors, k_stage1, rows)
+            chunks = self.index.chunks(cand_rows.ravel().tolist())
+            if self.index.generation == generation:
+                break
+
+        per_query = []
+        pairs: List[Tuple[str, str]] = []
+        for query, rows_q, scores_q in zip(queries, cand_rows, cand_scores):
+            found = [(int(r), float(s)) for r, s in zip(rows_q, scores_q) if r >= 0 and int(r) in chunks]
+            per_query.append(found)
+            pairs.extend((query, chunks[r][2]) for r, _ in found)
+        rerank = self.reranker(pairs) if self.reranker is not None and pairs else None
+
+        out: List[List[Hit]] = []
+        offset = 0
+        for found in per_query:
+            stage1 = np.array([s for _, s in found], dtype=np.float32)
+            if rerank is not None:
+                scores = np.asarray(rerank[offset:offset + len(found)], dtype=np.float32)
+                offset += len(found)
+                order = np.lexsort((-stage1, -scores))  # rerank score, then stage-1 score
+            else:
+                scores = stage1
+                order = np.arange(len(found))
+            hits = []
+            for i in order[:k_final]:
+                doc_id, seq, text = chunks[found[i][0]]
+                hits.append(Hit(doc_id, seq, text, float(scores[i]), float(stage1[i])))
+            out.append(hits)
+        return out
+
+
+def format_context(hits: Sequence[Hit]) -> str:
+    """Numbered excerpts for the prompt, as in the notebook's rag_answer."""
+    return "\n\n".join(f"[{i}] ({hit.doc_id}) {hit.text}" for i, hit in enumerate(hits, 1))
+
+
+# -----------------------------------------------------------------------------
+# Prompt inputs
+# -----------------------------------------------------------------------------
+class PromptRetrieval:
+    """
+    render__prompt inputs retrieved for a subquery, from two indexes under
+    `root`: column descriptions ("columns") and documents ("documents").
+    """
+
+    def __init__(
+        self,
+        root: str,
+        embedder: Optional[Embedder] = None,
+        reranker: Optional[Reranker] = None,
+        max_columns: int = RETRIEVAL_MAX_COLUMNS,
+        k_final: int = RETRIEVAL_K_FINAL,
+    ):
+        embedder = embedder if embedder is not None else load_embedder()
+        reranker = reranker if reranker is not None else load_reranker()
+        self.columns = Retriever(VectorIndex(os.path.join(root, "columns"), embedder), reranker)
+        self.documents = Retriever(VectorIndex(os.path.join(root, "documents"), embedder), reranker, k_final=k_final)
+        self.max_columns = max_columns
+        self._indexed_columns: set = set()
+        self._lock = threading.Lock()
+
+    def render_args(self, subquery: str, columns_metadata: dict | None = None) -> dict:
+        return self.render_args_many([subquery], [columns_metadata])[0]
+
+    def render_args_many(self, subqueries: Sequence[str], columns_metadatas: Sequence[dict | None]) -> List[dict]:
+        """
+        render__prompt kwargs per subquery: `context` (document excerpts) when
+        the document index has any, and `metadata_columns` (the `max_columns`
+        most relevant columns) for tables wider than that.
+        Subqueries are retrieved in one batch (per table for the columns).
+        """
+        out: List[dict] = [{} for _ in subqueries]
+        if len(self.documents.index):
+            for args, hits in zip(out, self.documents.retrieve_many(subqueries)):
+                if hits:
+                    args["context"] = format_context(hits)
+
+        tables: Dict[str, Tuple[dict, List[int]]] = {}
+        for i, metadata in enumerate(columns_metadatas):
+            if metadata and len(metadata) > self.max_columns:
+                key = json.dumps(metadata, sort_keys=True, default=str)
+                tables.setdefault(key, (metadata, []))[1].append(i)
+        for metadata, idxs in tables.values():
+            doc_columns = self._index_columns(metadata)
+            hits = self.columns.retrieve_many(
+                [subqueries[i] for i in idxs],
+                k_final=self.max_columns,
+                k_stage1=max(self.columns.k_stage1, 2 * self.max_columns),
+                doc_ids=list(doc_columns),
+            )
+            for i, table_hits in zip(idxs, hits):
+                keep = {doc_columns[h.doc_id] for h in table_hits}
+                out[i]["metadata_columns"] = [c for c in metadata if c in keep]
+        return out
+
+    def _index_columns(self, metadata: dict) -> Dict[str, str]:
+        """doc_id -> column for a table's columns, indexing the ones not seen yet."""
+        docs = {}
+        for column, description in metadata.items():
+            text = f"{str(column).replace('_', ' ')}: {description}"
+            docs[f"{column}:{chunk_hash(text)[:12]}"] = (column, text)
+        with self._lock:
+            new = [Document(d, text) for d, (_, text) in docs.items() if d not in self._indexed_columns]
+            if new:
+                self.columns.index.upsert(new)
+                self._indexed_columns.update(doc.doc_id for doc in new)
+        return {d: column for d, (column, _) in docs.items()}
+
+    def stats(self) -> dict:
+        return {"columns": self.columns.index.stats(), "documents": self.documents.index.stats()}
+
+
+_PROMPT_RETRIEVAL: Optional[PromptRetrieval] = None
+_PROMPT_RETRIEVAL_LOCK = threading.Lock()
+
+
+def get_prompt_retrieval() -> Optional[PromptRetrieval]:
+    """Process-wide PromptRetrieval over RETRIEVAL_INDEX_DIR; None when that is unset."""
+    global _PROMPT_RETRIEVAL
+    if not RETRIEVAL_INDEX_DIR:
+        return None
+    with _PROMPT_RETRIEVAL_LOCK:
+        if _PROMPT_RETRIEVAL is None:
+            _PROMPT_RETRIEVAL = PromptRetrieval(RETRIEVAL_INDEX_DIR)
+        return _PROMPT_RETRIEVAL
+
+
+def prompt_retrieval_stats() -> Optional[dict]:
+    """Index stats of the process-wide PromptRetrieval, if it has been opened."""
+    with _PROMPT_RETRIEVAL_LOCK:
+        return _PROMPT_RETRIEVAL.stats() if _PROMPT_RETRIEVAL is not None else None
+
+
+def index_files(index: VectorIndex, paths: Iterable[str]) -> Dict[str, int]:
+    """(Re-)index text files, one document per path."""
+    def documents():
+        for path in paths:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                yield Document(str(path), f.read())
+    return index.upsert(documents())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document index for PromptRetrieval")
+    parser.add_argument("--root", default=RETRIEVAL_INDEX_DIR or "retrieval_index", help="index root directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_index = sub.add_parser("index", help="index (or re-index) text files")
+    p_index.add_argument("paths", nargs="+")
+    p_search = sub.add_parser("search", help="retrieve excerpts for a query")
+    p_search.add_argument("query")
+    args = parser.parse_args()
+
+    index = VectorIndex(os.path.join(args.root, "documents"))
+    if args.command == "index":
+        print(json.dumps({**index_files(index, args.paths), **index.stats()}, indent=2))
+    else:
+        for hit in Retriever(index, load_reranker()).retrieve(args.query):
+            print(f"{hit.score:8.3f}  {hit.doc_id}#{hit.seq}  {hit.text[:120]!r}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Healthcare Analytics Service
+Long-lived asyncio HTTP service: one event loop serves many concurrent
+queries and streams the model output as Server-Sent Events.
+
+Endpoints:
+    GET  /query?q=<text>          SSE stream (works with EventSource / curl -N)
+    POST /query  {"query": ...}   same, JSON body; optional "type": table|marketshare
+                                  optional session=<id> (both): earlier turns of the
+                                  session go into the prompt (session_memory.py)
+    GET  /table?cursor=<c>        JSON: next page of a TABLE result
+                                  (&mode=rows: only the <tr> rows; &size=N)
+    GET  /healthz                 JSON: in-flight / completed / cancelled counters, pool stats
+    GET  /metrics                 Prometheus text (METRICS_ENABLED=1)
+
+SSE events, in order:
+    meta    {"query_type", "prompt_bytes"}
+    chunk   {"text"} per streamed piece, interleaved with
+      chart_ready {"payload"} as soon as the model's ```json block closes
+                  (chart_error {"message"} if it does not parse)
+      section     {"title", "level"} at each Markdown heading (stream_parser.py)
+    table   {"html", "total_rows", "next_cursor"} (TABLE) or chart {"plottinggraph"} (MARKETSHARE)
+    done    {"chunks", "elapsed_s"}  | error {"message"}
+
+A client disconnect cancels its request task, which stops the upstream
+model stream (see bedrock_connector/streaming.py). Each upstream stream holds
+one stream worker thread, so size STREAM_THREADS to the expected concurrency.
+
+Usage:
+    ENV=DEV python service.py [--host 127.0.0.1] [--port 8080] [--provider fake]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import instrumentation
+from demo_queries import aprepare_query
+from intent_router import classify_query
+from pagination import CursorError, TablePager
+from prompt_constellatiion import HTML_TABLE_MAX_ROWS
+from render_pool import get_render_pool
+from retrieval import prompt_retrieval_stats
+from session_memory import SessionMemory, default_db_path
+from stream_parser import ChartError, ChartReady, SectionStart, StreamParser, TextDelta
+from bedrock_connector.gemini_connector import (
+    astream_gemini_synthesis, build_provider, context_cache_stats, get_provider, resilience_stats, set_provider,
+)
+
+logger = logging.getLogger(__name__)
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+# Concurrent SSE streams; further requests get 503 instead of queueing
+SERVICE_MAX_STREAMS = int(os.getenv("SERVICE_MAX_STREAMS", "256"))
+MAX_BODY_BYTES = 64 * 1024
+HEADER_TIMEOUT_S = 10.0
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 410: "Gone",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# -----------------------------
+# HTTP plumbing (stdlib only)
+# -----------------------------
+async def read_request(reader: asyncio.StreamReader):
+    """Parse one HTTP/1.1 request: (method, path, query dict, body bytes)."""
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT_S)
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "malformed content-length")
+    if length < 0:
+        raise HttpError(400, "malformed content-length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+    return method.upper(), url.path, query, body
+
+
+def response_head(status: int, content_type: str, extra: dict | None = None) -> bytes:
+    headers = {"Content-Type": content_type, "Cache-Control": "no-cache", "Connection": "close"}
+    headers.update(extra or {})
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_body(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes) -> None:
+    writer.write(response_head(status, content_type, {"Content-Length": str(len(body))}) + body)
+    await writer.drain()
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+    await send_body(writer, status, "application/json", json.dumps(payload).encode("utf-8"))
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    # One JSON line per event, so newlines in model text never break framing
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+# -----------------------------
+# Service
+# -----------------------------
+class QueryService:
+    """Routes requests and tracks per-request stream tasks."""
+
+    def __init__(
+        self,
+        max_streams: int = SERVICE_MAX_STREAMS,
+        model_id: str | None = None,
+        pager: TablePager | None = None,
+        memory: SessionMemory | None = None,
+    ):
+        self.max_streams = max_streams
+        self.model_id = model_id  # None: configured model (hot reloadable)
+        self.pager = pager or TablePager()
+        self.memory = memory or SessionMemory(db_path=default_db_path())
+        self.in_flight = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "provider": get_provider().name,
+            "table_results": self.pager.stats(),
+            "upstream": resilience_stats(),
+            "context_cache": context_cache_stats(),
+            "render_pool": get_render_pool().stats(),
+            "sessions": self.memory.stats(),
+            "retrieval": prompt_retrieval_stats(),
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, query, body = await read_request(reader)
+                await self.route(method, path, query, body, reader, writer)
+            except HttpError as e:
+                await send_json(writer, e.status, {"error": str(e)})
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                pass  # client went away or never sent a full request
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, query, body, reader, writer) -> None:
+        if path == "/healthz":
+            await send_json(writer, 200, self.stats())
+        elif path == "/metrics":
+            await send_body(writer, 200, "text/plain; version=0.0.4", instrumentation.export_prometheus().encode())
+        elif path == "/query":
+            if method == "GET":
+                params = query
+            elif method == "POST":
+                try:
+                    params = json.loads(body or b"{}")
+                except ValueError:  # JSONDecodeError, or bytes that are not UTF-8
+                    raise HttpError(400, "body must be JSON")
+                if not isinstance(params, dict):
+                    raise HttpError(400, "body must be a JSON object")
+            else:
+                raise HttpError(405, "use GET or POST")
+            user_query = params.get("query") or params.get("q") or ""
+            if not isinstance(user_query, str):
+                raise HttpError(400, "query must be a string")
+            user_query = user_query.strip()
+            if not user_query:
+                raise HttpError(400, "missing query")
+            query_type = params.get("type") or classify_query(user_query)
+            if query_type not in ("table", "marketshare"):
+                raise HttpError(422, "query not understood; ask for a 'table' or 'marketshare'")
+            if self.in_flight >= self.max_streams:
+                raise HttpError(503, "too many concurrent streams")
+            session_id = params.get("session") or ""
+            if not isinstance(session_id, str):
+                raise HttpError(400, "session must be a string")
+            session_id = session_id.strip() or None
+            await self.stream_query(user_query, query_type, reader, writer, session_id)
+        elif path == "/table":
+            await self.table_page(query, writer)
+        else:
+            raise HttpError(404, "not found")
+
+    async def table_page(self, query, writer) -> None:
+        """Later pages of a stored TABLE result; never re-runs the query."""
+        cursor = query.get("cursor")
+        if not cursor:
+            raise HttpError(400, "missing cursor")
+        try:
+            size = int(query["size"]) if query.get("size") else None
+        except ValueError:
+            raise HttpError(400, "size must be an integer")
+        render = self.pager.rows if query.get("mode") == "rows" else self.pager.page
+        try:
+            page = await asyncio.to_thread(render, cursor, size)
+        except CursorError as e:
+            raise HttpError(410, str(e))
+        await send_json(writer, 200, page.to_dict())
+
+    async def stream_query(self, user_query, query_type, reader, writer, session_id=None) -> None:
+        """Run one SSE response; cancel it as soon as the client disconnects."""
+        self.in_flight += 1
+        task = asyncio.create_task(self._produce_events(user_query, query_type, writer, session_id))
+        watcher = asyncio.create_task(_wait_for_disconnect(reader))
+        try:
+            done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if task not in done:
+                task.cancel()
+            try:
+                await task
+                self.completed += 1
+            except (asyncio.CancelledError, ConnectionError):
+                self.cancelled += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("query stream failed")
+        finally:
+            task.cancel()  # no-op once finished; covers server shutdown
+            watcher.cancel()
+            self.in_flight -= 1
+
+    async def _produce_events(self, user_query, query_type, writer, session_id=None) -> None:
+        start = time.perf_counter()
+        writer.write(response_head(200, "text/event-stream"))
+        chunks = 0
+        parser = StreamParser()
+        answer = []  # prose of the answer, for the session memory
+        try:
+            # The 200 head is out: a failure from here on is reported as an error event
+            conversation = ""
+            if session_id:
+                window = await asyncio.to_thread(self.memory.window, session_id)
+                conversation = window.render()
+            # Prompt rendering is CPU work: large tables go to the render pool
+            prompt_str, rendered_html, inputs = await aprepare_query(user_query, query_type, conversation=conversation)
+            writer.write(sse_event("meta", {"query_type": query_type, "prompt_bytes": len(prompt_str.encode("utf-8"))}))
+            await writer.drain()
+
+            async for piece in astream_gemini_synthesis(self.model_id, prompt_str):
+                writer.write(sse_event("chunk", {"text": piece}))
+                for event in parser.feed(piece):
+                    _write_parsed(writer, event, answer)
+                await writer.drain()  # slow client: wait here, upstream backs off
+                chunks += 1
+        except (asyncio.CancelledError, ConnectionError):
+            raise
+        except Exception as e:
+            writer.write(sse_event("error", {"message": f"{type(e).__name__}: {e}"}))
+            await writer.drain()
+            raise
+        for event in parser.close():
+            _write_parsed(writer, event, answer)
+        if session_id:
+            await asyncio.to_thread(self.memory.add_exchange, session_id, user_query, "".join(answer))
+
+        if query_type == "table":
+            # The first page is already rendered; keep the result for /table
+            result_id = self.pager.store(inputs["table_columns"], inputs["table_rows"], inputs["columns_metadata"])
+            writer.write(sse_event("table", {
+                "html": rendered_html,
+                "total_rows": self.pager.total_rows(result_id),
+                "next_cursor": self.pager.cursor(result_id, HTML_TABLE_MAX_ROWS),
+            }))
+        else:
+            writer.write(sse_event("chart", inputs["chart_payload"]))
+        writer.write(sse_event("done", {"chunks": chunks, "elapsed_s": round(time.perf_counter() - start, 4)}))
+        await writer.drain()
+
+
+def _write_parsed(writer, event, answer: list) -> None:
+    """SSE frame for the structural stream events (text already went out as
+    chunks); the prose and headings are collected into `answer`."""
+    if isinstance(event, TextDelta):
+        answer.append(event.text)
+    elif isinstance(event, ChartReady):
+        writer.write(sse_event("chart_ready", {"payload": event.payload}))
+    elif isinstance(event, ChartError):
+        writer.write(sse_event("chart_error", {"message": event.message}))
+    elif isinstance(event, SectionStart):
+        writer.write(sse_event("section", {"title": event.title, "level": event.level}))
+        answer.append("#" * event.level + " " + event.title + "\n")
+
+
+async def _wait_for_disconnect(reader: asyncio.StreamReader) -> None:
+    """Return once the client closes its side of the connection."""
+    while True:
+        data = await reader.read(1024)
+        if not data:
+            return
+
+
+async def start_service(host: str = SERVICE_HOST, port: int = SERVICE_PORT, service: QueryService | None = None):
+    """Start listening; returns (server, service). Port 0 picks a free port."""
+    service = service or QueryService()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    return server, service
+
+
+async def serve(host: str, port: int) -> None:
+    server, _ = await start_service(host, port)
+    addr = server.sockets[0].getsockname()
+    print(f"🚀 Serving on http://{addr[0]}:{addr[1]} (provider: {get_provider().name})")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SSE query service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--provider", default=None, help="override LLM provider, e.g. 'fake'")
+    args = parser.parse_args()
+
+    if args.provider:
+        set_provider(build_provider(args.provider))
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+# session_memory.py
+"""
+Bounded, persistent conversation memory for multi-turn sessions.
+
+Replaces the notebook pattern (an unbounded `store = {}` of
+InMemoryChatMessageHistory objects, trimmed with `messages[-k:]` on every
+read):
+
+  * each session keeps a window of recent turns bounded by tokens, not by
+    message count; when it overflows, the oldest turns are folded into a
+    rolling summary (itself capped), so the history block in a follow-up
+    prompt stays under `max_tokens + summary_tokens`
+  * only `max_sessions` recently used sessions stay in RAM (LRU); the rest
+    live in SQLite and are reloaded on their next turn, so memory per
+    process stays flat however many sessions exist
+  * sessions idle for longer than `ttl_s` are dropped; expired rows are
+    deleted from SQLite at most every `purge_interval_s`, on a write
+
+    memory = SessionMemory(db_path=default_db_path())
+    conversation = memory.window(session_id).render()          # -> render__prompt(conversation=...)
+    memory.add_exchange(session_id, user_query, answer_text)
+
+The default summarizer is extractive (no model call): one line per folded
+turn, taking the "Executive Summary" of an assistant answer when it has one.
+Pass `summarizer=` for an LLM-backed one; it runs outside the memory's lock.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from table_encoder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Recent turns kept verbatim, and the rolling summary of older ones
+SESSION_WINDOW_TOKENS = int(os.getenv("SESSION_WINDOW_TOKENS", "1500"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+# One turn never takes more than this (long answers are cut)
+SESSION_MAX_TURN_TOKENS = int(os.getenv("SESSION_MAX_TURN_TOKENS", "400"))
+# Sessions held in RAM; older ones are reloaded from SQLite
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", str(7 * 24 * 3600)))
+# Expired sessions are deleted from SQLite at most this often
+SESSION_PURGE_INTERVAL_S = float(os.getenv("SESSION_PURGE_INTERVAL_S", "3600"))
+
+# Turn = (role, text)
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, Sequence[Turn]], str]
+
+_EXEC_SUMMARY_RE = re.compile(r"#+\s*Executive Summary\s*\n+(.+)", re.IGNORECASE)
+_JSON_FENCE_RE = re.compile(r"```json.*?(```|$)", re.DOTALL)
+_SENTENCE_RE = re.compile(r"(.+?[.!?])(\s|$)")
+_SUMMARY_LINE_CHARS = 200
+
+
+# -----------------------------------------------------------------------------
+# Summaries
+# -----------------------------------------------------------------------------
+def _gist(role: str, text: str) -> str:
+    """One line for a folded turn."""
+    text = _JSON_FENCE_RE.sub("", text)
+    match = _EXEC_SUMMARY_RE.search(text) if role == "assistant" else None
+    if match:
+        line = match.group(1)
+    else:
+        lines = [l.strip(" -#*") for l in text.strip().splitlines()]
+        line = next((l for l in lines if l), "")
+        sentence = _SENTENCE_RE.match(line)
+        line = sentence.group(1) if sentence else line
+    line = " ".join(line.split())
+    if len(line) > _SUMMARY_LINE_CHARS:
+        line = line[:_SUMMARY_LINE_CHARS - 1] + "…"
+    return f"- {role}: {line}"
+
+
+def extractive_summary(summary: str, turns: Sequence[Turn]) -> str:
+    """Previous summary plus one line per newly folded turn."""
+    lines = [summary] if summary else []
+    lines.extend(_gist(role, text) for role, text in turns)
+    return "\n".join(lines)
+
+
+def _cap_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """`text` cut to about `max_tokens`; keep="tail" drops whole leading lines."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - 1)
+    if keep == "head":
+        return text[:max_chars] + "…"
+    tail = text[-max_chars:]
+    # Oldest summary lines go first; keep whole lines
+    newline = tail.find("\n")
+    return tail[newline + 1:] if 0 <= newline < len(tail) - 1 else tail
+
+
+# -----------------------------------------------------------------------------
+# Session window
+# -----------------------------------------------------------------------------
+@dataclass
+class SessionWindow:
+    session_id: str
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+    tokens: int = 0          # of the turns (the summary is capped separately)
+    updated: float = 0.0
+
+    def render(self) -> str:
+        """History block for the prompt; "" for a new session."""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation (summary):\n" + self.summary)
+        if self.turns:
+            parts.append("\n\n".join(f"{role}: {text}" for role, text in self.turns))
+        return "\n\n".join(parts)
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+
+class SessionMemory:
+    def __init__(
+        self,
+        max_tokens: int = SESSION_WINDOW_TOKENS,
+        summary_tokens: int = SESSION_SUMMARY_TOKENS,
+        max_turn_tokens: int = SESSION_MAX_TURN_TOKENS,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        ttl_s: float = SESSION_TTL_S,
+        db_path: Optional[str] = None,
+        summarizer: Summarizer = extractive_summary,
+        purge_interval_s: float = SESSION_PURGE_INTERVAL_S,
+    ):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turn_tokens = max_turn_tokens
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_s = ttl_s
+        self.summarizer = summarizer
+        self.purge_interval_s = purge_interval_s
+        self._next_purge = time.monotonic() + purge_interval_s
+        self._sessions: "OrderedDict[str, SessionWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Folded turns waiting for the summarizer, and sessions being summarized
+        self._pending: Dict[str, List[Turn]] = {}
+        self._summarizing: set = set()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = self._open_db(db_path)
+
+        self.turns = 0
+        self.summarized_turns = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---------- Public API ----------
+    def window(self, session_id: str) -> SessionWindow:
+        """Snapshot of the session's summary and recent turns."""
+        with self._lock:
+            s = self._get(session_id)
+            return SessionWindow(s.session_id, s.summary, list(s.turns), s.tokens, s.updated)
+
+    def append(self, session_id: str, role: str, text: str) -> None:
+        self.extend(session_id, [(role, text)])
+
+    def add_exchange(self, session_id: str, user_text: str, assistant_text: str) -> None:
+        """One question/answer pair, written in a single transaction."""
+        self.extend(session_id, [("user", user_text), ("assistant", assistant_text)])
+
+    def extend(self, session_id: str, turns: Sequence[Turn]) -> None:
+        # The chart block of an answer is data the next prompt carries anyway
+        turns = [
+            (role, _cap_tokens((_JSON_FENCE_RE.sub("", text) if role == "assistant" else text).strip(), self.max_turn_tokens))
+            for role, text in turns
+        ]
+        if time.monotonic() >= self._next_purge:
+            self.purge_expired()
+        with self._lock:
+            s = self._get(session_id)
+            s.turns.extend(turns)
+            s.tokens += sum(estimate_tokens(text) for _, text in turns)
+            s.updated = time.time()
+            self.turns += len(turns)
+            folded = self._pop_overflow(s)
+            self._save(s)
+            if not folded:
+                return
+            self._pending.setdefault(session_id, []).extend(folded)
+            if session_id in self._summarizing:
+                return  # the running fold picks these up
+            self._summarizing.add(session_id)
+        self._fold(session_id)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        """Drop sessions idle for longer than ttl_s; returns how many were on disk."""
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            self._next_purge = time.monotonic() + self.purge_interval_s
+            for sid in [sid for sid, s in self._sessions.items() if s.updated < cutoff]:
+                del self._sessions[sid]
+            if self._db is None:
+                return 0
+            removed = self._db.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+            self.expirations += removed
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {
+                "sessions_in_memory": len(self._sessions),
+                "turns": self.turns,
+                "summarized_turns": self.summarized_turns,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+            if self._db is not None:
+                stats["sessions_on_disk"] = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- Internals ----------
+    def _get(self, session_id: str) -> SessionWindow:
+        """Session from RAM, else disk, else a new one (caller holds the lock)."""
+        s = self._sessions.get(session_id)
+        if s is not None and time.time() - s.updated > self.ttl_s:
+            s = None
+            self.expirations += 1
+        if s is None:
+            s = self._load(session_id) or SessionWindow(session_id, updated=time.time())
+            self._sessions[session_id] = s
+            while len(self._sessions) > self.max_sessions:
+                # Written through on every turn, so eviction only frees RAM
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        return s
+
+    def _pop_overflow(self, s: SessionWindow) -> List[Turn]:
+        """Oldest turns beyond the window, removed from `s`."""
+        if s.tokens <= self.max_tokens:
+            return []
+        # Fold down to 3/4 of the window, so the next turns do not each
+        # trigger another summary; the newest exchange always stays verbatim
+        target = self.max_tokens * 3 // 4
+        folded = []
+        while len(s.turns) > 2 and s.tokens > target:
+            role, text = s.turns.pop(0)
+            s.tokens -= estimate_tokens(text)
+            folded.append((role, text))
+        return folded
+
+    def _fold(self, session_id: str) -> None:
+        """Fold pending turns into the summary, one summarizer call at a time per session."""
+        while True:
+            with self._lock:
+                batch = self._pending.pop(session_id, None)
+                if not batch:
+                    self._summarizing.discard(session_id)
+                    return
+                summary = self._get(session_id).summary
+            # Outside the lock: an LLM summarizer must not stall other sessions
+            try:
+                new_summary = self.summarizer(summary, batch)
+            except Exception:
+                logger.exception("session summarizer failed; using the extractive summary")
+                new_summary = extractive_summary(summary, batch)
+            new_summary = _cap_tokens(new_summary, self.summary_tokens, keep="tail")
+            with self._lock:
+                s = self._get(session_id)
+                s.summary = new_summary
+                self.summarized_turns += len(batch)
+                self._save(s)
+
+    def _open_db(self, db_path: str) -> sqlite3.Connection:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Losing the last turn on power loss is fine; an fsync per turn is not
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, updated REAL NOT NULL, summary TEXT NOT NULL, turns TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl_s,))
+        return db
+
+    def _load(self, session_id: str) -> Optional[SessionWindow]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT updated, summary, turns FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        updated, summary, turns_json = row
+        if time.time() - updated > self.ttl_s:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.expirations += 1
+            return None
+        turns = [tuple(t) for t in json.loads(turns_json)]
+        self.loads += 1
+        return SessionWindow(session_id, summary, turns, sum(estimate_tokens(t) for _, t in turns), updated)
+
+    def _save(self, s: SessionWindow) -> None:
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, updated, summary, turns) VALUES (?, ?, ?, ?)",
+                (s.session_id, s.updated, s.summary, json.dumps(s.turns, ensure_ascii=False, separators=(",", ":"))),
+            )
+
+
+def default_db_path() -> str:
+    """env SESSION_MEMORY_PATH, else .../Jinja_2_demo/.session_memory.sqlite3"""
+    here = Path(__file__).resolve().parent
+    return os.getenv("SESSION_MEMORY_PATH") or str(here / ".session_memory.sqlite3")
@@ -0,0 +1,247 @@
+# stream_parser.py
+"""
+Incremental parser for the summarizer's streamed answer.
+
+The prompt asks for a ```json `plottinggraph` block first and Markdown
+sections after it. Instead of waiting for the whole response, the parser
+consumes chunks as they arrive and emits typed events:
+
+    ChartReady     the JSON fence closed and parsed (payload = the object)
+    ChartError     the JSON fence closed but did not parse
+    SectionStart   a Markdown heading line ("### Key Insights")
+    TextDelta      prose, passed through as soon as it arrives
+    SectionEnd     the current section ended (next heading or end of stream)
+    StreamEnd      totals, from close()
+
+    parser = StreamParser()
+    for piece in pieces:
+        for event in parser.feed(piece):
+            ...
+    events = parser.close()
+
+    async for event in astream_events(None, prompt_str):   # over astream_gemini_synthesis
+        ...
+
+Chunk boundaries can fall anywhere, including inside the fence markers.
+Only the current line is held back, and only when it could be a heading or a
+fence marker (it starts with '#' or '`'); other prose is passed through
+without waiting for its newline. The JSON body is kept until its fence
+closes. Nothing else is buffered, so memory does not grow with the length of
+the response. Fences tagged with another language pass through as text.
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterable, AsyncIterator, ClassVar, Dict, List, Optional
+
+_HEADING_RE = re.compile(r"(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_FENCE_RE = re.compile(r"(`{3,})[ \t]*([\w+-]*)")
+# Fence languages treated as the chart block; a bare ``` counts as well
+CHART_FENCE_LANGS = frozenset({"json", ""})
+
+
+# -----------------------------------------------------------------------------
+# Events
+# -----------------------------------------------------------------------------
+@dataclass
+class StreamEvent:
+    kind: ClassVar[str] = "event"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class TextDelta(StreamEvent):
+    kind: ClassVar[str] = "text"
+    text: str
+    section: Optional[str] = None
+
+
+@dataclass
+class SectionStart(StreamEvent):
+    kind: ClassVar[str] = "section"
+    title: str
+    level: int
+
+
+@dataclass
+class SectionEnd(StreamEvent):
+    kind: ClassVar[str] = "section_end"
+    title: str
+
+
+@dataclass
+class ChartReady(StreamEvent):
+    kind: ClassVar[str] = "chart_ready"
+    payload: Any
+    # Response characters consumed when the block closed
+    offset: int
+
+
+@dataclass
+class ChartError(StreamEvent):
+    kind: ClassVar[str] = "chart_error"
+    message: str
+    raw: str
+    offset: int
+
+
+@dataclass
+class StreamEnd(StreamEvent):
+    kind: ClassVar[str] = "done"
+    chars: int
+    charts: int
+    sections: int
+
+
+# -----------------------------------------------------------------------------
+# Parser
+# -----------------------------------------------------------------------------
+class StreamParser:
+    def __init__(self):
+        self.chars = 0
+        self.charts = 0
+        self.sections = 0
+        self._section: Optional[str] = None
+        self._line = ""            # held partial line (candidate heading/fence, or fence body)
+        self._holding = False      # current line is being held until its newline
+        self._at_line_start = True
+        self._fence: Optional[str] = None       # closing marker of the open fence
+        self._chart_fence = False  # open fence is the chart block
+        self._fence_lines: List[str] = []
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """Events completed by `chunk` (possibly none)."""
+        if self._closed:
+            raise ValueError("feed() after close()")
+        events: List[StreamEvent] = []
+        text: List[str] = []  # prose of this chunk, merged into one TextDelta
+        pos, end = 0, len(chunk)
+        self.chars += end
+        while pos < end:
+            if self._fence is None and not self._holding:
+                if self._at_line_start and chunk[pos] in "#`":
+                    self._holding = True
+                    continue
+                nl = chunk.find("\n", pos)
+                stop = end if nl < 0 else nl + 1
+                text.append(chunk[pos:stop])
+                self._at_line_start = nl >= 0
+                pos = stop
+                continue
+            # Held line or fence body: wait for the end of the line
+            nl = chunk.find("\n", pos)
+            if nl < 0:
+                self._line += chunk[pos:]
+                break
+            line = self._line + chunk[pos:nl + 1]
+            self._line = ""
+            pos = nl + 1
+            self._holding = False
+            self._at_line_start = True
+            self._complete_line(line, events, text)
+        self._flush_text(text, events)
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        """Flush the held line and an unterminated fence; ends with StreamEnd."""
+        if self._closed:
+            return []
+        events: List[StreamEvent] = []
+        text: List[str] = []
+        if self._line:
+            line, self._line = self._line, ""
+            self._holding = False
+            self._complete_line(line, events, text)
+        if self._fence is not None:
+            # Truncated answer: the body may still be complete JSON
+            if self._chart_fence:
+                self._flush_text(text, events)
+                events.append(self._parse_chart())
+            self._fence = None
+        self._flush_text(text, events)
+        if self._section is not None:
+            events.append(SectionEnd(self._section))
+            self._section = None
+        events.append(StreamEnd(self.chars, self.charts, self.sections))
+        self._closed = True
+        return events
+
+    # ---------- Internals ----------
+    def _complete_line(self, line: str, events: List[StreamEvent], text: List[str]) -> None:
+        stripped = line.rstrip("\r\n")
+        if self._fence is not None:
+            if stripped.strip().startswith(self._fence) and not stripped.strip().strip("`"):
+                if self._chart_fence:
+                    self._flush_text(text, events)
+                    events.append(self._parse_chart())
+                else:
+                    text.append(line)
+                self._fence = None
+            elif self._chart_fence:
+                self._fence_lines.append(line)
+            else:
+                text.append(line)
+            return
+
+        fence = _FENCE_RE.match(stripped)
+        if fence:
+            self._fence = fence.group(1)
+            self._chart_fence = fence.group(2).lower() in CHART_FENCE_LANGS
+            self._fence_lines = []
+            if not self._chart_fence:
+                text.append(line)
+            return
+
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            self._flush_text(text, events)
+            if self._section is not None:
+                events.append(SectionEnd(self._section))
+            self._section = heading.group(2)
+            self.sections += 1
+            events.append(SectionStart(self._section, len(heading.group(1))))
+            return
+        text.append(line)
+
+    def _parse_chart(self) -> StreamEvent:
+        raw = "".join(self._fence_lines)
+        self._fence_lines = []
+        try:
+            payload = json.loads(raw)
+        except ValueError as e:
+            return ChartError(str(e), raw, self.chars)
+        self.charts += 1
+        return ChartReady(payload, self.chars)
+
+    def _flush_text(self, text: List[str], events: List[StreamEvent]) -> None:
+        if text:
+            joined = "".join(text)
+            text.clear()
+            if joined:
+                events.append(TextDelta(joined, self._section))
+
+
+# -----------------------------------------------------------------------------
+# Async front ends
+# -----------------------------------------------------------------------------
+async def aparse_stream(pieces: AsyncIterable[str], parser: StreamParser | None = None) -> AsyncIterator[StreamEvent]:
+    """Events of an async stream of text pieces, yielded as soon as they complete."""
+    parser = parser or StreamParser()
+    async for piece in pieces:
+        for event in parser.feed(piece):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+async def astream_events(model_id: str | None, prompt_str: str) -> AsyncIterator[StreamEvent]:
+    """astream_gemini_synthesis(model_id, prompt_str), parsed into events."""
+    from bedrock_connector.gemini_connector import astream_gemini_synthesis
+
+    async for event in aparse_stream(astream_gemini_synthesis(model_id, prompt_str)):
+        yield event
@@ -0,0 +1,267 @@
+# table.py
+"""
+Column-oriented tables for the prompt and HTML builders.
+
+`ColumnarTable` keeps one array per column and a single shared schema (the
+column names), instead of one dict per row. Numeric columns are packed NumPy
+arrays. Text and mixed columns are object arrays whose cells point at shared
+string objects. Slicing returns a view over the same arrays, so
+`table[:50]` copies nothing.
+
+`RecordsTable` adapts the existing list-of-dicts layout to the same
+interface without copying the rows, so every builder can take either:
+
+    as_table(table_rows, table_columns).head(50).iter_tuples()
+"""
+from __future__ import annotations
+
+import math
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows converted to Python objects per step while iterating a ColumnarTable
+TUPLE_CHUNK_ROWS = 4096
+
+
+def _to_array(values) -> np.ndarray:
+    """Packed array for numeric/bool data, object array for anything else."""
+    if isinstance(values, np.ndarray):
+        return values
+    values = list(values)
+    try:
+        arr = np.asarray(values)
+    except (OverflowError, ValueError):
+        arr = None
+    # Pack only homogeneous columns, so every cell reads back as the same
+    # Python value (no 40 -> 40.0 or True -> 1 promotion)
+    if arr is not None and arr.dtype.kind in "biuf" and len(set(map(type, values))) > 1:
+        arr = None
+    if arr is None or arr.ndim != 1 or arr.dtype.kind not in "biuf":
+        # Strings, None and mixed types stay Python objects (no fixed-width copies)
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = values
+    return arr
+
+
+def infer_columns(table_rows: Sequence[dict], sample: int = 100) -> List[str]:
+    """Keys of the first `sample` rows, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for row in table_rows[:sample]:
+        for key in row:
+            seen.setdefault(key, None)
+    return list(seen)
+
+
+class ColumnarTable:
+    """Array-backed columns with a shared schema; slices are zero-copy views."""
+
+    __slots__ = ("columns", "_data", "_start", "_stop")
+
+    def __init__(self, columns: Sequence[str], data: Mapping[str, np.ndarray], start: int = 0, stop: Optional[int] = None):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._data = data
+        base = len(next(iter(data.values()))) if data else 0
+        self._start = start
+        self._stop = base if stop is None else stop
+
+    # ---------- Construction ----------
+    @classmethod
+    def from_columns(cls, data: Mapping[str, Iterable], columns: Optional[Sequence[str]] = None) -> "ColumnarTable":
+        columns = list(columns or data.keys())
+        arrays = {c: _to_array(data[c]) for c in columns}
+        lengths = {len(a) for a in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        return cls(columns, arrays)
+
+    @classmethod
+    def from_records(cls, table_rows: Sequence[dict], columns: Optional[Sequence[str]] = None) -> "ColumnarTable":
+        if columns is None:
+            columns = infer_columns(table_rows)
+        return cls.from_columns({c: [r.get(c) for r in table_rows] for c in columns}, columns)
+
+    # ---------- Views ----------
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("ColumnarTable slices must be contiguous")
+            return ColumnarTable(self.columns, self._data, self._start + start, self._start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return next(self[index:index + 1].iter_tuples())
+
+    def head(self, n: Optional[int]) -> "ColumnarTable":
+        return self if n is None else self[:n]
+
+    def select(self, columns: Sequence[str], fill: Any = None) -> "ColumnarTable":
+        """Projection in `columns` order; unknown columns read as `fill`."""
+        data = dict(self._data)
+        base = len(next(iter(data.values()))) if data else self._stop
+        for c in columns:
+            if c not in data:
+                data[c] = np.full(base, fill, dtype=object)
+        return ColumnarTable(columns, data, self._start, self._stop)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._data[name][self._start:self._stop]
+
+    # ---------- Row access ----------
+    def iter_tuples(self, fill: Any = None) -> Iterator[tuple]:
+        """Row tuples in schema order, as Python values, converted chunk by chunk.
+        (`fill` only matters for dict rows; see `select` for missing columns.)"""
+        arrays = [self._data[c] for c in self.columns]
+        for lo in range(self._start, self._stop, TUPLE_CHUNK_ROWS):
+            hi = min(lo + TUPLE_CHUNK_ROWS, self._stop)
+            yield from zip(*(a[lo:hi].tolist() for a in arrays))
+
+    def row_lists(self) -> List[list]:
+        return [list(t) for t in self.iter_tuples()]
+
+    def to_records(self) -> List[dict]:
+        columns = self.columns
+        return [dict(zip(columns, t)) for t in self.iter_tuples()]
+
+    def nbytes(self) -> int:
+        """Array buffer size (object columns count their pointers only)."""
+        return sum(self.column(c).nbytes for c in self.columns)
+
+
+class RecordsTable:
+    """List of dicts behind the ColumnarTable interface; slices share the list."""
+
+    __slots__ = ("columns", "_rows", "_start", "_stop", "_fill")
+
+    def __init__(self, rows: Sequence[dict], columns: Sequence[str], start: int = 0, stop: Optional[int] = None, fill: Any = None):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._rows = rows
+        self._start = start
+        self._stop = len(rows) if stop is None else stop
+        self._fill = fill
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("RecordsTable slices must be contiguous")
+            return RecordsTable(self._rows, self.columns, self._start + start, self._start + max(start, stop), self._fill)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        row = self._rows[self._start + index]
+        return tuple(row.get(c, self._fill) for c in self.columns)
+
+    def head(self, n: Optional[int]) -> "RecordsTable":
+        return self if n is None else self[:n]
+
+    def column(self, name: str) -> list:
+        fill, rows = self._fill, self._rows
+        return [rows[i].get(name, fill) for i in range(self._start, self._stop)]
+
+    def iter_tuples(self, fill: Any = None) -> Iterator[tuple]:
+        columns, rows = self.columns, self._rows
+        fill = self._fill if fill is None else fill
+        # Index instead of islice: later pages must not walk the earlier rows
+        for i in range(self._start, self._stop):
+            row = rows[i]
+            yield tuple(row.get(c, fill) for c in columns)
+
+    def row_lists(self) -> List[list]:
+        return [list(t) for t in self.iter_tuples()]
+
+    def to_records(self) -> List[dict]:
+        return list(self._rows[self._start:self._stop])
+
+
+def as_table(table_rows, columns: Optional[Sequence[str]] = None, fill: Any = None):
+    """
+    ColumnarTable / RecordsTable view of `table_rows` in `columns` order.
+    Lists of dicts are wrapped, not copied; tables are projected, not copied.
+    """
+    if isinstance(table_rows, ColumnarTable):
+        if columns is None or tuple(columns) == table_rows.columns:
+            return table_rows
+        return table_rows.select(columns, fill)
+    if isinstance(table_rows, RecordsTable):
+        if columns is None or (tuple(columns) == table_rows.columns and fill == table_rows._fill):
+            return table_rows
+        # Re-project over the same list; the view keeps its bounds
+        return RecordsTable(table_rows._rows, columns, table_rows._start, table_rows._stop, fill)
+    rows = table_rows if isinstance(table_rows, Sequence) else list(table_rows or [])
+    if columns is None:
+        columns = infer_columns(rows)
+    return RecordsTable(rows, columns, fill=fill)
+
+
+def is_table(obj) -> bool:
+    return isinstance(obj, (ColumnarTable, RecordsTable))
+
+
+def iter_row_tuples(
+    table_rows, columns: Sequence[str], fill: Any = "", limit: Optional[int] = None, offset: int = 0
+) -> Iterator[tuple]:
+    """
+    Lazily yield up to `limit` row tuples, starting at row `offset`, in
+    `columns` order from a table, a list of dicts, any iterable of dicts
+    (e.g. a streaming reader), or a data_sources.DataSource (which decodes
+    only those rows and columns).
+    """
+    if hasattr(table_rows, "row_tuples"):
+        return table_rows.row_tuples(columns, fill, limit, offset)
+    if is_table(table_rows) or isinstance(table_rows, Sequence):
+        table = as_table(table_rows, columns, fill)
+        if offset:
+            table = table[offset:]
+        return table.head(limit).iter_tuples(fill)
+    stop = None if limit is None else offset + limit
+    rows = islice(table_rows, offset, stop) if (offset or stop is not None) else table_rows
+    return (tuple(r.get(c, fill) for c in columns) for r in rows)
+
+
+def column_summary(table, top: int = 5, key=str) -> Dict[str, Any]:
+    """
+    Per-column stats: min/max/mean/sum for all-numeric columns, otherwise the
+    distinct count and most frequent values. Packed numeric arrays are
+    reduced with NumPy. Float sums are exact (math.fsum), so a table gives
+    the same summary whether it arrives as dicts or as a ColumnarTable.
+    """
+    summary: Dict[str, Any] = {}
+    for col in table.columns:
+        values = table.column(col)
+        if isinstance(values, np.ndarray) and values.dtype.kind in "iuf" and len(values):
+            total = math.fsum(values) if values.dtype.kind == "f" else values.sum().item()
+            summary[col] = {
+                "min": values.min().item(),
+                "max": values.max().item(),
+                "mean": round(total / len(values), 4),
+                "sum": total,
+            }
+            continue
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        nums = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if nums and len(nums) == len(values):
+            total = sum(nums) if all(isinstance(v, int) for v in nums) else math.fsum(nums)
+            summary[col] = {
+                "min": min(nums),
+                "max": max(nums),
+                "mean": round(total / len(nums), 4),
+                "sum": total,
+            }
+        else:
+            counts = Counter(v if isinstance(v, str) else key(v) for v in values)
+            ranked = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:top]
+            summary[col] = {"distinct": len(counts), "top": [[k, n] for k, n in ranked]}
+    return summary
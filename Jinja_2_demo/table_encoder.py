@@ -0,0 +1,263 @@
+# table_encoder.py
+"""
+Compact, token-budgeted table serialization for LLM prompts.
+
+The columnar layout names every column once and sends each row as a plain
+array, with no indentation:
+
+    {"columns":["region","drug"],"rows":[["West","Metformin"],...]}
+
+When a token budget is given and the table does not fit, rows are reduced
+with one of three strategies:
+
+  truncate   keep the first rows that fit
+  sample     keep evenly spaced rows across the whole table (deterministic)
+  aggregate  keep the first rows that fit in half the budget plus per-column
+             statistics computed over *all* rows, trimmed to the other half
+             (falls back to truncate when not even one column's fit)
+
+Rows are serialized in chunks only until the budget is exceeded, so a large
+table that will be cut is never encoded whole; its `full_tokens` is then
+extrapolated from the rows that were.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from json_backend import dumps
+from table import ColumnarTable, RecordsTable, as_table, column_summary, is_table
+
+STRATEGIES = ("truncate", "sample", "aggregate")
+
+# Rough size of a token for JSON-heavy English text
+CHARS_PER_TOKEN = 4
+# Rows per serializer call while measuring a table against its budget
+ENCODE_CHUNK_ROWS = 256
+# Most frequent values per text column in the aggregate summary, before trimming
+SUMMARY_TOP = 5
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_json(obj: Any) -> str:
+    return dumps(obj)
+
+
+@dataclass
+class EncodedTable:
+    text: str
+    layout: str
+    strategy: str          # "full" when nothing had to be dropped
+    rows_in: int
+    rows_out: int
+    full_tokens: int       # size of the whole table in this layout (estimated when cut)
+    tokens: int            # size of `text`
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "layout": self.layout,
+            "strategy": self.strategy,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "table_tokens_full": self.full_tokens,
+            "table_tokens": self.tokens,
+        }
+
+
+def table_columns_for(table_columns: Optional[Sequence[str]], table_rows: Sequence[dict]) -> List[str]:
+    """Declared columns when they match the rows, otherwise the keys found in the rows."""
+    if table_columns and table_rows and all(c in table_rows[0] for c in table_columns):
+        return list(table_columns)
+    seen: Dict[str, None] = {}
+    for row in table_rows[:100]:
+        for key in row:
+            seen.setdefault(key, None)
+    return list(seen) or list(table_columns or [])
+
+
+def _fit_prefix(row_text, n_rows: int, budget_chars: int) -> List[str]:
+    picked, used = [], 0
+    for i in range(n_rows):
+        text = row_text(i)
+        used += len(text) + 1
+        if used > budget_chars:
+            break
+        picked.append(text)
+    return picked
+
+
+def _serialize_chunks(rows: Iterator, limit_chars: Optional[int]):
+    """
+    Comma-joined JSON of `rows`, ENCODE_CHUNK_ROWS per serializer call, until
+    the text passes `limit_chars`: (chunk texts, rows serialized, all rows done).
+    """
+    chunks: List[str] = []
+    n, used = 0, 0
+    while True:
+        chunk = list(islice(rows, ENCODE_CHUNK_ROWS))
+        if not chunk:
+            return chunks, n, True
+        text = dumps(chunk)[1:-1]
+        chunks.append(text)
+        n += len(chunk)
+        used += len(text) + 1
+        if limit_chars is not None and used > limit_chars:
+            return chunks, n, False
+
+
+def _fit_summary(summary: Dict[str, Any], budget_chars: int) -> Optional[Dict[str, Any]]:
+    """
+    `summary` serialized in at most `budget_chars`: fewer top values per
+    column first, then the last columns dropped. None when no column fits.
+    """
+    for top in (SUMMARY_TOP, 3, 1, 0):
+        trimmed = {}
+        for col, stats in summary.items():
+            if "top" in stats:
+                stats = {"distinct": stats["distinct"], "top": stats["top"][:top]} if top else {"distinct": stats["distinct"]}
+            trimmed[col] = stats
+        if len(compact_json(trimmed)) <= budget_chars:
+            return trimmed
+    kept: Dict[str, Any] = {}
+    used = 2  # the braces
+    for col, stats in trimmed.items():
+        used += len(compact_json({col: stats})) - 1  # its "key":value plus a comma
+        if used > budget_chars:
+            break
+        kept[col] = stats
+    return kept or None
+
+
+def _encodable(table_columns, table_rows):
+    """Table view in the column order the prompt uses."""
+    if isinstance(table_rows, ColumnarTable):
+        declared = list(table_columns or [])
+        if declared and all(c in table_rows.columns for c in declared):
+            return as_table(table_rows, declared)
+        return table_rows
+    rows = table_rows.to_records() if isinstance(table_rows, RecordsTable) else list(table_rows or [])
+    return as_table(rows, table_columns_for(table_columns, rows))
+
+
+def _render(layout: str, columns: List[str], row_texts: List[str], extra: Dict[str, Any]) -> str:
+    body = "[" + ",".join(row_texts) + "]"
+    if layout == "records":
+        # Shape must stay a plain list; what was dropped is in EncodedTable
+        return body
+    head = '{"columns":' + compact_json(columns) + ',"rows":' + body
+    for key, value in extra.items():
+        head += "," + compact_json(key) + ":" + compact_json(value)
+    return head + "}"
+
+
+def encode_table(
+    table_columns: Optional[Sequence[str]],
+    table_rows: Optional[Sequence[dict] | ColumnarTable],
+    token_budget: Optional[int] = None,
+    strategy: str = "aggregate",
+    layout: str = "columnar",
+    partial: bool = False,
+    total_rows: Optional[int] = None,
+) -> EncodedTable:
+    """
+    Serialize `table_rows` (dicts or a ColumnarTable) once, compactly, within
+    `token_budget` tokens.
+
+    layout="columnar" emits the column list plus row arrays; layout="records"
+    keeps a plain list of compact row objects for payloads whose shape must be
+    preserved (e.g. nested chart data) and never adds annotations.
+
+    `partial=True`: `table_rows` are only the first rows of a larger result
+    (data_sources.DataSource.read_prefix). They are truncated, never
+    summarized, since the statistics would cover only the rows that were
+    read, and the result size (`total_rows`, when known) is reported.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+    if layout == "records":
+        table = None
+        rows = table_rows.to_records() if is_table(table_rows) else list(table_rows or [])
+        columns = table_columns_for(table_columns, rows)
+        n_rows = len(rows)
+        row_iter = iter(rows)
+    else:
+        table = _encodable(table_columns, table_rows)
+        columns = list(table.columns)
+        n_rows = len(table)
+        row_iter = table.iter_tuples()
+
+    # Big serializer calls until the table is known not to fit; rows are
+    # encoded one by one only to cut it
+    overhead = len(_render(layout, columns, [], {}))
+    limit = token_budget * CHARS_PER_TOKEN - overhead + 1 if token_budget is not None else None
+    chunks, n_seen, complete = _serialize_chunks(row_iter, limit)
+    row_chars = sum(len(c) + 1 for c in chunks)   # sum of len(row) + 1 over the rows seen
+    if complete:
+        full_text = _render(layout, columns, chunks, {})
+        full_chars = len(full_text)
+    else:
+        row_chars = row_chars * n_rows // n_seen
+        full_chars = overhead + row_chars - 1
+    full_tokens = (full_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    if n_rows == 0 or (not partial and complete and (token_budget is None or full_tokens <= token_budget)):
+        # An empty table has nothing to drop, even when its column list is over budget
+        return EncodedTable(full_text, layout, "full", n_rows, n_rows, full_tokens, full_tokens)
+
+    if layout == "records" or partial:
+        strategy = "truncate"   # nested payloads / prefixes have no meaningful column stats
+    extra: Dict[str, Any] = {}
+    budget_chars = limit if limit is not None else row_chars
+
+    texts: Dict[int, str] = {}
+
+    def row_text(i: int) -> str:
+        text = texts.get(i)
+        if text is None:
+            text = texts[i] = compact_json(rows[i] if table is None else list(table[i]))
+        return text
+
+    if strategy == "aggregate":
+        # Summary in half the budget (less the other keys); rows in the rest
+        summary = _fit_summary(column_summary(table, top=SUMMARY_TOP, key=compact_json), budget_chars // 2 - 48)
+        if summary is None:
+            strategy = "truncate"
+        else:
+            extra["summary"] = summary
+            extra["omitted_rows"] = 0
+            overhead = len(compact_json(extra)) + 32
+            budget_chars = min(budget_chars // 2, budget_chars - overhead)
+    if strategy != "aggregate":
+        # What was dropped is reported next to the rows, inside the budget
+        if strategy == "sample":
+            extra["sampled_from"] = n_rows
+        elif partial and total_rows is None:
+            extra["more_rows"] = True   # the source cannot count without a full scan
+        else:
+            extra["truncated_from"] = total_rows if partial else n_rows
+        budget_chars -= len(_render(layout, columns, [], extra)) - len(_render(layout, columns, [], {}))
+
+    if strategy == "sample":
+        avg = max(1, row_chars // n_rows)
+        keep = max(0, min(n_rows, budget_chars // avg))
+        while keep > 0:
+            step = n_rows / keep
+            picked = [row_text(int(i * step)) for i in range(keep)]
+            if sum(len(t) + 1 for t in picked) <= budget_chars:
+                break
+            keep -= 1
+        else:
+            picked = []
+    else:
+        picked = _fit_prefix(row_text, n_rows, max(0, budget_chars))
+
+    if strategy == "aggregate":
+        extra["omitted_rows"] = n_rows - len(picked)
+
+    if partial and total_rows is not None:
+        n_rows = total_rows
+    text = _render(layout, columns, picked, extra)
+    return EncodedTable(text, layout, strategy, n_rows, len(picked), full_tokens, estimate_tokens(text))
@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""The demo modules import each other as top-level modules (see service.py)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+# tests/test_config_loader.py
+import os
+
+import pytest
+import yaml
+
+from config.loader import ConfigService, compile_setting, get_setting
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def cfg_file(tmp_path):
+    path = tmp_path / "app_config.yaml"
+    _write(path, "DEV:\n  llms:\n    provider: fake\n", 1_000_000_000)
+    return path
+
+
+def test_reload_only_when_the_mtime_changes(cfg_file):
+    service = ConfigService(str(cfg_file), check_interval_s=0)
+    seen = []
+    service.subscribe(lambda new, old: seen.append((old["DEV"]["llms"]["provider"], new["DEV"]["llms"]["provider"])))
+    assert service.setting("DEV", "llms.provider") == "fake"
+    assert service.reload() is False
+
+    _write(cfg_file, "DEV:\n  llms:\n    provider: gemini\n", 2_000_000_000)
+    assert service.setting("DEV", "llms.provider") == "gemini"
+    assert seen == [("fake", "gemini")] and service.reloads == 2
+
+
+@pytest.mark.parametrize("broken", ["DEV: [unclosed\n", "- just\n- a list\n"])
+def test_broken_file_keeps_the_last_good_config(cfg_file, broken):
+    service = ConfigService(str(cfg_file), check_interval_s=0)
+    good = service.get()
+    _write(cfg_file, broken, 2_000_000_000)
+    assert service.get() is good
+    assert service.reload() is False  # that mtime is not parsed again
+
+    cfg_file.unlink()
+    assert service.get() is good
+
+
+def test_only_the_first_load_raises(tmp_path):
+    path = tmp_path / "app_config.yaml"
+    with pytest.raises(FileNotFoundError):
+        ConfigService(str(path)).get()
+    _write(path, "DEV: [unclosed\n", 1_000_000_000)
+    with pytest.raises(yaml.YAMLError):
+        ConfigService(str(path)).get()
+
+
+def test_dotted_settings():
+    cfg = {"aws": {"region": "us-east-1"}, "flag": False}
+    assert get_setting(cfg, "aws.region") == "us-east-1"
+    assert get_setting(cfg, "aws.region.zone", "none") == "none"
+    assert compile_setting("flag")(cfg, True) is False
+    assert compile_setting("missing.key")(cfg, 3) == 3
+
+
+def test_shipped_context_cache_threshold_admits_the_v5_prefix():
+    from config.loader import _default_cfg_path
+    from demo_queries import prepare_query
+    from table_encoder import CHARS_PER_TOKEN
+
+    cfg = ConfigService(str(_default_cfg_path())).get()
+    min_tokens = get_setting(cfg, "DEV.llms.gemini.context_cache.min_prefix_tokens")
+    prompt, _, _ = prepare_query("Give me a table", "table")
+    assert len(prompt.prefix) >= min_tokens * CHARS_PER_TOKEN
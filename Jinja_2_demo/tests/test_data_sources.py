@@ -0,0 +1,85 @@
+# tests/test_data_sources.py
+import csv
+
+import pytest
+
+import data_sources
+from data_sources import CsvSource, open_source, parse_cell
+
+
+@pytest.mark.parametrize("text, value", [
+    ("", None),
+    ("42", 42),
+    ("-7", -7),
+    ("+3", 3),
+    ("1.5", 1.5),
+    (".5", 0.5),
+    ("1e3", 1000.0),
+    ("0", 0),
+    ("0.25", 0.25),
+    ("00123", "00123"),     # zero-padded identifier
+    ("1_000", "1_000"),     # int() would accept the underscore
+    ("٣", "٣"),             # non-ASCII digit
+    ("-inf", "-inf"),
+    ("nan", "nan"),
+    ("12abc", "12abc"),
+    ("-", "-"),
+])
+def test_parse_cell(text, value):
+    assert parse_cell(text) == value
+    assert type(parse_cell(text)) is type(value)
+
+
+def _write(path, n):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "name", "count"])
+        for i in range(n):
+            w.writerow([i, f"row {i}", i * 2])
+    return str(path)
+
+
+def test_rows_from_a_checkpoint_match_a_full_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_sources, "CSV_CHECKPOINT_ROWS", 10)
+    path = _write(tmp_path / "t.csv", 95)
+    with CsvSource(path) as source:
+        full = list(source.row_tuples())
+        assert len(source._checkpoints) == 10  # rows 0, 10, ..., 90
+        assert list(source.row_tuples(offset=57, limit=5)) == full[57:62]
+        assert list(source.row_tuples(["count", "id"], offset=90)) == [(2 * i, i) for i in range(90, 95)]
+    assert full[3] == (3, "row 3", 6)
+
+
+def test_select_and_head(tmp_path):
+    path = _write(tmp_path / "t.csv", 5)
+    with open_source(path) as source:
+        view = source.select(["name", "missing"])
+        table = view.head(2, offset=1)
+        assert tuple(table.columns) == ("name", "missing")
+        assert table.row_lists() == [["row 1", None], ["row 2", None]]
+        assert source.count_rows() == 5 and source.num_rows == 5
+
+
+def test_quoted_newlines_are_one_row(tmp_path):
+    path = tmp_path / "q.csv"
+    path.write_text('a,b\n1,"two\nlines"\n3,x\n')
+    with CsvSource(str(path)) as source:
+        assert list(source.row_tuples()) == [(1, "two\nlines"), (3, "x")]
+        assert source.count_rows() == 2
+
+
+def test_unbudgeted_prompt_reads_one_page_not_the_file(tmp_path):
+    from prompt_constellatiion import HTML_TABLE_MAX_ROWS, render__prompt
+
+    path = _write(tmp_path / "t.csv", 5000)
+    with CsvSource(path) as source:
+        read = []
+        read_prefix = source.read_prefix
+        source.read_prefix = lambda *a, **kw: read.append(read_prefix(*a, **kw)) or read[-1]
+        stats = {}
+        _, html = render__prompt("q", "", {"chart_type": "TABLE"}, table_columns=list(source.columns),
+                                 table_rows=source, token_budget=None, stats=stats)
+    prefix, complete = read[0]
+    assert not complete and HTML_TABLE_MAX_ROWS <= len(prefix) < 5000
+    assert stats["strategy"] == "truncate" and stats["rows_out"] <= len(prefix)
+    assert "row 0" in html
@@ -0,0 +1,58 @@
+# tests/test_intent_router.py
+import re
+
+import pytest
+
+from intent_router import HashingEmbedder, Intent, IntentRouter, classify_query, trie_pattern
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("Give me a table of top physicians", "table"),
+    ("Show the MARKET share by region", "marketshare"),
+    ("regional breakdown", "marketshare"),   # substring match, like the original
+    ("list the market leaders", "table"),    # first registered intent wins
+    ("hello there", "unknown"),
+    ("", "unknown"),
+])
+def test_classify_query(query, intent):
+    assert classify_query(query) == intent
+
+
+def test_trie_pattern_matches_every_keyword():
+    words = ["share", "shares", "shape", "market"]
+    pattern = re.compile(trie_pattern(words))
+    for word in words:
+        assert pattern.search(f"the {word} of")
+    assert not pattern.search("sharp")
+
+
+def test_score_mode_prefers_more_hits():
+    router = IntentRouter(mode="score")
+    assert router.classify("list the market share chart") == "marketshare"
+    assert IntentRouter().classify("list the market share chart") == "table"
+
+
+def test_classify_many_matches_classify_and_uses_the_cache():
+    router = IntentRouter()
+    queries = ["a table", "market share", "A  Table", "nothing here"]
+    assert router.classify_many(queries) == [router.classify(q) for q in queries]
+    assert router.stats()["misses"] == 3  # "a table" and "A  Table" normalize alike
+
+
+def test_add_intent_recompiles_and_clears_the_cache():
+    router = IntentRouter()
+    assert router.classify("sales trend over time") == "unknown"
+    router.add_intent(Intent("trend", ("trend", "over time")))
+    assert router.classify("sales trend over time") == "trend"
+    assert router.intents == ("table", "marketshare", "trend")
+
+
+def test_embedder_routes_queries_without_keyword_hits():
+    router = IntentRouter(
+        [Intent("table", ("table",), examples=("top prescribers by volume",)),
+         Intent("marketshare", ("share",), examples=("brand performance across territories",))],
+        embedder=HashingEmbedder(),
+        min_similarity=0.1,
+    )
+    assert router.classify("top prescribers by volume") == "table"
+    assert router.classify_many(["brand performance across territories", "zzz"]) == ["marketshare", "unknown"]
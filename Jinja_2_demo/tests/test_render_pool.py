@@ -0,0 +1,54 @@
+# tests/test_render_pool.py
+import asyncio
+
+import pytest
+
+from demo_queries import marketshare_query_inputs, table_query_inputs
+from render_pool import RenderPool
+
+
+def _nested_marketshare(n_regions, n_products):
+    return [
+        {"name": f"Region {r}", "data": [{"name": f"Drug {p}", "value": (r * 31 + p * 17) % 997} for p in range(n_products)]}
+        for r in range(n_regions)
+    ]
+
+
+def _cases():
+    table = table_query_inputs()
+    bar = dict(table, visualization={"chart_type": "BAR_GRAPH"})
+    market = marketshare_query_inputs()
+    big_market = dict(market, table_rows=_nested_marketshare(200, 40))
+    return {"table": table, "other": bar, "marketshare": market, "big_marketshare": big_market}
+
+
+@pytest.fixture(scope="module")
+def pools():
+    inline, pooled = RenderPool(workers=1, inline_max_cells=10 ** 9), RenderPool(workers=1, inline_max_cells=0)
+    yield inline, pooled
+    pooled.close()
+
+
+@pytest.mark.parametrize("prompt_version", ["v3", "v5"])
+@pytest.mark.parametrize("case", ["table", "other", "marketshare", "big_marketshare"])
+def test_pooled_render_matches_inline(pools, case, prompt_version):
+    inputs = _cases()[case]
+    kwargs = dict(
+        subquery="Give me the numbers",
+        table_text="",
+        visualization=inputs["visualization"],
+        table_columns=inputs["table_columns"],
+        table_rows=inputs["table_rows"],
+        columns_metadata=inputs["columns_metadata"],
+        prompt_version=prompt_version,
+    )
+
+    async def render(pool):
+        return await pool.render_prompt(**kwargs)
+
+    inline, pooled = pools
+    expected = asyncio.run(render(inline))
+    assert asyncio.run(render(pooled)) == expected
+    assert pooled.stats()["pooled"] >= 1 and inline.stats()["pooled"] == 0
+    if "marketshare" in case and prompt_version == "v5":
+        assert '"yAxis": []' not in expected[0]
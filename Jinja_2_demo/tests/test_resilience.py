@@ -0,0 +1,108 @@
+# tests/test_resilience.py
+import asyncio
+
+import pytest
+
+from bedrock_connector.providers import FakeStreamingProvider, FakeUpstreamError
+from bedrock_connector.resilience import CircuitBreaker, CircuitOpenError, ResilienceConfig, ResilientStreamer
+from bedrock_connector.streaming import aiter_in_thread
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tripped_breaker(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, reset_timeout_s=10, clock=clock)
+    for _ in range(4):
+        assert breaker.allow() == "closed"
+        breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_opens_then_probe_closes_it():
+    clock = _Clock()
+    breaker = _tripped_breaker(clock)
+    assert breaker.allow() is None
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow() == "probe"
+    assert breaker.allow() is None  # one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_breaker():
+    clock = _Clock()
+    breaker = _tripped_breaker(clock)
+    clock.now = 10
+    assert breaker.allow() == "probe"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+
+
+def test_stale_success_does_not_close_an_open_breaker():
+    clock = _Clock()
+    breaker = _tripped_breaker(clock)
+    # An attempt launched before the trip finishes now
+    breaker.record_success()
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+    clock.now = 10
+    assert breaker.allow() == "probe"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def _run(streamer, provider):
+    async def main():
+        open_source = lambda: aiter_in_thread(lambda: provider.open_stream("m", "prompt"))
+        return "".join([p async for p in streamer.stream(open_source)])
+
+    return asyncio.run(main())
+
+
+def _fast_provider(faults):
+    return FakeStreamingProvider(ttft_s=0.01, tokens_per_s=0, slow_ttft_s=1.0, faults=faults)
+
+
+def test_failure_before_first_chunk_is_retried():
+    provider = _fast_provider(["error", "ok"])
+    streamer = ResilientStreamer(ResilienceConfig(hedge=False, retry_backoff_s=0.01))
+    assert _run(streamer, provider) == provider.response
+    assert streamer.retries == 1 and provider.injected["error"] == 1
+
+
+def test_slow_first_chunk_is_hedged():
+    provider = _fast_provider(["slow", "ok"])
+    streamer = ResilientStreamer(ResilienceConfig(hedge_min_delay_s=0.05, hedge_default_delay_s=0.05))
+    assert _run(streamer, provider) == provider.response
+    assert streamer.hedges == 1 and streamer.hedge_wins == 1
+    # Time to first chunk as the caller saw it, hedge delay included
+    assert list(streamer._ttft)[0] >= 0.05
+
+
+def test_mid_stream_failure_is_not_retried():
+    provider = _fast_provider(["error_mid"])
+    streamer = ResilientStreamer(ResilienceConfig(hedge=False))
+    with pytest.raises(FakeUpstreamError):
+        _run(streamer, provider)
+    assert streamer.retries == 0 and provider.calls == 1
+
+
+def test_open_circuit_fails_fast():
+    provider = _fast_provider(["error"])
+    streamer = ResilientStreamer(ResilienceConfig(
+        hedge=False, max_attempts=1, breaker_window=4, breaker_min_calls=4, reset_timeout_s=60,
+    ))
+    for _ in range(4):
+        with pytest.raises(FakeUpstreamError):
+            _run(streamer, provider)
+    with pytest.raises(CircuitOpenError):
+        _run(streamer, provider)
+    assert provider.calls == 4 and streamer.rejected == 1
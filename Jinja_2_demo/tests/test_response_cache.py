@@ -0,0 +1,27 @@
+# tests/test_response_cache.py
+from bedrock_connector.response_cache import ResponseCache
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(db_path=db_path).put("k", "answer")
+    cache = ResponseCache(db_path=db_path)
+    assert cache.get("k", disk=False) is None
+    assert cache.get("k") == "answer" and cache.disk_hits == 1
+
+
+def test_re_put_does_not_inflate_the_disk_size(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), max_disk_bytes=1000)
+    for _ in range(50):
+        cache.put("k", "x" * 300)
+    assert cache._disk_bytes == 300
+    assert cache.disk_evictions == 0 and cache.get("k") == "x" * 300
+
+
+def test_disk_cap_evicts_oldest_first(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), max_disk_bytes=1000)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 300)
+    assert cache._disk_bytes <= 900 and cache.disk_evictions >= 2
+    fresh = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"))
+    assert fresh.get("k0") is None and fresh.get("k4") == "x" * 300
@@ -0,0 +1,82 @@
+# tests/test_retrieval.py
+import multiprocessing
+
+import pytest
+
+from intent_router import HashingEmbedder
+from retrieval import Document, IndexStateError, OverlapReranker, Retriever, VectorIndex
+
+DOCS = [
+    Document("metformin.txt", "Metformin volume is driven by endocrinology prescribers in the West."),
+    Document("statins.txt", "Atorvastatin leads cardiology prescriptions across the South."),
+]
+
+
+def _index(path, **kwargs):
+    return VectorIndex(str(path), embedder=HashingEmbedder(dim=256), **kwargs)
+
+
+def test_unchanged_chunks_are_not_embedded_again(tmp_path):
+    index = _index(tmp_path)
+    assert index.upsert(DOCS)["embedded"] == 2
+    counts = index.upsert(DOCS + [Document("new.txt", "Lisinopril in the Midwest.")])
+    assert (counts["unchanged"], counts["embedded"]) == (2, 1)
+    hits = Retriever(index, OverlapReranker(), k_final=1).retrieve("Which prescribers drive Metformin volume?")
+    assert hits[0].doc_id == "metformin.txt"
+    index.close()
+
+
+def test_second_handle_sees_commits_and_compaction(tmp_path):
+    writer, reader = _index(tmp_path), _index(tmp_path)
+    writer.upsert(DOCS)
+    assert len(reader) == 2 and reader.has_document("statins.txt")
+
+    writer.remove(["metformin.txt"])
+    generation = reader.generation
+    writer.compact()
+    assert reader.generation != generation
+    assert reader.stats()["rows"] == 1
+    hits = Retriever(reader, k_final=2).retrieve("Atorvastatin cardiology")
+    assert [h.doc_id for h in hits] == ["statins.txt"]
+    writer.close()
+    reader.close()
+
+
+def test_other_embedder_is_refused(tmp_path):
+    _index(tmp_path).upsert(DOCS)
+    with pytest.raises(IndexStateError):
+        VectorIndex(str(tmp_path), embedder=HashingEmbedder(dim=128))
+
+
+def test_short_vector_file_is_refused_not_repaired(tmp_path):
+    index = _index(tmp_path)
+    index.upsert(DOCS)
+    index.close()
+    vectors = next(tmp_path.glob("vectors.*.f32"))
+    size = vectors.stat().st_size
+    with open(vectors, "r+b") as f:
+        f.truncate(size // 2)
+    with pytest.raises(IndexStateError):
+        _index(tmp_path)
+    assert vectors.stat().st_size == size // 2
+
+
+def _upsert_worker(path, worker):
+    index = _index(path)
+    for i in range(10):
+        index.upsert([Document(f"w{worker}-{i}.txt", f"worker {worker} document {i} text")])
+    index.close()
+
+
+def test_concurrent_writers_in_processes_lose_no_rows(tmp_path):
+    _index(tmp_path).close()
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_upsert_worker, args=(str(tmp_path), w)) for w in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    index = _index(tmp_path)
+    assert len(index) == 30 and index.stats()["rows"] == 30
+    index.close()
@@ -0,0 +1,58 @@
+# tests/test_session_memory.py
+import sqlite3
+import time
+
+from session_memory import SessionMemory, extractive_summary
+
+
+def _rows(db_path):
+    with sqlite3.connect(db_path) as db:
+        return [sid for (sid,) in db.execute("SELECT id FROM sessions ORDER BY id")]
+
+
+def test_window_folds_oldest_turns_into_summary():
+    memory = SessionMemory(max_tokens=60, summary_tokens=200)
+    for i in range(6):
+        memory.add_exchange("s", f"Question {i}?", f"Answer number {i}. " + "detail " * 10)
+    window = memory.window("s")
+    assert window.tokens <= 60
+    assert window.turns[-1][1].startswith("Answer number 5.")
+    assert "- user: Question 0?" in window.summary
+    assert memory.summarized_turns + len(window) == 12
+
+
+def test_extractive_summary_prefers_executive_summary():
+    answer = "# Report\n\n## Executive Summary\nMetformin leads the West.\n\n## Details\n..."
+    assert extractive_summary("", [("assistant", answer)]) == "- assistant: Metformin leads the West."
+
+
+def test_session_reloads_from_disk_after_eviction(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite3")
+    memory = SessionMemory(max_sessions=1, db_path=db_path)
+    memory.add_exchange("a", "first question", "first answer")
+    memory.add_exchange("b", "other question", "other answer")
+    assert memory.window("a").turns == [("user", "first question"), ("assistant", "first answer")]
+    assert memory.loads == 1 and memory.evictions >= 1
+
+
+def test_periodic_purge_removes_expired_rows(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite3")
+    memory = SessionMemory(ttl_s=0.05, purge_interval_s=0.05, db_path=db_path)
+    for sid in ("a", "b", "c"):
+        memory.add_exchange(sid, "question", "answer")
+    assert _rows(db_path) == ["a", "b", "c"]
+    time.sleep(0.1)
+    memory.add_exchange("d", "question", "answer")  # the purge runs on this write
+    assert _rows(db_path) == ["d"]
+    assert memory.expirations == 3
+    assert memory.stats()["sessions_in_memory"] == 1
+
+
+def test_expired_session_is_deleted_when_loaded(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite3")
+    memory = SessionMemory(ttl_s=0.05, purge_interval_s=3600, max_sessions=1, db_path=db_path)
+    memory.add_exchange("a", "question", "answer")
+    memory.add_exchange("b", "question", "answer")  # evicts "a" from RAM
+    time.sleep(0.1)
+    assert memory.window("a").turns == []
+    assert "a" not in _rows(db_path)
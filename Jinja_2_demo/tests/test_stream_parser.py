@@ -0,0 +1,86 @@
+# tests/test_stream_parser.py
+import asyncio
+
+from stream_parser import (
+    ChartError, ChartReady, SectionEnd, SectionStart, StreamEnd, StreamParser, TextDelta, aparse_stream,
+)
+
+RESPONSE = (
+    "```json\n"
+    '{"plottinggraph": {"type": "bar", "values": [1, 2]}}\n'
+    "```\n"
+    "### Executive Summary\n"
+    "Metformin leads.\n"
+    "### Key Insights\n"
+    "- West is #1\n"
+)
+
+
+def _parse(pieces):
+    parser = StreamParser()
+    events = []
+    for piece in pieces:
+        events.extend(parser.feed(piece))
+    return events + parser.close()
+
+
+def _shape(events):
+    """Non-text events, without offsets (they count characters fed so far)."""
+    return [
+        (type(e).__name__, e.payload if isinstance(e, ChartReady) else e)
+        for e in events if not isinstance(e, TextDelta)
+    ]
+
+
+def _text(events, section=None):
+    return "".join(e.text for e in events if isinstance(e, TextDelta) and e.section == section)
+
+
+def test_events_do_not_depend_on_chunk_boundaries():
+    whole = _parse([RESPONSE])
+    charts = [e for e in whole if isinstance(e, ChartReady)]
+    assert charts[0].payload == {"plottinggraph": {"type": "bar", "values": [1, 2]}}
+    assert [e.title for e in whole if isinstance(e, SectionStart)] == ["Executive Summary", "Key Insights"]
+    assert [e.title for e in whole if isinstance(e, SectionEnd)] == ["Executive Summary", "Key Insights"]
+    assert _text(whole, "Key Insights") == "- West is #1\n"
+    assert whole[-1] == StreamEnd(len(RESPONSE), 1, 2)
+
+    by_char = _parse(list(RESPONSE))
+    assert _shape(by_char) == _shape(whole)
+    assert _text(by_char, "Executive Summary") == _text(whole, "Executive Summary")
+
+
+def test_prose_is_not_held_until_its_newline():
+    parser = StreamParser()
+    assert parser.feed("### Summary\nMetformin") == [SectionStart("Summary", 3), TextDelta("Metformin", "Summary")]
+    assert parser.feed(" leads") == [TextDelta(" leads", "Summary")]
+
+
+def test_bad_chart_json_is_reported():
+    events = _parse(["```json\n{not json}\n```\nAfter.\n"])
+    errors = [e for e in events if isinstance(e, ChartError)]
+    assert errors and errors[0].raw == "{not json}\n"
+    assert _text(events) == "After.\n"
+
+
+def test_other_fences_pass_through_as_text():
+    events = _parse(["```python\nprint(1)\n```\n"])
+    assert not [e for e in events if isinstance(e, (ChartReady, ChartError))]
+    assert _text(events) == "```python\nprint(1)\n```\n"
+
+
+def test_truncated_chart_block_is_parsed_on_close():
+    events = _parse(['```json\n{"a": 1}\n'])
+    assert [e.payload for e in events if isinstance(e, ChartReady)] == [{"a": 1}]
+
+
+def test_aparse_stream():
+    async def pieces():
+        for i in range(0, len(RESPONSE), 7):
+            yield RESPONSE[i:i + 7]
+
+    async def main():
+        return [e async for e in aparse_stream(pieces())]
+
+    events = asyncio.run(main())
+    assert isinstance(events[-1], StreamEnd) and events[-1].charts == 1
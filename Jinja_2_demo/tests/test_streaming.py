@@ -0,0 +1,122 @@
+# tests/test_streaming.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+import bedrock_connector.gemini_connector as gc
+from bedrock_connector.providers import FakeStreamingProvider
+from bedrock_connector.streaming import aiter_in_thread
+
+
+def _collect(provider, n):
+    async def one():
+        return "".join([p async for p in aiter_in_thread(lambda: provider.open_stream("m", "prompt"))])
+
+    async def main():
+        return await asyncio.gather(*(one() for _ in range(n)))
+
+    return asyncio.run(main())
+
+
+def test_concurrent_streams_take_about_one_stream_time():
+    provider = FakeStreamingProvider(ttft_s=0.2, tokens_per_s=200, chunk_tokens=20)
+    start = time.perf_counter()
+    _collect(provider, 1)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = _collect(provider, 8)
+    many = time.perf_counter() - start
+    assert texts == [provider.response] * 8
+    assert many < single * 2
+
+
+@pytest.fixture
+def fake_synthesis(monkeypatch):
+    """astream_gemini_synthesis over a slow fake backend, without the response cache."""
+    gc.init_connector()
+    provider = FakeStreamingProvider(ttft_s=0.2, tokens_per_s=200, chunk_tokens=20)
+    monkeypatch.setattr(gc, "_PROVIDER", provider)
+    monkeypatch.setattr(gc, "_RESPONSE_CACHE", None)
+    return provider
+
+
+def test_concurrent_synthesis_streams_take_about_one_stream_time(fake_synthesis):
+    async def one(i):
+        return "".join([p async for p in gc.astream_gemini_synthesis("fake-model", f"prompt {i}")])
+
+    async def run(n):
+        start = time.perf_counter()
+        texts = await asyncio.gather(*(one(i) for i in range(n)))
+        return time.perf_counter() - start, texts
+
+    single, _ = asyncio.run(run(1))
+    many, texts = asyncio.run(run(8))
+    assert texts == [fake_synthesis.response] * 8
+    assert fake_synthesis.calls == 9  # distinct prompts: no coalescing
+    assert many < single * 2
+
+
+class _CountingStream:
+    """Instant upstream recording how far the producer got and whether it was closed."""
+
+    def __init__(self, n):
+        self.n = n
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed.is_set() or self.produced >= self.n:
+            raise StopIteration
+        self.produced += 1
+        return self.produced
+
+    def close(self):
+        self.closed.set()
+
+
+def test_slow_consumer_bounds_the_buffer():
+    upstream = _CountingStream(1000)
+
+    async def main():
+        stream = aiter_in_thread(lambda: upstream, maxsize=4)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.2)  # producer runs ahead until the queue is full
+        ahead = upstream.produced
+        await stream.aclose()
+        return first, ahead
+
+    first, ahead = asyncio.run(main())
+    assert first == 1
+    # Items queued for the consumer plus one held while waiting for a slot
+    assert ahead <= 4 + 2
+    assert upstream.closed.wait(1.0)
+
+
+def test_cancelling_the_consumer_closes_the_upstream():
+    provider = FakeStreamingProvider(ttft_s=0.0, tokens_per_s=20, chunk_tokens=1)
+    opened = []
+
+    def open_stream():
+        opened.append(provider.open_stream("m", "prompt"))
+        return opened[0]
+
+    async def main():
+        async def consume():
+            async for _ in aiter_in_thread(open_stream):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    assert time.perf_counter() - start < 1.0
+    assert opened[0]._cancelled.is_set()
@@ -0,0 +1,26 @@
+# tests/test_table.py
+import pytest
+
+from table import ColumnarTable, RecordsTable
+
+COLUMNS = ["region", "count"]
+ROWS = [{"region": r, "count": i} for i, r in enumerate(["West", "South", "Midwest", "Northeast", "West"])]
+
+
+@pytest.mark.parametrize("make", [
+    lambda: RecordsTable(ROWS, COLUMNS),
+    lambda: ColumnarTable.from_records(ROWS, COLUMNS),
+])
+def test_view_indexing_stays_inside_the_view(make):
+    view = make()[1:3]
+    assert len(view) == 2
+    assert view[0] == ("South", 1) and view[-1] == ("Midwest", 2) and view[-2] == view[0]
+    for index in (2, -3):
+        with pytest.raises(IndexError):
+            view[index]
+
+
+def test_records_and_columnar_views_agree():
+    records, columnar = RecordsTable(ROWS, COLUMNS), ColumnarTable.from_records(ROWS, COLUMNS)
+    for lo, hi in ((0, 5), (1, 4), (3, 3)):
+        assert records[lo:hi].row_lists() == columnar[lo:hi].row_lists()
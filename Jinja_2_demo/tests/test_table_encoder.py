@@ -0,0 +1,78 @@
+# tests/test_table_encoder.py
+import json
+
+import pytest
+
+from table import ColumnarTable
+from table_encoder import encode_table, estimate_tokens
+
+COLUMNS = ["physician_id", "drug_name", "region", "prescriptions_count"]
+
+
+def _rows(n):
+    drugs, regions = ["Metformin", "Atorvastatin", "Lisinopril"], ["West", "South", "Midwest"]
+    return [
+        {"physician_id": f"HCP{i:05d}", "drug_name": drugs[i % 3], "region": regions[i % 3 // 2],
+         "prescriptions_count": i % 97}
+        for i in range(n)
+    ]
+
+
+def test_small_table_is_sent_whole():
+    enc = encode_table(COLUMNS, _rows(3), token_budget=1000)
+    assert enc.strategy == "full" and enc.rows_out == 3
+    assert json.loads(enc.text) == {"columns": COLUMNS, "rows": [list(r.values()) for r in _rows(3)]}
+    assert enc.tokens == enc.full_tokens == estimate_tokens(enc.text)
+
+
+@pytest.mark.parametrize("strategy", ["truncate", "sample", "aggregate"])
+@pytest.mark.parametrize("budget", [40, 150, 600])
+def test_every_strategy_stays_within_the_budget(strategy, budget):
+    enc = encode_table(COLUMNS, _rows(5000), token_budget=budget, strategy=strategy)
+    assert enc.tokens <= budget
+    assert enc.rows_in == 5000 and enc.rows_out < 5000
+    json.loads(enc.text)
+
+
+def test_truncate_keeps_a_prefix_and_estimates_the_full_size():
+    rows = _rows(20_000)
+    enc = encode_table(COLUMNS, rows, token_budget=300, strategy="truncate")
+    payload = json.loads(enc.text)
+    assert payload["rows"] == [list(r.values()) for r in rows[:enc.rows_out]]
+    assert payload["truncated_from"] == 20_000
+    exact = encode_table(COLUMNS, rows).full_tokens
+    assert abs(enc.full_tokens - exact) < exact * 0.05
+
+
+def test_aggregate_summarizes_all_rows():
+    enc = encode_table(COLUMNS, _rows(5000), token_budget=400, strategy="aggregate")
+    payload = json.loads(enc.text)
+    assert enc.strategy == "aggregate"
+    assert payload["omitted_rows"] == 5000 - enc.rows_out
+    assert payload["summary"]
+
+
+def test_aggregate_falls_back_to_truncate_when_no_summary_fits():
+    enc = encode_table(COLUMNS, _rows(5000), token_budget=30, strategy="aggregate")
+    assert enc.strategy == "truncate" and enc.tokens <= 30
+
+
+def test_columnar_table_encodes_like_records():
+    rows = _rows(300)
+    table = ColumnarTable.from_records(rows, COLUMNS)
+    for budget in (None, 200):
+        assert encode_table(COLUMNS, table, token_budget=budget).text == encode_table(COLUMNS, rows, token_budget=budget).text
+
+
+def test_partial_prefix_is_truncated_not_summarized():
+    enc = encode_table(COLUMNS, _rows(50), token_budget=100, partial=True, total_rows=1_000_000)
+    assert enc.strategy == "truncate" and enc.rows_in == 1_000_000
+    assert json.loads(enc.text)["truncated_from"] == 1_000_000
+
+
+@pytest.mark.parametrize("strategy", ["truncate", "sample", "aggregate"])
+@pytest.mark.parametrize("budget", [None, 1, 100])
+def test_empty_table_is_sent_whole(strategy, budget):
+    enc = encode_table(COLUMNS, [], token_budget=budget, strategy=strategy)
+    assert enc.strategy == "full" and enc.rows_in == enc.rows_out == 0
+    assert json.loads(enc.text) == {"columns": COLUMNS, "rows": []}